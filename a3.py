@@ -1,8 +1,17 @@
+import argparse
+import contextlib
+import time
 import tkinter as tk
-from typing import Any, Callable, Union, Optional
+from tkinter import simpledialog
+from typing import Any, Callable, ContextManager, Union, Optional
+from PIL import ImageColor, ImageDraw
 from a3_support import *
 from model import *
 from constants import *
+from actionlog import ActionLog
+from history import History
+from latency import LatencyMonitor
+from profiling import Profiler, profile_model
 
 SEED_MAP = {
     "Potato Seed": PotatoPlant,
@@ -14,7 +23,12 @@ SEED_MAP = {
 class InfoBar(AbstractGrid):
     """A class representing the information bar in the game.
 
-    An instance of InfoBar displays the current day, money, and energy."""
+    An instance of InfoBar displays the current day, money, and energy. The
+    text items are kept between redraws, and only the amounts which have
+    changed are reconfigured."""
+
+    # The heading and amount format for each value, in display order
+    _LABELS = (("Day:", "{}"), ("Money:", "${}"), ("Energy:", "{}"))
 
     def __init__(self, master: tk.Tk | tk.Frame) -> None:
         """
@@ -30,11 +44,23 @@ class InfoBar(AbstractGrid):
             (2, 3),
             (FARM_WIDTH + INVENTORY_WIDTH, INFO_BAR_HEIGHT),
         )
-        self.redraw(0, 0, 0)
+        self._values = (0, 0, 0)
+        self._amount_items: list[int] = []
+        self._draw_labels()
+
+    def set_size(self, size: tuple[int, int]) -> None:
+        """
+        Resize the information bar, redrawing the current values to fit.
+
+        Args:
+            size (tuple[int, int]): The new (width, height) in pixels.
+        """
+        super().set_size(size)
+        self._draw_labels()
 
     def _create_label(
         self, grid_position: tuple[int, int], text: str, amount: str
-    ) -> None:
+    ) -> int:
         """
         Create a label with text and amount at the specified grid position.
 
@@ -45,6 +71,9 @@ class InfoBar(AbstractGrid):
             grid_position (tuple[int, int]): The grid position of the label.
             text (str): The text to display.
             amount (str): The amount to display.
+
+        Returns:
+            int: The id of the amount's text item.
         """
         mid_x, mid_y = self.get_midpoint(grid_position)
 
@@ -54,7 +83,17 @@ class InfoBar(AbstractGrid):
             (grid_position[0] + 1, grid_position[1])
         )
 
-        self.create_text(mid_x, mid_y, text=amount)
+        return self.create_text(mid_x, mid_y, text=amount)
+
+    def _draw_labels(self) -> None:
+        """Clear the information bar and create every label from scratch."""
+        self.clear()
+        self._amount_items = [
+            self._create_label((0, col), text, amount_format.format(value))
+            for col, ((text, amount_format), value) in enumerate(
+                zip(self._LABELS, self._values)
+            )
+        ]
 
     def redraw(self, day: int, money: int, energy: int) -> None:
         """
@@ -65,22 +104,32 @@ class InfoBar(AbstractGrid):
             money (int): The amount of money.
             energy (int): The amount of energy.
         """
-        self.clear()
-        self._create_label((0, 0), "Day:", str(day))
-        self._create_label((0, 1), "Money:", f"${money}")
-        self._create_label((0, 2), "Energy:", str(energy))
+        values = (day, money, energy)
+        for item, (_, amount_format), old, new in zip(
+            self._amount_items, self._LABELS, self._values, values
+        ):
+            if old != new:
+                self.itemconfig(item, text=amount_format.format(new))
+        self._values = values
 
 
 class FarmView(AbstractGrid):
     """A class representing the farm view in the game.
 
-    The FarmView handles displaying the ground, plants, and player."""
+    The FarmView handles displaying the ground, plants, and player. Canvas
+    items are created once and kept between redraws, so that a redraw only
+    reconfigures the cells which have actually changed. The ground is drawn as
+    a single composited image, which is patched one tile at a time.
+
+    If a viewport is given, the FarmView acts as a camera which follows the
+    player, and only the tiles and plants inside the viewport are drawn."""
 
     def __init__(
         self,
         master: tk.Tk | tk.Frame,
         dimensions: tuple[int, int],
         size: tuple[int, int],
+        viewport: Optional[tuple[int, int]] = None,
         **kwargs,
     ) -> None:
         """
@@ -90,10 +139,340 @@ class FarmView(AbstractGrid):
             master (tk.Tk | tk.Frame): The parent widget for the FarmView.
             dimensions (tuple[int, int]): The dimensions of the farm.
             size (tuple[int, int]): The size of the farm view.
+            viewport (Optional[tuple[int, int]], optional): The maximum number
+                of (rows, columns) to show at once. Defaults to None, in which
+                case the whole farm is shown.
             **kwargs: Additional keyword arguments for the AbstractGrid.
         """
-        super().__init__(master, dimensions, size, **kwargs)
-        self._image_cache = {}
+        self._map_dimensions = dimensions
+        if viewport is None:
+            viewport = dimensions
+        viewport = (
+            min(viewport[0], dimensions[0]),
+            min(viewport[1], dimensions[1]),
+        )
+        super().__init__(master, viewport, size, **kwargs)
+        # References to the sprites in use, which keep them alive if they are
+        # evicted from the sprite cache
+        self._sprites: dict[str, ImageTk.PhotoImage] = {}
+        self._placeholders: dict[tuple[str, bool], ImageTk.PhotoImage] = {}
+        self._reset_items()
+
+    def _reset_items(self) -> None:
+        """Forget all retained canvas items, forcing a full rebuild on the
+        next redraw."""
+        # The farm position shown in the top left cell of the view
+        self._origin: Optional[tuple[int, int]] = None
+        # The whole visible ground is composited into a single image and item
+        self._ground_image: Optional[ImageTk.PhotoImage] = None
+        self._ground_item: Optional[int] = None
+        # All remaining state is indexed by on-screen (row, col) cell
+        # What is drawn is recorded as None while it is a placeholder
+        # The ground type of each visible tile as it is currently drawn
+        self._drawn_ground: list[list[Optional[str]]] = []
+        # Canvas item ids and drawn image names for each visible plant
+        self._plant_items: dict[tuple[int, int], int] = {}
+        self._drawn_plants: dict[tuple[int, int], Optional[str]] = {}
+        self._player_item: Optional[int] = None
+        self._drawn_player: Optional[tuple] = None
+        self._overlay_item: Optional[int] = None
+
+    def clear(self) -> None:
+        """Clears all items off the canvas, including retained items."""
+        super().clear()
+        self._reset_items()
+
+    def set_size(self, size: tuple[int, int]) -> None:
+        """
+        Resize the farm view. Everything is rebuilt with sprites of the new
+        cell size on the next redraw.
+
+        Args:
+            size (tuple[int, int]): The new (width, height) in pixels.
+        """
+        super().set_size(size)
+        self.clear()
+        self._sprites.clear()
+        self._placeholders.clear()
+
+    def show_overlay(self, text: str) -> None:
+        """
+        Show text in the top left corner, above everything else.
+
+        Args:
+            text (str): The text to show.
+        """
+        if self._overlay_item is None:
+            self._overlay_item = self.create_text(
+                4, 4, anchor="nw", fill=OVERLAY_COLOUR, font=OVERLAY_FONT,
+                tags="overlay",
+            )
+        self.itemconfig(self._overlay_item, text=text)
+        self.tag_raise("overlay")
+
+    def get_origin(self) -> tuple[int, int]:
+        """
+        Get the farm position shown in the top left cell of the view.
+
+        Returns:
+            tuple[int, int]: The (row, col) farm position.
+        """
+        return self._origin if self._origin is not None else (0, 0)
+
+    def get_visible_area(self) -> tuple[int, int, int, int]:
+        """
+        Get the area of the farm which is currently shown.
+
+        Returns:
+            tuple[int, int, int, int]: The visible area as
+                (row_min, col_min, row_max, col_max), with the maximums
+                exclusive.
+        """
+        row_min, col_min = self.get_origin()
+        rows, cols = self._dimensions
+        return row_min, col_min, row_min + rows, col_min + cols
+
+    def _follow(self, player_position: tuple[int, int]) -> tuple[int, int]:
+        """
+        Calculate the origin which centres the view on the player, without
+        showing anything beyond the edges of the farm.
+
+        Args:
+            player_position (tuple[int, int]): The player's position.
+
+        Returns:
+            tuple[int, int]: The (row, col) origin for the view.
+        """
+        return tuple(
+            max(0, min(player - shown // 2, total - shown))
+            for player, shown, total in zip(
+                player_position, self._dimensions, self._map_dimensions
+            )
+        )
+
+    def _to_screen(
+        self, position: tuple[int, int]
+    ) -> Optional[tuple[int, int]]:
+        """
+        Convert a farm position to the on-screen cell it is drawn in.
+
+        Args:
+            position (tuple[int, int]): The (row, col) farm position.
+
+        Returns:
+            Optional[tuple[int, int]]: The (row, col) cell, or None if the
+                position is outside of the view.
+        """
+        rows, cols = self._dimensions
+        row = position[0] - self._origin[0]
+        col = position[1] - self._origin[1]
+        if 0 <= row < rows and 0 <= col < cols:
+            return row, col
+        return None
+
+    def _get_sprite(self, image_name: str) -> Optional[ImageTk.PhotoImage]:
+        """
+        Get the sprite for the specified image, sized to fit one cell.
+
+        Args:
+            image_name (str): The image path, relative to the images directory.
+
+        Returns:
+            Optional[ImageTk.PhotoImage]: The cached sprite, or None if it is
+                still being loaded in the background.
+        """
+        sprite = SPRITE_CACHE.get_photo(
+            f"images/{image_name}", self.get_cell_size(), wait=False
+        )
+        if sprite is not None:
+            self._sprites[image_name] = sprite
+        return sprite
+
+    def _get_placeholder(self, colour: str, fill: bool) -> ImageTk.PhotoImage:
+        """
+        Get a flat placeholder, drawn in place of a sprite until it is loaded.
+
+        Args:
+            colour (str): The colour of the placeholder.
+            fill (bool): Whether to fill the whole cell, rather than drawing a
+                smaller circle.
+
+        Returns:
+            ImageTk.PhotoImage: The placeholder sprite.
+        """
+        if (colour, fill) not in self._placeholders:
+            width, height = self.get_cell_size()
+            if fill:
+                image = Image.new("RGBA", (width, height), colour)
+            else:
+                image = Image.new("RGBA", (width, height))
+                ImageDraw.Draw(image).ellipse(
+                    (width // 4, height // 4, width * 3 // 4, height * 3 // 4),
+                    fill=colour,
+                )
+            self._placeholders[(colour, fill)] = ImageTk.PhotoImage(image)
+        return self._placeholders[(colour, fill)]
+
+    def _draw_ground(self, ground: list[str]) -> None:
+        """
+        Composite every visible ground tile into a single image and draw it as
+        one canvas item.
+
+        Args:
+            ground (list[str]): The ground layout.
+        """
+        cell_width, cell_height = self.get_cell_size()
+        tiles = {}
+        for ground_type in (GRASS, SOIL, UNTILLED):
+            tile = SPRITE_CACHE.get_image(
+                f"images/{IMAGES[ground_type]}",
+                (cell_width, cell_height),
+                wait=False,
+            )
+            if tile is None:
+                # Placeholders use the same flat colours as the minimap
+                tile = Image.new(
+                    "RGBA",
+                    (cell_width, cell_height),
+                    MINIMAP_COLOURS[ground_type],
+                )
+            tiles[ground_type] = tile
+
+        rows, cols = self._dimensions
+        origin_row, origin_col = self._origin
+        visible = [
+            ground_row[origin_col:origin_col + cols]
+            for ground_row in ground[origin_row:origin_row + rows]
+        ]
+
+        composite = Image.new("RGBA", (cols * cell_width, rows * cell_height))
+        # Maps tend to repeat rows, so each distinct row is only built once
+        strips: dict[str, Image.Image] = {}
+        for row, ground_row in enumerate(visible):
+            if ground_row not in strips:
+                strip = Image.new("RGBA", (composite.width, cell_height))
+                for col, ground_type in enumerate(ground_row):
+                    strip.paste(tiles[ground_type], (col * cell_width, 0))
+                strips[ground_row] = strip
+            composite.paste(strips[ground_row], (0, row * cell_height))
+
+        if self._ground_image is None:
+            self._ground_image = ImageTk.PhotoImage(composite)
+            self._ground_item = self.create_image(
+                0, 0, anchor="nw", image=self._ground_image, tags="ground"
+            )
+            self.tag_lower("ground")
+        else:
+            self._ground_image.paste(composite)
+        self._drawn_ground = [list(ground_row) for ground_row in visible]
+
+    def _update_ground(self, ground: list[str], position: tuple[int, int]) -> None:
+        """
+        Re-paste the ground tile at the specified position into the ground
+        image, if it is visible and has changed.
+
+        Args:
+            ground (list[str]): The ground layout.
+            position (tuple[int, int]): The farm position of the tile.
+        """
+        screen = self._to_screen(position)
+        if screen is None:
+            return
+
+        row, col = position
+        ground_type = ground[row][col]
+        if self._drawn_ground[screen[0]][screen[1]] != ground_type:
+            sprite = self._get_sprite(IMAGES[ground_type])
+            drawn = ground_type
+            if sprite is None:
+                sprite = self._get_placeholder(MINIMAP_COLOURS[ground_type], True)
+                drawn = None
+            x_min, y_min, _, _ = self.get_bbox(screen)
+            self.tk.call(
+                str(self._ground_image),
+                "copy",
+                str(sprite),
+                "-to",
+                x_min,
+                y_min,
+                "-compositingrule",
+                "set",
+            )
+            self._drawn_ground[screen[0]][screen[1]] = drawn
+
+    def _update_plant(
+        self,
+        plants: dict[tuple[int, int], "Plant"],
+        position: tuple[int, int],
+    ) -> None:
+        """
+        Create, update or delete the plant item for the specified position so
+        that it matches the plant (if any) at that position.
+
+        Args:
+            plants (dict[tuple[int, int], "Plant"]): The dictionary of plant
+                positions and objects.
+            position (tuple[int, int]): The farm position of the plant.
+        """
+        screen = self._to_screen(position)
+        if screen is None:
+            return
+
+        plant = plants.get(position)
+        if plant is None:
+            if screen in self._plant_items:
+                self.delete(self._plant_items.pop(screen))
+                self._drawn_plants.pop(screen)
+            return
+
+        image_name = get_plant_image_name(plant)
+        if self._drawn_plants.get(screen) == image_name:
+            return
+
+        image = self._get_sprite(image_name)
+        if image is None:
+            image = self._get_placeholder(MINIMAP_PLANT_COLOUR, False)
+            image_name = None
+        if screen in self._plant_items:
+            self.itemconfig(self._plant_items[screen], image=image)
+        else:
+            self._plant_items[screen] = self.create_image(
+                self.get_midpoint(screen), image=image, tags="plant"
+            )
+            # Keep the player drawn above any newly created plants
+            self.tag_raise("player")
+        self._drawn_plants[screen] = image_name
+
+    def _update_player(
+        self, player_position: tuple[int, int], player_direction: str
+    ) -> None:
+        """
+        Move and turn the player item, if the player has moved or turned.
+
+        Args:
+            player_position (tuple[int, int]): The player's position.
+            player_direction (str): The player's direction.
+        """
+        screen = self._to_screen(player_position)
+        if self._drawn_player == (screen, player_direction):
+            return
+
+        if screen is None:
+            if self._player_item is not None:
+                self.itemconfig(self._player_item, state="hidden")
+        else:
+            image = self._get_sprite(IMAGES[player_direction])
+            if image is None:
+                image = self._get_placeholder(MINIMAP_PLAYER_COLOUR, False)
+                player_direction = None
+            if self._player_item is None:
+                self._player_item = self.create_image(
+                    self.get_midpoint(screen), image=image, tags="player"
+                )
+            else:
+                self.coords(self._player_item, self.get_midpoint(screen))
+                self.itemconfig(self._player_item, image=image, state="normal")
+        self._drawn_player = (screen, player_direction)
 
     def redraw(
         self,
@@ -101,48 +480,410 @@ class FarmView(AbstractGrid):
         plants: dict[tuple[int, int], "Plant"],
         player_position: tuple[int, int],
         player_direction: str,
+        changed: Optional[set[tuple[int, int]]] = None,
     ) -> None:
         """
         Redraw the farm view with the specified values.
 
+        Only the canvas items of visible cells that differ from what is
+        currently drawn are reconfigured. If the changed positions are known,
+        only those cells are checked for differences. Work for cells outside
+        of the view is skipped entirely.
+
         Args:
             ground (list[str]): The ground layout.
             plants (dict[tuple[int, int], "Plant"]): The dictionary of plant positions and objects.
             player_position (tuple[int, int]): The player's position.
             player_direction (str): The player's direction.
+            changed (Optional[set[tuple[int, int]]], optional): The positions
+                whose ground or plant may have changed since the last redraw.
+                Defaults to None, in which case every visible cell is checked.
         """
-        self.clear()
+        origin = self._follow(player_position)
+        if changed is None or origin != self._origin or self._ground_item is None:
+            # The camera has moved, so everything visible must be checked
+            self._origin = origin
+            self._draw_ground(ground)
+            rows, cols = self._dimensions
+            for row in range(origin[0], origin[0] + rows):
+                for col in range(origin[1], origin[1] + cols):
+                    self._update_plant(plants, (row, col))
+        else:
+            for position in changed:
+                self._update_ground(ground, position)
+                self._update_plant(plants, position)
 
-        # Draw ground
-        ground_type_map = {"G": "grass", "S": "soil", "U": "untilled_soil"}
-        for row, ground_row in enumerate(ground):
-            for col, ground_type in enumerate(ground_row):
-                ground_type = ground_type_map[ground_type]
-                if ground_type not in self._image_cache:
-                    self._image_cache[ground_type] = get_image(
-                        f"images/{ground_type}.png", self.get_cell_size()
-                    )
-                image = self._image_cache[ground_type]
-                self.create_image(self.get_midpoint((row, col)), image=image)
-
-        # Draw plants
-        for position, plant in plants.items():
-            path = get_plant_image_name(plant)
-            if path not in self._image_cache:
-                self._image_cache[path] = get_image(
-                    f"images/{get_plant_image_name(plant)}",
-                    self.get_cell_size(),
-                )
-            image = self._image_cache[path]
-            self.create_image(self.get_midpoint(position), image=image)
+        self._update_player(player_position, player_direction)
+
+
+class FarmOverview:
+    """A level of detail summary of the farm, used to draw the minimap.
+
+    The farm is divided into square blocks of tiles. Level 0 uses the smallest
+    power of two block size which keeps the number of blocks along each side
+    within a limit, and each following level doubles the block size until a
+    single block covers the whole farm. Each block records how many of its
+    tiles are grass, soil and untilled soil, how many plants it contains, and
+    how many of those plants are ready to harvest."""
+
+    # Indices of the counts kept for each block
+    _GROUND_TYPES = (GRASS, SOIL, UNTILLED)
+    _PLANTS = 3
+    _READY = 4
+
+    def __init__(self, dimensions: tuple[int, int], max_blocks: int) -> None:
+        """
+        Initialise the FarmOverview.
+
+        Args:
+            dimensions (tuple[int, int]): The dimensions of the farm.
+            max_blocks (int): The most blocks along each side of level 0.
+        """
+        self._dimensions = dimensions
+        self._base_block_size = 1
+        while max(dimensions) > self._base_block_size * max_blocks:
+            self._base_block_size *= 2
+
+        # The counts of every block, for each level, indexed [row][col]
+        self._levels: list[list[list[list[int]]]] = []
+        block_size = self._base_block_size
+        while True:
+            rows, cols = (-(-length // block_size) for length in dimensions)
+            self._levels.append(
+                [[[0] * 5 for _ in range(cols)] for _ in range(rows)]
+            )
+            if rows == cols == 1:
+                break
+            block_size *= 2
+
+    def get_levels(self) -> int:
+        """
+        Get the number of levels of detail.
+
+        Returns:
+            int: The number of levels.
+        """
+        return len(self._levels)
+
+    def get_block_size(self, level: int) -> int:
+        """
+        Get the number of tiles along each side of a block.
+
+        Args:
+            level (int): The level of detail.
+
+        Returns:
+            int: The block size, in tiles.
+        """
+        return self._base_block_size << level
+
+    def get_block_dimensions(self, level: int) -> tuple[int, int]:
+        """
+        Get the number of blocks at a level of detail.
+
+        Args:
+            level (int): The level of detail.
+
+        Returns:
+            tuple[int, int]: The number of (rows, columns) of blocks.
+        """
+        blocks = self._levels[level]
+        return len(blocks), len(blocks[0])
+
+    def get_block(
+        self, level: int, block: tuple[int, int]
+    ) -> tuple[str, int, int, int]:
+        """
+        Get the summary of a block.
+
+        Args:
+            level (int): The level of detail.
+            block (tuple[int, int]): The (row, col) of the block.
+
+        Returns:
+            tuple[str, int, int, int]: The most common ground type in the
+                block, the number of plants, the number of plants ready to
+                harvest, and the number of tiles in the block.
+        """
+        counts = self._levels[level][block[0]][block[1]]
+        ground_counts = counts[:len(self._GROUND_TYPES)]
+        majority = ground_counts.index(max(ground_counts))
+        return (
+            self._GROUND_TYPES[majority],
+            counts[self._PLANTS],
+            counts[self._READY],
+            sum(ground_counts),
+        )
+
+    def _count_block(
+        self,
+        ground: list[str],
+        plants: dict[tuple[int, int], "Plant"],
+        block: tuple[int, int],
+    ) -> list[int]:
+        """
+        Count the tiles and plants of a level 0 block directly from the farm.
+
+        Args:
+            ground (list[str]): The ground layout.
+            plants (dict[tuple[int, int], "Plant"]): The dictionary of plant
+                positions and objects.
+            block (tuple[int, int]): The (row, col) of the block.
+
+        Returns:
+            list[int]: The counts for the block.
+        """
+        size = self._base_block_size
+        row_min, col_min = block[0] * size, block[1] * size
+        row_max = min(row_min + size, self._dimensions[0])
+        col_max = min(col_min + size, self._dimensions[1])
+
+        counts = [0] * 5
+        for ground_row in ground[row_min:row_max]:
+            for i, ground_type in enumerate(self._GROUND_TYPES):
+                counts[i] += ground_row.count(ground_type, col_min, col_max)
+
+        # Look up whichever is fewer: the tiles of the block, or the plants
+        if len(plants) < size * size:
+            block_plants = (
+                plant
+                for (row, col), plant in plants.items()
+                if row_min <= row < row_max and col_min <= col < col_max
+            )
+        else:
+            block_plants = (
+                plants[(row, col)]
+                for row in range(row_min, row_max)
+                for col in range(col_min, col_max)
+                if (row, col) in plants
+            )
+        for plant in block_plants:
+            counts[self._PLANTS] += 1
+            counts[self._READY] += plant.can_harvest()
+        return counts
+
+    def rebuild(
+        self, ground: list[str], plants: dict[tuple[int, int], "Plant"]
+    ) -> None:
+        """
+        Recount every level from scratch.
+
+        Args:
+            ground (list[str]): The ground layout.
+            plants (dict[tuple[int, int], "Plant"]): The dictionary of plant
+                positions and objects.
+        """
+        size = self._base_block_size
+        base = self._levels[0]
+        for row, blocks in enumerate(base):
+            ground_rows = ground[row * size:(row + 1) * size]
+            for col, counts in enumerate(blocks):
+                col_min, col_max = col * size, (col + 1) * size
+                counts[:] = [0] * 5
+                for ground_row in ground_rows:
+                    for i, ground_type in enumerate(self._GROUND_TYPES):
+                        counts[i] += ground_row.count(ground_type, col_min, col_max)
+        for (row, col), plant in plants.items():
+            counts = base[row // size][col // size]
+            counts[self._PLANTS] += 1
+            counts[self._READY] += plant.can_harvest()
+
+        for level in range(1, len(self._levels)):
+            below = self._levels[level - 1]
+            for row, blocks in enumerate(self._levels[level]):
+                for col, counts in enumerate(blocks):
+                    counts[:] = [0] * 5
+                    for child_row in below[row * 2:row * 2 + 2]:
+                        for child in child_row[col * 2:col * 2 + 2]:
+                            for i, count in enumerate(child):
+                                counts[i] += count
+
+    def update(
+        self,
+        ground: list[str],
+        plants: dict[tuple[int, int], "Plant"],
+        changed: set[tuple[int, int]],
+    ) -> set[tuple[int, int]]:
+        """
+        Recount only the blocks containing the changed positions, and adjust
+        the blocks above them at every level by the difference.
+
+        Args:
+            ground (list[str]): The ground layout.
+            plants (dict[tuple[int, int], "Plant"]): The dictionary of plant
+                positions and objects.
+            changed (set[tuple[int, int]]): The positions which have changed.
+
+        Returns:
+            set[tuple[int, int]]: The level 0 blocks whose counts changed.
+        """
+        size = self._base_block_size
+        dirty = {(row // size, col // size) for row, col in changed}
+        updated = set()
+        for block in dirty:
+            row, col = block
+            old = self._levels[0][row][col]
+            new = self._count_block(ground, plants, block)
+            delta = [n - o for n, o in zip(new, old)]
+            if not any(delta):
+                continue
+            updated.add(block)
+            for level in self._levels:
+                counts = level[row][col]
+                for i, difference in enumerate(delta):
+                    counts[i] += difference
+                row, col = row // 2, col // 2
+        return updated
+
+
+class MiniMap(tk.Canvas):
+    """A class representing an overview of the whole farm.
+
+    Each block of the finest level of detail of a FarmOverview is drawn as a
+    single coloured pixel, scaled up to the size of the minimap, so drawing
+    costs the same however large the farm is. The area shown in the farm view
+    and the player are marked on top."""
+
+    def __init__(
+        self,
+        master: tk.Tk | tk.Frame | tk.Toplevel,
+        dimensions: tuple[int, int],
+        size: tuple[int, int],
+        **kwargs,
+    ) -> None:
+        """
+        Initialise the MiniMap.
+
+        Args:
+            master (tk.Tk | tk.Frame | tk.Toplevel): The parent widget for the
+                MiniMap.
+            dimensions (tuple[int, int]): The dimensions of the farm.
+            size (tuple[int, int]): The size of the minimap.
+            **kwargs: Additional keyword arguments for the Canvas.
+        """
+        super().__init__(
+            master,
+            width=size[0],
+            height=size[1],
+            highlightthickness=0,
+            **kwargs,
+        )
+        self._size = size
+        self._dimensions = dimensions
+        self._overview = FarmOverview(dimensions, min(size))
+
+        rows, cols = self._overview.get_block_dimensions(0)
+        self._block_image = Image.new("RGB", (cols, rows))
+        self._photo = ImageTk.PhotoImage(self._block_image.resize(size))
+        self.create_image(0, 0, anchor="nw", image=self._photo)
+        self._visible_item = self.create_rectangle(
+            0, 0, 0, 0, outline=MINIMAP_VIEWPORT_COLOUR
+        )
+        self._player_item = self.create_oval(
+            0, 0, 0, 0, fill=MINIMAP_PLAYER_COLOUR, outline=""
+        )
+        self._drawn = False
+
+    def _to_pixel(self, position: tuple[float, float]) -> tuple[float, float]:
+        """
+        Convert a farm position to a pixel position on the minimap.
 
-        # Draw player
-        if player_direction not in self._image_cache:
-            self._image_cache[player_direction] = get_image(
-                f"images/player_{player_direction}.png", self.get_cell_size()
+        Args:
+            position (tuple[float, float]): The (row, col) farm position.
+
+        Returns:
+            tuple[float, float]: The (x, y) pixel position.
+        """
+        rows, cols = self._dimensions
+        return (
+            position[1] * self._size[0] / cols,
+            position[0] * self._size[1] / rows,
+        )
+
+    def _paint_block(self, block: tuple[int, int]) -> None:
+        """
+        Colour the pixel for a block from its summary.
+
+        Args:
+            block (tuple[int, int]): The (row, col) of the block.
+        """
+        ground_type, plants, ready, tiles = self._overview.get_block(0, block)
+        colour = _mix_colours(
+            MINIMAP_COLOURS[ground_type], MINIMAP_PLANT_COLOUR, plants / tiles
+        )
+        colour = _mix_colours(colour, MINIMAP_READY_COLOUR, ready / tiles)
+        self._block_image.putpixel((block[1], block[0]), colour)
+
+    def redraw(
+        self,
+        ground: list[str],
+        plants: dict[tuple[int, int], "Plant"],
+        player_position: tuple[int, int],
+        visible_area: tuple[int, int, int, int],
+        changed: Optional[set[tuple[int, int]]] = None,
+    ) -> None:
+        """
+        Redraw the minimap with the specified values.
+
+        Args:
+            ground (list[str]): The ground layout.
+            plants (dict[tuple[int, int], "Plant"]): The dictionary of plant
+                positions and objects.
+            player_position (tuple[int, int]): The player's position.
+            visible_area (tuple[int, int, int, int]): The area shown in the
+                farm view, as (row_min, col_min, row_max, col_max).
+            changed (Optional[set[tuple[int, int]]], optional): The positions
+                which may have changed since the last redraw. Defaults to
+                None, in which case every block is recounted.
+        """
+        if changed is None or not self._drawn:
+            self._overview.rebuild(ground, plants)
+            rows, cols = self._overview.get_block_dimensions(0)
+            blocks = {(row, col) for row in range(rows) for col in range(cols)}
+            self._drawn = True
+        else:
+            blocks = self._overview.update(ground, plants, changed)
+
+        for block in blocks:
+            self._paint_block(block)
+        if blocks:
+            self._photo.paste(
+                self._block_image.resize(self._size, Image.NEAREST)
             )
-        image = self._image_cache[player_direction]
-        self.create_image(self.get_midpoint(player_position), image=image)
+
+        x_min, y_min = self._to_pixel(visible_area[:2])
+        x_max, y_max = self._to_pixel(visible_area[2:])
+        self.coords(self._visible_item, x_min, y_min, x_max - 1, y_max - 1)
+
+        x_mid, y_mid = self._to_pixel(
+            (player_position[0] + 0.5, player_position[1] + 0.5)
+        )
+        self.coords(self._player_item, x_mid - 2, y_mid - 2, x_mid + 2, y_mid + 2)
+
+
+def _mix_colours(
+    first: str | tuple[int, int, int],
+    second: str | tuple[int, int, int],
+    amount: float,
+) -> tuple[int, int, int]:
+    """
+    Blend two colours together.
+
+    Args:
+        first (str | tuple[int, int, int]): The first colour, as a hex string
+            or RGB tuple.
+        second (str | tuple[int, int, int]): The second colour, as a hex
+            string or RGB tuple.
+        amount (float): How much of the second colour to use, from 0 to 1.
+
+    Returns:
+        tuple[int, int, int]: The blended RGB colour.
+    """
+    first = ImageColor.getrgb(first) if isinstance(first, str) else first
+    second = ImageColor.getrgb(second) if isinstance(second, str) else second
+    return tuple(
+        round(a + (b - a) * amount) for a, b in zip(first[:3], second[:3])
+    )
 
 
 class ItemView(tk.Frame):
@@ -230,19 +971,27 @@ class ItemView(tk.Frame):
             self._buy_label,
         ]
 
+        # The amount and colour currently shown, so that updates which change
+        # nothing don't touch any widgets
+        self._drawn_amount: Optional[int] = None
+        self._colour: Optional[str] = None
         self.update(self._amount)
 
     def update(self, amount: int, selected: bool = False) -> None:
         """
         Update the item view with the specified amount.
 
+        Widgets are only reconfigured if the amount or colour has changed.
+
         Args:
             amount (int): The new amount of the item.
             selected (bool, optional): Whether the item is currently selected.
                 Defaults to False.
         """
         self._amount = amount
-        self._item_label.config(text=f"{self._item_name}: {self._amount}")
+        if self._amount != self._drawn_amount:
+            self._item_label.config(text=f"{self._item_name}: {self._amount}")
+            self._drawn_amount = self._amount
 
         if self._amount <= 0:
             new_colour = INVENTORY_EMPTY_COLOUR
@@ -251,6 +1000,9 @@ class ItemView(tk.Frame):
         else:
             new_colour = INVENTORY_SELECTED_COLOUR
 
+        if new_colour == self._colour:
+            return
+        self._colour = new_colour
         self.config(bg=new_colour)
         for widget in self._sub_widgets:
             widget.config(bg=new_colour, highlightbackground=new_colour)
@@ -286,7 +1038,13 @@ class FarmGame:
     The FarmGame class is responsible for creating the model and view classes
     and handling the main game loop."""
 
-    def __init__(self, master: tk.Tk, map_file: str) -> None:
+    def __init__(
+        self,
+        master: tk.Tk,
+        map_file: str,
+        latency_monitor: Optional[LatencyMonitor] = None,
+        action_log: Optional[ActionLog] = None,
+    ) -> None:
         """
         Initialize the FarmGame.
 
@@ -294,15 +1052,27 @@ class FarmGame:
             master (tk.Tk): The master Tk widget for the FarmGame to instansiate
                 views into.
             map_file (str): The file path to the map.
+            latency_monitor (Optional[LatencyMonitor], optional): If given,
+                records the latency of every action and shows it over the
+                farm view. Defaults to None.
+            action_log (Optional[ActionLog], optional): If given, records every
+                action in the game to this log. Defaults to None.
         """
         self._master = master
         self._master.title("Farm Game")
+        self._latency = latency_monitor
 
         self._model = FarmModel(map_file)
-
-        # Retrieve and display the header banner
-        self._title_banner_img = get_image(
-            "images/header.png", (FARM_WIDTH + INVENTORY_WIDTH, BANNER_HEIGHT)
+        if action_log is not None:
+            action_log.attach(self._model)
+        # Every step of the game is committed to the history once it is done,
+        # so that it can be undone
+        self._history = History(self._model)
+
+        # Display the header banner, which is blank until it has been loaded
+        self._title_banner_size = (FARM_WIDTH + INVENTORY_WIDTH, BANNER_HEIGHT)
+        self._title_banner_img = tk.PhotoImage(
+            width=self._title_banner_size[0], height=self._title_banner_size[1]
         )
         self._title_banner_label = tk.Label(
             self._master, image=self._title_banner_img
@@ -318,6 +1088,7 @@ class FarmGame:
             self._game_stack,
             self._model.get_dimensions(),
             (FARM_WIDTH, FARM_WIDTH),
+            (VIEWPORT_SIZE, VIEWPORT_SIZE),
         )
         self._farm_view.pack(side="left")
 
@@ -325,6 +1096,15 @@ class FarmGame:
         self._item_view_stack = tk.Frame(self._game_stack)
         self._item_view_stack.pack(side="right", anchor="n")
 
+        # Load the sprites in the background. The tiles and player are needed
+        # for the first frame, so are loaded before the banner and plants
+        sprites = [
+            (sprite, self._farm_view.get_cell_size()) for sprite in find_sprites()
+        ]
+        sprites.insert(len(IMAGES), (BANNER_IMAGE, self._title_banner_size))
+        self._preloader = SpritePreloader(self._master)
+        self._preloader.preload(sprites, self._sprites_loaded)
+
         # Instansiate and pack the item views
         self._item_views: list[ItemView] = []
         player_inventory = self._model.get_player().get_inventory()
@@ -351,6 +1131,14 @@ class FarmGame:
         self._info_bar = InfoBar(self._master)
         self._info_bar.pack(side="bottom")
 
+        # The minimap is only created when opened with the "m" key
+        self._minimap: Optional[MiniMap] = None
+
+        # Actions only mark the views as out of date. A single scheduled
+        # redraw then catches up with every action since the last frame
+        self._redraw_job: Optional[str] = None
+        self._last_redraw = 0.0
+
         # Redraw t o encsure everything is drawn with the correct information
         # from frame 1
         self.redraw()
@@ -358,6 +1146,14 @@ class FarmGame:
         # Bind keypress
         self._master.bind("<KeyPress>", self.handle_keypress)
 
+        # Re-layout the views whenever the window is resized
+        self._layout_size = None
+        self._layout_job = None
+        self._master.bind("<Configure>", self._on_configure)
+
+        if self._latency is not None:
+            self._update_latency_overlay()
+
     def handle_keypress(self, event: tk.Event) -> None:
         """
         Handle keypress events.
@@ -365,6 +1161,7 @@ class FarmGame:
         Args:
             event (tk.Event): The keypress event.
         """
+        self._begin_event(event.char)
         player = self._model.get_player()
         inventory = player.get_inventory()
         player_pos = self._model.get_player_position()
@@ -406,42 +1203,259 @@ class FarmGame:
             self._model.till_soil(self._model.get_player_position())
         elif event.char == "u":
             self._model.untill_soil(self._model.get_player_position())
+        elif event.char == "m":
+            self._toggle_minimap()
+
+        # Handle time travel
+        elif event.char == "z":
+            self._history.undo()
+        elif event.char == "y":
+            self._history.redo()
+        elif event.char == "j":
+            day = simpledialog.askinteger(
+                "Jump to day", "Day:", parent=self._master, minvalue=1
+            )
+            if day is not None:
+                self._history.jump_to_day(day)
         else:
             # We don't need to redraw if nothing happened
+            self._cancel_event()
+            return
+
+        self._end_action()
+        self.schedule_redraw()
+
+    def _begin_event(self, action: str) -> None:
+        """
+        Mark the arrival of an event, if latency is being recorded.
+
+        Args:
+            action (str): The name of the action the event triggers.
+        """
+        if self._latency is not None:
+            self._latency.begin_event(action)
+
+    def _cancel_event(self) -> None:
+        """Forget the current event, if latency is being recorded."""
+        if self._latency is not None:
+            self._latency.cancel_event()
+
+    def _end_action(self) -> None:
+        """Mark the end of the current event's model action, committing it to
+        the history and marking it if latency is being recorded."""
+        self._history.commit()
+        if self._latency is not None:
+            self._latency.end_action()
+
+    def _time_view(self, name: str) -> ContextManager[None]:
+        """
+        Time a view's redraw, if latency is being recorded.
+
+        Args:
+            name (str): The name of the view.
+
+        Returns:
+            ContextManager[None]: A context which times its body.
+        """
+        if self._latency is not None:
+            return self._latency.time_view(name)
+        return contextlib.nullcontext()
+
+    def _update_latency_overlay(self) -> None:
+        """Show the latest latency percentiles over the farm view, and
+        schedule the next update."""
+        self._farm_view.show_overlay(self._latency.format_overlay())
+        self._master.after(LATENCY_OVERLAY_INTERVAL, self._update_latency_overlay)
+
+    def _sprites_loaded(
+        self, sprites: list[tuple[str, tuple[int, int]]]
+    ) -> None:
+        """
+        Preloader callback, which swaps loaded sprites in for placeholders.
+
+        Args:
+            sprites (list[tuple[str, tuple[int, int]]]): The (image path, size)
+                of each sprite which has been loaded.
+        """
+        image_names = [image_name for image_name, _ in sprites]
+        if BANNER_IMAGE in image_names:
+            image_names.remove(BANNER_IMAGE)
+            self._show_banner()
+
+        if image_names:
+            # Recheck every visible cell, as any of them may be a placeholder
+            self._farm_view.redraw(
+                self._model.get_map(),
+                self._model.get_plants(),
+                self._model.get_player_position(),
+                self._model.get_player_direction(),
+            )
+
+    def _show_banner(self) -> None:
+        """Show the header banner at its current size, unless it is still
+        being loaded in the background."""
+        banner = SPRITE_CACHE.get_photo(
+            BANNER_IMAGE, self._title_banner_size, wait=False
+        )
+        if banner is not None:
+            self._title_banner_img = banner
+            self._title_banner_label.config(image=self._title_banner_img)
+
+    def _on_configure(self, event: tk.Event) -> None:
+        """
+        Schedule a re-layout when the window is resized.
+
+        The layout is delayed until the window stops changing size, so
+        dragging the edge of the window does not re-layout for every
+        intermediate size.
+
+        Args:
+            event (tk.Event): The configure event.
+        """
+        if event.widget is not self._master:
+            return
+        size = (event.width, event.height)
+        if size == self._layout_size:
             return
+        if self._layout_job is not None:
+            self._master.after_cancel(self._layout_job)
+        self._layout_job = self._master.after(RESIZE_DELAY, self._layout, size)
 
+    def _layout(self, size: tuple[int, int]) -> None:
+        """
+        Resize every view to fit a window of the specified size.
+
+        Args:
+            size (tuple[int, int]): The (width, height) of the window.
+        """
+        self._layout_job = None
+        self._layout_size = size
+        width, height = size
+        farm_width = max(
+            MIN_FARM_WIDTH,
+            min(
+                width - INVENTORY_WIDTH,
+                height - BANNER_HEIGHT - INFO_BAR_HEIGHT - DAY_BUTTON_HEIGHT,
+            ),
+        )
+
+        if (width, BANNER_HEIGHT) != self._title_banner_size:
+            self._title_banner_size = (width, BANNER_HEIGHT)
+            self._show_banner()
+
+        if (farm_width, farm_width) != self._farm_view.get_size():
+            self._farm_view.set_size((farm_width, farm_width))
+            self._farm_view.redraw(
+                self._model.get_map(),
+                self._model.get_plants(),
+                self._model.get_player_position(),
+                self._model.get_player_direction(),
+            )
+            for item_view in self._item_views:
+                item_view.config(height=farm_width // len(ITEMS))
+
+        self._info_bar.set_size((width, INFO_BAR_HEIGHT))
+
+    def _toggle_minimap(self) -> None:
+        """Open the minimap in its own window, or close it if it is open."""
+        if self._minimap is not None:
+            self._minimap.master.destroy()
+            self._minimap = None
+            return
+
+        window = tk.Toplevel(self._master)
+        window.title("Farm Overview")
+        window.resizable(False, False)
+        window.protocol("WM_DELETE_WINDOW", self._toggle_minimap)
+        window.bind("<KeyPress>", self.handle_keypress)
+        self._minimap = MiniMap(
+            window,
+            self._model.get_dimensions(),
+            (MINIMAP_SIZE, MINIMAP_SIZE),
+        )
+        self._minimap.pack()
+
+    def schedule_redraw(self) -> None:
+        """
+        Schedule a redraw of all views, unless one is already scheduled.
+
+        The redraw runs once tkinter has handled all pending events, so a burst
+        of key presses (such as from auto-repeat) is applied to the model one
+        by one but drawn only once. Redraws are also spaced at least
+        FRAME_INTERVAL milliseconds apart.
+        """
+        if self._redraw_job is not None:
+            return
+        elapsed = (time.perf_counter() - self._last_redraw) * 1000
+        if elapsed < FRAME_INTERVAL:
+            self._redraw_job = self._master.after(
+                round(FRAME_INTERVAL - elapsed), self._scheduled_redraw
+            )
+        else:
+            self._redraw_job = self._master.after_idle(self._scheduled_redraw)
+
+    def _scheduled_redraw(self) -> None:
+        """Run a redraw scheduled by schedule_redraw."""
+        self._redraw_job = None
         self.redraw()
 
     def _next_day(self) -> None:
         """Advance model to the next day and redraw views."""
+        self._begin_event("next_day")
         self._model.new_day()
-        self.redraw()
+        self._end_action()
+        self.schedule_redraw()
 
     def redraw(self) -> None:
         """Redraw all views with latest information from the model."""
-        player = self._model.get_player()
-        self._info_bar.redraw(
-            self._model.get_days_elapsed(),
-            player.get_money(),
-            player.get_energy(),
-        )
+        self._last_redraw = time.perf_counter()
+        if self._latency is not None:
+            self._latency.begin_frame()
 
-        self._farm_view.redraw(
-            self._model.get_map(),
-            self._model.get_plants(),
-            self._model.get_player_position(),
-            self._model.get_player_direction(),
-        )
+        player = self._model.get_player()
+        with self._time_view("info_bar"):
+            self._info_bar.redraw(
+                self._model.get_days_elapsed(),
+                player.get_money(),
+                player.get_energy(),
+            )
 
-        for item_view in self._item_views:
-            item_name = item_view.get_item_name()
-            item_view.update(
-                player.get_inventory()[item_name]
-                if item_name in player.get_inventory()
-                else 0,
-                player.get_selected_item() == item_name,
+        changed = self._model.pop_changed_positions()
+        with self._time_view("farm_view"):
+            self._farm_view.redraw(
+                self._model.get_map(),
+                self._model.get_plants(),
+                self._model.get_player_position(),
+                self._model.get_player_direction(),
+                changed,
             )
 
+        if self._minimap is not None:
+            with self._time_view("minimap"):
+                self._minimap.redraw(
+                    self._model.get_map(),
+                    self._model.get_plants(),
+                    self._model.get_player_position(),
+                    self._farm_view.get_visible_area(),
+                    changed,
+                )
+
+        with self._time_view("item_views"):
+            for item_view in self._item_views:
+                item_name = item_view.get_item_name()
+                item_view.update(
+                    player.get_inventory()[item_name]
+                    if item_name in player.get_inventory()
+                    else 0,
+                    player.get_selected_item() == item_name,
+                )
+
+        if self._latency is not None:
+            self._latency.end_frame()
+            # Idle callbacks run in order, so this runs after tkinter has
+            # repainted everything changed by this redraw
+            self._master.after_idle(self._latency.mark_idle)
+
     def select_item(self, item_name: str):
         """
         Selection callback for ItemViews.
@@ -451,8 +1465,10 @@ class FarmGame:
         Args:
             item_name (str): The name of the item to select.
         """
+        self._begin_event("select")
         self._model.get_player().select_item(item_name)
-        self.redraw()
+        self._end_action()
+        self.schedule_redraw()
 
     def buy_item(self, item_name: str):
         """
@@ -464,9 +1480,11 @@ class FarmGame:
         Args:
             item_name (str): The name of the item to buy.
         """
+        self._begin_event("buy")
         player = self._model.get_player()
         player.buy(item_name, BUY_PRICES[item_name])
-        self.redraw()
+        self._end_action()
+        self.schedule_redraw()
 
     def sell_item(self, item_name: str):
         """
@@ -477,39 +1495,114 @@ class FarmGame:
         Args:
             item_name (str): The name of the item to sell.
         """
+        self._begin_event("sell")
         player = self._model.get_player()
         player.sell(item_name, SELL_PRICES[item_name])
-        self.redraw()
+        self._end_action()
+        self.schedule_redraw()
+
 
+def profile_game(profiler: Profiler) -> None:
+    """
+    Choose the hot paths of the model and views to profile.
 
-def play_game(root: tk.Tk, map_file: str) -> None:
+    Args:
+        profiler (Profiler): The profiler to add them to.
+    """
+    profile_model(profiler)
+    profiler.add_targets(FarmView, "redraw")
+    profiler.add_targets(MiniMap, "redraw")
+    profiler.add_targets(InfoBar, "redraw")
+    profiler.add_targets(ItemView, "update")
+    profiler.add_targets(SpriteCache, "get_photo", "get_image")
+
+
+def play_game(
+    root: tk.Tk,
+    map_file: str,
+    latency_file: Optional[str] = None,
+    log_file: Optional[str] = None,
+    profile_file: Optional[str] = None,
+) -> None:
     """
     Play the farm game.
 
     Args:
         root (tk.Tk): The root tkinter window.
         map_file (str): The file path to the map.
+        latency_file (Optional[str], optional): If given, latency is recorded
+            and its percentiles are written to this JSON file once the game
+            is closed. Defaults to None.
+        log_file (Optional[str], optional): If given, every action is recorded
+            to this action log, which can be replayed with actionlog.py.
+            Defaults to None.
+        profile_file (Optional[str], optional): If given, the hot paths of the
+            game are profiled, and their statistics are written to this file
+            once the game is closed: as JSON if its name ends with ".json",
+            and otherwise as a cProfile dump. Defaults to None.
     """
-    game = FarmGame(root, map_file)
+    latency_monitor = LatencyMonitor() if latency_file is not None else None
+    action_log = ActionLog(log_file) if log_file is not None else None
+    profiler = None
+    if profile_file is not None:
+        profiler = Profiler()
+        profile_game(profiler)
+        profiler.enable()
+    game = FarmGame(root, map_file, latency_monitor, action_log)
     root.mainloop()
+    if action_log is not None:
+        action_log.close()
+    if profiler is not None:
+        profiler.disable()
+        if profile_file.endswith(".json"):
+            profiler.dump_json(profile_file)
+        else:
+            profiler.dump_stats(profile_file)
+    if latency_monitor is not None:
+        latency_monitor.dump_json(latency_file)
 
 
 def main() -> None:
     """
     Entry point of the farm game program.
 
-    Creates a Tkinter root window, sets the window dimensions, and launches the game.
-    The game is played using the map file "maps/map1.txt".
+    Creates a resizable Tkinter root window, sets the initial window dimensions,
+    and launches the game.
+    The game is played using the map file "maps/map1.txt", unless another is
+    given with --map. Keypress latency is recorded if --latency is given,
+    every action is recorded if --log is given, and the hot paths are profiled
+    if --profile is given.
     """
+    parser = argparse.ArgumentParser(description="Play the farm game.")
+    parser.add_argument("--map", default="maps/map1.txt", help="map file to play")
+    parser.add_argument(
+        "--latency",
+        metavar="FILE",
+        help="record keypress latency and write its percentiles to FILE",
+    )
+    parser.add_argument(
+        "--log", metavar="FILE", help="record every action to an action log FILE"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="profile the game and write its statistics to FILE "
+        "(JSON if it ends with .json, otherwise a cProfile dump)",
+    )
+    args = parser.parse_args()
+
     root = tk.Tk()
 
     WINDOW_WIDTH = FARM_WIDTH + INVENTORY_WIDTH
-    WINDOW_HEIGHT = BANNER_HEIGHT + FARM_WIDTH + INFO_BAR_HEIGHT + 30
+    WINDOW_HEIGHT = BANNER_HEIGHT + FARM_WIDTH + INFO_BAR_HEIGHT + DAY_BUTTON_HEIGHT
 
     root.geometry(f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}")
-    root.resizable(False, False)
+    root.minsize(
+        MIN_FARM_WIDTH + INVENTORY_WIDTH,
+        BANNER_HEIGHT + MIN_FARM_WIDTH + INFO_BAR_HEIGHT + DAY_BUTTON_HEIGHT,
+    )
 
-    play_game(root, "maps/map1.txt")
+    play_game(root, args.map, args.latency, args.log, args.profile)
 
 
 if __name__ == "__main__":
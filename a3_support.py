@@ -1,6 +1,12 @@
+import hashlib
+import math
+import os
+import queue
+import threading
 import tkinter as tk
+from collections import OrderedDict
 from PIL import ImageTk, Image
-from typing import Union
+from typing import Callable, Optional, Union
 from constants import *
 
 def read_map(map_file: str) -> list[str]:
@@ -33,6 +39,288 @@ def get_plant_image_name(plant: 'Plant') -> str:
     """
     return f'plants/{plant.get_name()}/stage_{plant.get_stage()}.png'
 
+class SpriteCache:
+    """ A bounded cache of sprites, keyed by (image path, size).
+
+        Resized PIL images and the PhotoImages made from them are each kept in
+        a least recently used order, and the oldest entries are evicted once
+        either holds more than the maximum number of entries. Behind the
+        memory cache, resized images are saved as PNGs in a cache directory,
+        so later runs can skip decoding and resampling the full size image.
+
+        Each source image is decoded once into a pyramid of power-of-two
+        scales of itself. A sprite of any size is resampled from the smallest
+        level at least as large as it, so new sizes (such as while a window is
+        being resized) cost one cheap resample rather than a decode. A
+        pyramid is kept only while the cache holds a resized image made from
+        it, so it is evicted along with the last of them.
+    """
+
+    def __init__(
+            self,
+            max_entries: int = SPRITE_CACHE_SIZE,
+            cache_dir: Optional[str] = SPRITE_CACHE_DIR
+        ) -> None:
+        """ Constructor for SpriteCache.
+
+        Parameters:
+            max_entries: The most images (and photo images) to keep in memory.
+            cache_dir: The directory for resized images, or None to disable
+                the on-disk cache.
+        """
+        self._max_entries = max_entries
+        self._cache_dir = cache_dir
+        self._images: OrderedDict[tuple, Image.Image] = OrderedDict()
+        self._photos: OrderedDict[tuple, ImageTk.PhotoImage] = OrderedDict()
+        self._stats = dict.fromkeys((
+            'photo_hits',
+            'photo_misses',
+            'image_hits',
+            'image_misses',
+            'disk_hits',
+            'evictions',
+        ), 0)
+        # Maps each image path to its pyramid, which maps each level k to the
+        # source image scaled by 2 ** -k
+        self._pyramids: dict[str, dict[int, Image.Image]] = {}
+        # The number of resized images in the cache from each image path
+        self._image_counts: dict[str, int] = {}
+        # Keys which a SpritePreloader is loading in the background
+        self._pending: set[tuple] = set()
+        # Guards the entries, stats and pending keys, as PIL images may be
+        # loaded from a background thread
+        self._lock = threading.Lock()
+
+    def get_stats(self) -> dict[str, int]:
+        """ Returns the number of hits and misses for photo images and PIL
+            images, the number of misses served from disk, and the number of
+            evictions.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self) -> None:
+        """ Empties the memory cache. The on-disk cache is kept. """
+        with self._lock:
+            self._images.clear()
+            self._photos.clear()
+            self._pyramids.clear()
+            self._image_counts.clear()
+
+    def set_pending(
+            self,
+            image_name: str,
+            size: tuple[int, int],
+            pending: bool
+        ) -> None:
+        """ Marks whether the image is being loaded in the background. While it
+            is, get_image and get_photo return None rather than waiting when
+            called with wait=False.
+
+        Parameters:
+            image_name: The path to the image.
+            size: The size the image is being resized to.
+            pending: Whether the image is being loaded in the background.
+        """
+        key = (image_name, tuple(size))
+        with self._lock:
+            if pending:
+                self._pending.add(key)
+            else:
+                self._pending.discard(key)
+
+    def _lookup(self, entries: OrderedDict, key: tuple) -> Optional[object]:
+        """ Returns the entry for key, marking it as most recently used, or
+            None if there is no such entry.
+        """
+        entry = entries.get(key)
+        if entry is not None:
+            entries.move_to_end(key)
+        return entry
+
+    def _store(
+            self,
+            entries: OrderedDict,
+            key: tuple,
+            entry: object
+        ) -> Optional[tuple]:
+        """ Adds an entry, evicting the least recently used entry if the cache
+            is full.
+
+        Returns:
+            The key of the evicted entry, or None if none was evicted.
+        """
+        entries[key] = entry
+        if len(entries) > self._max_entries:
+            evicted, _ = entries.popitem(last=False)
+            self._stats['evictions'] += 1
+            return evicted
+        return None
+
+    def _store_image(self, key: tuple, image: Image.Image) -> None:
+        """ Adds a resized image, evicting the pyramid of any image path with
+            no resized images left in the cache. Must be called holding the
+            lock.
+        """
+        if key not in self._images:
+            self._image_counts[key[0]] = self._image_counts.get(key[0], 0) + 1
+        evicted = self._store(self._images, key, image)
+        if evicted is not None:
+            image_name = evicted[0]
+            self._image_counts[image_name] -= 1
+            if not self._image_counts[image_name]:
+                del self._image_counts[image_name]
+                self._pyramids.pop(image_name, None)
+
+    def _get_disk_path(
+            self,
+            image_name: str,
+            size: tuple[int, int]
+        ) -> Optional[str]:
+        """ Returns the path of the resized image in the cache directory. The
+            name depends on the source's modification time, so editing an
+            image invalidates its cached copies.
+        """
+        if self._cache_dir is None:
+            return None
+        source = os.path.abspath(image_name)
+        key = f'{source}|{os.stat(source).st_mtime_ns}|{size[0]}x{size[1]}'
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self._cache_dir, f'{digest}.png')
+
+    def _get_level(
+            self,
+            pyramid: dict[int, Image.Image],
+            level: int
+        ) -> Image.Image:
+        """ Returns the given level of a pyramid, building it (and any levels
+            between it and the source image) if necessary.
+        """
+        if level not in pyramid:
+            if level > 0:
+                image = self._get_level(pyramid, level - 1).reduce(2)
+            else:
+                larger = self._get_level(pyramid, level + 1)
+                image = larger.resize(
+                    (larger.width * 2, larger.height * 2), Image.BICUBIC
+                )
+            with self._lock:
+                pyramid.setdefault(level, image)
+        return pyramid[level]
+
+    def _resample(self, image_name: str, size: tuple[int, int]) -> Image.Image:
+        """ Resamples the image to size from the nearest level of its pyramid
+            which is no smaller than size, decoding the source image only if
+            it has no pyramid yet.
+        """
+        with self._lock:
+            pyramid = self._pyramids.get(image_name)
+        if pyramid is None:
+            source = Image.open(image_name).convert('RGBA')
+            with self._lock:
+                pyramid = self._pyramids.setdefault(image_name, {0: source})
+
+        source = pyramid[0]
+        scale = max(size[0] / source.width, size[1] / source.height)
+        level = math.floor(-math.log2(scale))
+        # Don't reduce any dimension below a single pixel
+        while level > 0 and min(source.size) >> level < 1:
+            level -= 1
+        return self._get_level(pyramid, level).resize(size, Image.BILINEAR)
+
+    def _load(self, image_name: str, size: tuple[int, int]) -> Image.Image:
+        """ Loads the resized image from the on-disk cache if it is there,
+            otherwise resamples it from the image's pyramid. Images which
+            needed the source image to be decoded are saved to the cache; later
+            sizes are cheap to resample, so are not.
+        """
+        disk_path = self._get_disk_path(image_name, size)
+        if disk_path is not None and os.path.exists(disk_path):
+            image = Image.open(disk_path)
+            image.load()
+            with self._lock:
+                self._stats['disk_hits'] += 1
+            return image
+
+        with self._lock:
+            decoded = image_name not in self._pyramids
+        image = self._resample(image_name, size)
+        if disk_path is not None and decoded:
+            try:
+                os.makedirs(self._cache_dir, exist_ok=True)
+                temp_path = f'{disk_path}.{os.getpid()}.tmp'
+                image.save(temp_path, 'PNG')
+                os.replace(temp_path, disk_path)
+            except OSError:
+                # The on-disk cache is only an optimisation
+                pass
+        return image
+
+    def get_image(
+            self,
+            image_name: str,
+            size: tuple[int, int],
+            wait: bool = True
+        ) -> Optional[Image.Image]:
+        """ Returns the RGBA PIL image for image_name, resized to size. Safe to
+            call from any thread.
+
+        Parameters:
+            image_name: The path to the image to load.
+            size: The size to resize the image to, as (width, height).
+            wait: If False, returns None rather than waiting for an image
+                which is still being loaded in the background.
+        """
+        key = (image_name, tuple(size))
+        with self._lock:
+            image = self._lookup(self._images, key)
+            if image is not None:
+                self._stats['image_hits'] += 1
+                return image
+            if not wait and key in self._pending:
+                return None
+            self._stats['image_misses'] += 1
+
+        # Load outside of the lock, so other threads are not held up
+        image = self._load(image_name, key[1])
+        with self._lock:
+            self._store_image(key, image)
+        return image
+
+    def get_photo(
+            self,
+            image_name: str,
+            size: tuple[int, int],
+            wait: bool = True
+        ) -> Optional[ImageTk.PhotoImage]:
+        """ Returns the PhotoImage for image_name, resized to size. Must only be
+            called from the thread running the tkinter main loop.
+
+        Parameters:
+            image_name: The path to the image to load.
+            size: The size to resize the image to, as (width, height).
+            wait: If False, returns None rather than waiting for an image
+                which is still being loaded in the background.
+        """
+        key = (image_name, tuple(size))
+        with self._lock:
+            photo = self._lookup(self._photos, key)
+            if photo is not None:
+                self._stats['photo_hits'] += 1
+                return photo
+
+        image = self.get_image(image_name, key[1], wait)
+        if image is None:
+            return None
+        photo = ImageTk.PhotoImage(image=image)
+        with self._lock:
+            self._stats['photo_misses'] += 1
+            self._store(self._photos, key, photo)
+        return photo
+
+# The process-wide cache used when no other cache is given
+SPRITE_CACHE = SpriteCache()
+
 def get_image(
         image_name: str,
         size: tuple[int, int],
@@ -44,18 +332,132 @@ def get_image(
     Parameters:
         image_name: The path to the image to load.
         size: The size to resize the image to, as (width, height).
-        cache: The cache to use. If None, no caching is performed.
+        cache: The cache to use, keyed only by image_name. If None, the
+            process-wide SPRITE_CACHE is used.
 
     Returns:
         The image for the given image_name, resized appropriately.
     """
-    if cache is None or image_name not in cache:
-        image = ImageTk.PhotoImage(image=Image.open(image_name).resize(size))
-        if cache is not None:
-            cache[image_name] = image
-    elif image_name in cache:
-        return cache[image_name]
-    return image
+    if cache is None:
+        return SPRITE_CACHE.get_photo(image_name, size)
+    if image_name not in cache:
+        cache[image_name] = ImageTk.PhotoImage(
+            image=SPRITE_CACHE.get_image(image_name, size)
+        )
+    return cache[image_name]
+
+def find_sprites(images_dir: str = 'images') -> list[str]:
+    """ Returns the paths of every sprite used on the farm: the tiles and
+        player images in IMAGES, followed by every stage of every plant.
+
+    Parameters:
+        images_dir: The directory containing the images.
+    """
+    sprites = [f'{images_dir}/{name}' for name in IMAGES.values()]
+    plants_dir = f'{images_dir}/plants'
+    for plant_name in sorted(os.listdir(plants_dir)):
+        stages = sorted(os.listdir(f'{plants_dir}/{plant_name}'))
+        sprites.extend(
+            f'{plants_dir}/{plant_name}/{stage}' for stage in stages
+            if stage.startswith('stage_') and stage.endswith('.png')
+        )
+    return sprites
+
+class SpritePreloader:
+    """ Loads sprites into a SpriteCache on a background thread.
+
+        Decoding and resizing with PIL happens on the worker thread. Only
+        creating the PhotoImages, which tkinter requires to happen on the
+        main thread, is done by polling from the tkinter main loop, after which
+        the callback is told which sprites have arrived.
+    """
+
+    def __init__(
+            self,
+            widget: tk.Misc,
+            cache: SpriteCache = SPRITE_CACHE,
+            poll_interval: int = PRELOAD_POLL_INTERVAL
+        ) -> None:
+        """ Constructor for SpritePreloader.
+
+        Parameters:
+            widget: Any widget, used to schedule polling on the main loop.
+            cache: The cache to load the sprites into.
+            poll_interval: Milliseconds between checks for loaded sprites.
+        """
+        self._widget = widget
+        self._cache = cache
+        self._poll_interval = poll_interval
+        # The (image path, size) of each sprite the worker has finished with,
+        # and whether it loaded successfully
+        self._loaded: queue.Queue[tuple[str, tuple[int, int], bool]] = (
+            queue.Queue()
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._callback = None
+
+    def preload(
+            self,
+            sprites: list[tuple[str, tuple[int, int]]],
+            callback: Callable[[list[tuple[str, tuple[int, int]]]], None]
+        ) -> None:
+        """ Starts loading the given sprites in the background.
+
+        Parameters:
+            sprites: The (image path, size) of each sprite to load, in the
+                order they should be loaded.
+            callback: Called on the main thread with the (image path, size) of
+                each batch of sprites which have become available.
+        """
+        for image_name, size in sprites:
+            self._cache.set_pending(image_name, size, True)
+        self._callback = callback
+        self._thread = threading.Thread(
+            target=self._load, args=(sprites,), daemon=True
+        )
+        self._thread.start()
+        self._widget.after(self._poll_interval, self._poll)
+
+    def is_done(self) -> bool:
+        """ Returns True iff every sprite has been loaded and handed over. """
+        return (
+            self._thread is not None
+            and not self._thread.is_alive()
+            and self._loaded.empty()
+        )
+
+    def _load(self, sprites: list[tuple[str, tuple[int, int]]]) -> None:
+        """ Decodes and resizes each sprite. Runs on the worker thread. A
+            sprite which fails to load is reported as failed, rather than
+            stopping the thread.
+        """
+        for image_name, size in sprites:
+            try:
+                self._cache.get_image(image_name, size)
+            except Exception:
+                self._loaded.put((image_name, size, False))
+            else:
+                self._loaded.put((image_name, size, True))
+
+    def _poll(self) -> None:
+        """ Creates the PhotoImages for sprites loaded since the last poll and
+            passes them to the callback. Runs on the main thread. Sprites which
+            failed to load are skipped, and are left to be loaded when they
+            are drawn.
+        """
+        done = not self._thread.is_alive()
+        batch = []
+        while not self._loaded.empty():
+            image_name, size, loaded = self._loaded.get()
+            self._cache.set_pending(image_name, size, False)
+            if not loaded:
+                continue
+            self._cache.get_photo(image_name, size)
+            batch.append((image_name, size))
+        if batch:
+            self._callback(batch)
+        if not done:
+            self._widget.after(self._poll_interval, self._poll)
 
 class AbstractGrid(tk.Canvas):
     """ A type of tkinter Canvas that provides support for using the canvas as a
@@ -93,6 +495,19 @@ class AbstractGrid(tk.Canvas):
         """
         self._dimensions = dimensions
 
+    def set_size(self, size: tuple[int, int]) -> None:
+        """ Sets the size of the grid, resizing the canvas to match.
+
+        Parameters:
+            size: (width in pixels, height in pixels)
+        """
+        self._size = size
+        self.config(width=size[0] + 1, height=size[1] + 1)
+
+    def get_size(self) -> tuple[int, int]:
+        """ Returns the size of the grid (width, height) in pixels. """
+        return self._size
+
     def get_cell_size(self) -> tuple[int, int]:
         """ Returns the size of the cells (width, height) in pixels. """
         rows, cols = self._dimensions
@@ -0,0 +1,339 @@
+import argparse
+import queue
+import struct
+import threading
+import time
+from typing import Callable, Optional
+from constants import *
+from history import History
+from model import *
+
+# The first bytes of every action log, followed by the length of the map and
+# the map itself, as rows of text separated by newlines
+MAGIC = b"FARMLOG\x01"
+_LENGTH = struct.Struct("<I")
+
+# Each action is one record of: its opcode, a small argument (such as a
+# direction, plant type, item or policy, as an index), and four integers
+_RECORD = struct.Struct("<BB2xiiii")
+
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+_PLANT_CLASSES = (PotatoPlant, KalePlant, BerryPlant)
+
+# The opcode of each recorded method, by name. Those from commit onwards are
+# the methods of a History
+OPCODES = {
+    name: opcode
+    for opcode, name in enumerate(
+        (
+            "move_player",
+            "till_soil",
+            "untill_soil",
+            "add_plant",
+            "harvest_plant",
+            "remove_plant",
+            "new_day",
+            "advance_days",
+            "till_region",
+            "plant_region",
+            "harvest_region",
+            "remove_region",
+            "select_item",
+            "buy",
+            "sell",
+            "add_item",
+            "remove_item",
+            "commit",
+            "undo",
+            "redo",
+            "jump_to_day",
+        )
+    )
+}
+
+
+def _plant_type(plant: Plant) -> int:
+    """Get the index of a plant's type in _PLANT_CLASSES."""
+    for index, plant_class in enumerate(_PLANT_CLASSES):
+        if isinstance(plant, plant_class):
+            return index
+    raise ValueError(f"can't log a plant of type {type(plant).__name__}")
+
+
+def _encode(name: str, args: tuple) -> tuple[int, int, int, int, int]:
+    """
+    Encode the arguments of a recorded method as a record's fields.
+
+    Args:
+        name (str): The name of the method.
+        args (tuple): The arguments it was called with, after self.
+
+    Returns:
+        tuple[int, int, int, int, int]: The small argument and four integers.
+    """
+    if name == "move_player":
+        return DIRECTIONS.index(args[0]), 0, 0, 0, 0
+    if name == "add_plant":
+        position, plant = args
+        return _plant_type(plant), *position, 0, 0
+    if name in ("till_soil", "untill_soil", "harvest_plant", "remove_plant"):
+        return 0, *args[0], 0, 0
+    if name == "new_day":
+        return 0, 0, 0, 0, 0
+    if name == "advance_days":
+        days, policy = args
+        return POLICIES.index(policy), days, 0, 0, 0
+    if name == "plant_region":
+        top_left, bottom_right, seed = args
+        return ITEMS.index(seed), *top_left, *bottom_right
+    if name.endswith("_region"):
+        top_left, bottom_right = args
+        return 0, *top_left, *bottom_right
+    if name == "select_item":
+        return ITEMS.index(args[0]), 0, 0, 0, 0
+    if name in ("buy", "sell"):
+        item_name, price = args
+        return ITEMS.index(item_name), price, 0, 0, 0
+    if name in ("commit", "undo", "redo"):
+        return 0, 0, 0, 0, 0
+    if name == "jump_to_day":
+        return 0, args[0], 0, 0, 0
+    # add_item and remove_item
+    item_name, amount = args[0]
+    return ITEMS.index(item_name), amount, 0, 0, 0
+
+
+class ActionLog:
+    """Records every action which changes a game to an append-only binary
+    file, from which the game can be replayed.
+
+    The file starts with the map, and each action is then a fixed-width
+    record of 20 bytes. Records are collected in memory and handed to a
+    background thread to write once they fill a buffer, so recording an
+    action only packs a few integers.
+
+    Only the type of a plant added with add_plant is recorded, so it is
+    replayed as a new plant of that type (as the game always adds), and only
+    the items in ITEMS can be recorded."""
+
+    def __init__(self, path: str, buffer_size: int = ACTION_LOG_BUFFER) -> None:
+        """
+        Initialise the ActionLog, creating (or replacing) its file.
+
+        Args:
+            path (str): The path of the file to write.
+            buffer_size (int, optional): The number of bytes of records to
+                collect before writing them. Defaults to ACTION_LOG_BUFFER.
+        """
+        self._file = open(path, "wb")
+        self._buffer_size = buffer_size
+        self._buffer = bytearray()
+        self._attached = False
+        # Set while a recorded action is running, so that the actions it
+        # makes itself aren't recorded
+        self.recording = False
+        self._queue: queue.Queue[Optional[bytes]] = queue.Queue()
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+    def _write(self) -> None:
+        """Write each chunk of records from the queue, until a None."""
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            self._file.write(chunk)
+        self._file.close()
+
+    def attach(self, model: FarmModel) -> None:
+        """
+        Start recording the actions on a model, which should not have been
+        played yet.
+
+        Args:
+            model (FarmModel): The model to record.
+        """
+        if self._attached:
+            raise ValueError("an action log can only record one model")
+        self._attached = True
+        farm_map = "\n".join(model.get_map()).encode()
+        self._queue.put(MAGIC + _LENGTH.pack(len(farm_map)) + farm_map)
+        model.set_action_log(self)
+
+    def record(self, name: str, args: tuple) -> None:
+        """
+        Record an action.
+
+        Args:
+            name (str): The name of the method of FarmModel or Player called.
+            args (tuple): The arguments it was called with, after self.
+        """
+        self._buffer += _RECORD.pack(OPCODES[name], *_encode(name, args))
+        if len(self._buffer) >= self._buffer_size:
+            self._queue.put(self._buffer)
+            self._buffer = bytearray()
+
+    def flush(self) -> None:
+        """Hand any buffered records to the writer thread."""
+        if self._buffer:
+            self._queue.put(self._buffer)
+            self._buffer = bytearray()
+
+    def close(self) -> None:
+        """Write every record, and close the file."""
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+
+
+def _handlers(
+    model: FarmModel, history: Optional[History]
+) -> list[Callable[[int, int, int, int, int], None]]:
+    """
+    Get a function to replay each opcode on a model and its history (if the
+    log has one), indexed by opcode. The methods are called without the
+    wrappers which record them, as nothing is recorded while replaying.
+    """
+    player = model.get_player()
+
+    def unwrap(instance: object, name: str) -> Callable:
+        """Get a method of an instance, without its recording wrapper."""
+        return getattr(type(instance), name).__wrapped__.__get__(instance)
+
+    move_player = unwrap(model, "move_player")
+    till_soil = unwrap(model, "till_soil")
+    untill_soil = unwrap(model, "untill_soil")
+    add_plant = unwrap(model, "add_plant")
+    harvest_plant = unwrap(model, "harvest_plant")
+    remove_plant = unwrap(model, "remove_plant")
+    new_day = unwrap(model, "new_day")
+    advance_days = unwrap(model, "advance_days")
+    till_region = unwrap(model, "till_region")
+    plant_region = unwrap(model, "plant_region")
+    harvest_region = unwrap(model, "harvest_region")
+    remove_region = unwrap(model, "remove_region")
+    select_item = unwrap(player, "select_item")
+    buy = unwrap(player, "buy")
+    sell = unwrap(player, "sell")
+    add_item = unwrap(player, "add_item")
+    remove_item = unwrap(player, "remove_item")
+    handlers = [
+        lambda small, a, b, c, d: move_player(DIRECTIONS[small]),
+        lambda small, a, b, c, d: till_soil((a, b)),
+        lambda small, a, b, c, d: untill_soil((a, b)),
+        lambda small, a, b, c, d: add_plant((a, b), _PLANT_CLASSES[small]()),
+        lambda small, a, b, c, d: harvest_plant((a, b)),
+        lambda small, a, b, c, d: remove_plant((a, b)),
+        lambda small, a, b, c, d: new_day(),
+        lambda small, a, b, c, d: advance_days(a, POLICIES[small]),
+        lambda small, a, b, c, d: till_region((a, b), (c, d)),
+        lambda small, a, b, c, d: plant_region((a, b), (c, d), ITEMS[small]),
+        lambda small, a, b, c, d: harvest_region((a, b), (c, d)),
+        lambda small, a, b, c, d: remove_region((a, b), (c, d)),
+        lambda small, a, b, c, d: select_item(ITEMS[small]),
+        lambda small, a, b, c, d: buy(ITEMS[small], a),
+        lambda small, a, b, c, d: sell(ITEMS[small], a),
+        lambda small, a, b, c, d: add_item((ITEMS[small], a)),
+        lambda small, a, b, c, d: remove_item((ITEMS[small], a)),
+    ]
+    if history is not None:
+        commit = unwrap(history, "commit")
+        undo = unwrap(history, "undo")
+        redo = unwrap(history, "redo")
+        jump_to_day = unwrap(history, "jump_to_day")
+        handlers += [
+            lambda small, a, b, c, d: commit(),
+            lambda small, a, b, c, d: undo(),
+            lambda small, a, b, c, d: redo(),
+            lambda small, a, b, c, d: jump_to_day(a),
+        ]
+    return handlers
+
+
+def _read_log(path: str) -> tuple[list[str], memoryview]:
+    """
+    Read an action log.
+
+    Args:
+        path (str): The path of the log.
+
+    Returns:
+        tuple[list[str], memoryview]: The rows of the map, and the records of
+            every whole action, ignoring a record left partly written at the
+            end of the log.
+    """
+    with open(path, "rb") as file:
+        data = memoryview(file.read())
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not an action log")
+    start = len(MAGIC) + _LENGTH.size
+    (length,) = _LENGTH.unpack_from(data, len(MAGIC))
+    rows = bytes(data[start : start + length]).decode().split("\n")
+    records = data[start + length :]
+    return rows, records[: len(records) - len(records) % _RECORD.size]
+
+
+def replay(
+    path: str,
+    plant_store: Optional[MutableMapping] = None,
+    stop: Optional[int] = None,
+) -> FarmModel:
+    """
+    Rebuild a game from its action log, by making every recorded action on a
+    new model in order.
+
+    Args:
+        path (str): The path of the log.
+        plant_store (Optional[MutableMapping], optional): An empty store to
+            keep the plants in. Defaults to a PlantStore.
+        stop (Optional[int], optional): The number of actions to replay.
+            Defaults to every action.
+
+    Returns:
+        FarmModel: The game after the actions.
+    """
+    rows, records = _read_log(path)
+    if stop is not None:
+        records = records[: stop * _RECORD.size]
+    model = FarmModel(rows, plant_store)
+    # Games with a history record its actions from the start, so it is made
+    # before any actions are replayed
+    history = None
+    if records and max(records[:: _RECORD.size]) >= OPCODES["commit"]:
+        history = History(model)
+    handlers = _handlers(model, history)
+    for opcode, small, a, b, c, d in _RECORD.iter_unpack(records):
+        handlers[opcode](small, a, b, c, d)
+    return model
+
+
+def main() -> None:
+    """Replay an action log from the command line, and report its speed."""
+    parser = argparse.ArgumentParser(description="Replay a farm game action log.")
+    parser.add_argument("log", help="action log to replay")
+    parser.add_argument(
+        "--stop", type=int, default=None, help="number of actions to replay"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = replay(args.log, stop=args.stop)
+    elapsed = time.perf_counter() - start
+    count = len(_read_log(args.log)[1]) // _RECORD.size
+    if args.stop is not None:
+        count = min(count, args.stop)
+
+    player = model.get_player()
+    print(
+        f"day {model.get_days_elapsed()}: ${player.get_money()}, "
+        f"{player.get_energy()} energy, {len(model.get_plants())} plants, "
+        f"{dict(player.get_inventory())}"
+    )
+    print(
+        f"{count} actions in {elapsed:.3f}s "
+        f"({count / max(elapsed, 1e-9):,.0f} actions per second)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -16,11 +16,27 @@ MOVE_DELTAS = {
     UP: (-1, 0),
 }
 
+# Harvest policies for fast-forwarding several days at once
+NEVER_HARVEST = 'never'
+HARVEST_READY = 'harvest'
+HARVEST_AND_REPLANT = 'replant'
+POLICIES = (NEVER_HARVEST, HARVEST_READY, HARVEST_AND_REPLANT)
+
 # Colours
 INVENTORY_COLOUR = '#fdc074'
 INVENTORY_OUTLINE_COLOUR = '#d68f54'
 INVENTORY_SELECTED_COLOUR = '#d68f54'
 INVENTORY_EMPTY_COLOUR = 'grey'
+MINIMAP_COLOURS = {
+    GRASS: '#6aa84f',
+    SOIL: '#7f5130',
+    UNTILLED: '#c9a26b',
+}
+MINIMAP_PLANT_COLOUR = '#1e5b1e'
+MINIMAP_READY_COLOUR = '#f1c232'
+MINIMAP_VIEWPORT_COLOUR = 'white'
+MINIMAP_PLAYER_COLOUR = 'red'
+OVERLAY_COLOUR = 'white'
 
 # Images
 IMAGES = {
@@ -33,14 +49,72 @@ IMAGES = {
     RIGHT: 'player_d.png',
 }
 
+# Sprite caching
+SPRITE_CACHE_SIZE = 256
+SPRITE_CACHE_DIR = '.sprite_cache'
+PRELOAD_POLL_INTERVAL = 15
+
+BANNER_IMAGE = 'images/header.png'
+
 # Fonts
 HEADING_FONT = ('Helvetica', 15, 'bold')
+OVERLAY_FONT = ('Courier', 9)
+
+# Harvest route planning: routes to at most this many plants are planned
+# exactly, and the plants to harvest are bucketed into squares of this many
+# tiles to find those nearby
+PLANNER_EXACT_LIMIT = 10
+PLANNER_BUCKET_SIZE = 8
+
+# The width and height, in tiles, of the regions a plant index is split into
+PLANT_INDEX_REGION_SIZE = 16
+
+# The most memory, in bytes, that each plant on a fully planted farm of
+# 100,000 plants may take in the default plant store, including its position
+# and its entry in the store. Measured by running memory.py
+PLANT_BYTE_BUDGET = 192
+
+# Undo history: the most snapshots kept, and the width and height, in tiles,
+# of the pages a snapshot's map is split into
+HISTORY_LIMIT = 10000
+HISTORY_PAGE_SIZE = 16
+
+# The number of bytes of actions an action log collects before writing them
+ACTION_LOG_BUFFER = 64 * 1024
+
+# The address and port a farm server listens on by default
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+
+# The number of shards a sharded farm is split into for each of its worker
+# processes, so that a worker which finishes early can take another shard
+SHARDS_PER_WORKER = 4
+
+# Latency recording: samples kept per action, and milliseconds between
+# updates of the latency overlay
+LATENCY_SAMPLES = 1000
+LATENCY_OVERLAY_INTERVAL = 500
 
 # Dimensions
 FARM_WIDTH = 500
 INVENTORY_WIDTH = 200
 INFO_BAR_HEIGHT = 90
 BANNER_HEIGHT = 130
+DAY_BUTTON_HEIGHT = 30
+MIN_FARM_WIDTH = 200
+
+# The least number of milliseconds between scheduled redraws
+FRAME_INTERVAL = 16
+
+# Milliseconds to wait for the window to stop changing size before re-layout
+RESIZE_DELAY = 50
+
+# The most rows or columns the farm view shows at once. Larger farms are shown
+# through a camera which follows the player
+VIEWPORT_SIZE = 20
+
+# The width and height of the minimap, which shows the whole farm
+MINIMAP_SIZE = 200
 
 # Energy cost of actions (only applied if action was successful)
 MOVE_COST = 1
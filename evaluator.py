@@ -0,0 +1,282 @@
+import argparse
+import functools
+import glob
+import math
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+from a3_support import read_map
+from constants import *
+from model import *
+
+# The produce which strategies sell
+_PRODUCE = ("Potato", "Kale", "Berry")
+
+
+class Job(NamedTuple):
+    """One run of a strategy on a map."""
+
+    map_file: str
+    strategy: str
+    days: int
+    # The seed for the strategy's random choices
+    seed: int
+
+
+class JobResult(NamedTuple):
+    """The outcome of a Job."""
+
+    job: Job
+    # The money held at the end, including any produce sold
+    money: int
+    # The total amount of each item harvested
+    yields: dict[str, int]
+    # The time the run took, in seconds
+    seconds: float
+
+
+class Summary(NamedTuple):
+    """Statistics over the runs of one strategy on one map."""
+
+    runs: int
+    mean_money: float
+    stdev_money: float
+    min_money: int
+    max_money: int
+    # The mean amount of each item harvested per run
+    mean_yields: dict[str, float]
+
+
+def _grow(
+    model: FarmModel, rng: random.Random, seeds: tuple[str, ...]
+) -> dict[str, int]:
+    """
+    Play one day: harvest and sell everything, buy seeds of a type chosen
+    from seeds, plant them (and any other seeds held), and spend any energy
+    left on tilling.
+
+    Args:
+        model (FarmModel): The farm to play on.
+        rng (random.Random): The source of the strategy's random choices.
+        seeds (tuple[str, ...]): The seeds to choose between.
+
+    Returns:
+        dict[str, int]: The amount of each item harvested.
+    """
+    player = model.get_player()
+    inventory = player.get_inventory()
+    corner = tuple(size - 1 for size in model.get_dimensions())
+    harvested = model.harvest_region((0, 0), corner).yields
+    for item_name in _PRODUCE:
+        for _ in range(inventory.get(item_name, 0)):
+            player.sell(item_name, SELL_PRICES[item_name])
+
+    seed = rng.choice(seeds)
+    soil = sum(row.count(SOIL) for row in model.get_map())
+    held = sum(inventory.get(name, 0) for name in SEEDS)
+    free = soil - len(model.get_plants()) - held
+    for _ in range(min(free, player.get_money() // BUY_PRICES[seed])):
+        player.buy(seed, BUY_PRICES[seed])
+    for name in SEEDS:
+        if inventory.get(name, 0) > 0:
+            model.plant_region((0, 0), corner, name)
+    model.till_region((0, 0), corner)
+    return harvested
+
+
+# The strategies which can be evaluated, by name. Each plays one day on a
+# model, using a random number generator for any choices it makes
+STRATEGIES: dict[str, Callable[[FarmModel, random.Random], dict[str, int]]] = {
+    "potato": functools.partial(_grow, seeds=("Potato Seed",)),
+    "kale": functools.partial(_grow, seeds=("Kale Seed",)),
+    "berry": functools.partial(_grow, seeds=("Berry Seed",)),
+    "mixed": functools.partial(
+        _grow, seeds=("Potato Seed", "Kale Seed", "Berry Seed")
+    ),
+}
+
+# The strategies which make random choices. The others play the same way
+# with every seed, so are only run once on each map
+RANDOMISED = frozenset({"mixed"})
+
+# The maps each worker process has loaded
+_maps: dict[str, list[str]] = {}
+
+
+def _load_maps(map_files: Iterable[str]) -> None:
+    """Load maps into the current process, so that its jobs share them."""
+    for map_file in map_files:
+        _maps[map_file] = read_map(map_file)
+
+
+def run_job(job: Job) -> JobResult:
+    """
+    Run a strategy on a map for a number of days.
+
+    Args:
+        job (Job): The map, strategy, number of days and seed to run with.
+
+    Returns:
+        JobResult: The money and yields at the end.
+    """
+    start = time.perf_counter()
+    if job.map_file not in _maps:
+        _load_maps([job.map_file])
+    model = FarmModel(_maps[job.map_file])
+    strategy = STRATEGIES[job.strategy]
+    rng = random.Random(job.seed)
+    yields = {}
+    for _ in range(job.days):
+        for item_name, amount in strategy(model, rng).items():
+            yields[item_name] = yields.get(item_name, 0) + amount
+        model.new_day()
+    money = model.get_player().get_money()
+    for item_name, amount in model.get_player().get_inventory().items():
+        if item_name in _PRODUCE:
+            money += amount * SELL_PRICES[item_name]
+    return JobResult(job, money, yields, time.perf_counter() - start)
+
+
+def _run_batch(jobs: list[Job]) -> list[JobResult]:
+    """Run several jobs in a worker, to share the cost of sending them."""
+    return [run_job(job) for job in jobs]
+
+
+def evaluate(
+    jobs: Iterable[Job],
+    workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> Iterator[JobResult]:
+    """
+    Run jobs across a pool of worker processes, each of which loads every
+    map once when it starts.
+
+    Args:
+        jobs (Iterable[Job]): The jobs to run.
+        workers (Optional[int], optional): The number of worker processes.
+            Defaults to the number of processors.
+        batch_size (Optional[int], optional): The number of jobs to send to a
+            worker at once. Defaults to splitting the jobs into about 8
+            batches per worker, which keeps every worker busy while sending
+            few messages.
+
+    Yields:
+        JobResult: The result of each job, in the order they finish.
+    """
+    jobs = list(jobs)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if batch_size is None:
+        batch_size = max(1, math.ceil(len(jobs) / (workers * 8)))
+    map_files = sorted({job.map_file for job in jobs})
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_load_maps, initargs=(map_files,)
+    ) as executor:
+        futures = [
+            executor.submit(_run_batch, jobs[index:index + batch_size])
+            for index in range(0, len(jobs), batch_size)
+        ]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def summarise(results: Iterable[JobResult]) -> dict[tuple[str, str, int], Summary]:
+    """
+    Compute statistics over the runs of each strategy on each map.
+
+    Args:
+        results (Iterable[JobResult]): The results of some jobs.
+
+    Returns:
+        dict[tuple[str, str, int], Summary]: The statistics for each map file,
+            strategy and number of days.
+    """
+    groups: dict[tuple[str, str, int], list[JobResult]] = {}
+    for result in results:
+        job = result.job
+        groups.setdefault((job.map_file, job.strategy, job.days), []).append(result)
+
+    summaries = {}
+    for key, group in sorted(groups.items()):
+        money = [result.money for result in group]
+        items = sorted(set().union(*(result.yields for result in group)))
+        summaries[key] = Summary(
+            len(group),
+            statistics.mean(money),
+            statistics.pstdev(money),
+            min(money),
+            max(money),
+            {
+                item: statistics.mean(result.yields.get(item, 0) for result in group)
+                for item in items
+            },
+        )
+    return summaries
+
+
+def main() -> None:
+    """Evaluate strategies on maps from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Compare farming strategies over many random runs."
+    )
+    parser.add_argument(
+        "--maps", nargs="+", default=sorted(glob.glob("maps/*.txt")),
+        help="map files to play on",
+    )
+    parser.add_argument(
+        "--strategies", nargs="+", choices=sorted(STRATEGIES),
+        default=sorted(STRATEGIES), help="strategies to evaluate",
+    )
+    parser.add_argument("--days", type=int, default=100, help="days per run")
+    parser.add_argument(
+        "--runs", type=int, default=10,
+        help="runs of each randomised strategy on each map",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="first random seed")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="worker processes (default: one per processor)",
+    )
+    args = parser.parse_args()
+
+    jobs = [
+        Job(map_file, strategy, args.days, args.seed + run)
+        for map_file in args.maps
+        for strategy in args.strategies
+        for run in range(args.runs if strategy in RANDOMISED else 1)
+    ]
+    start = time.perf_counter()
+    results = []
+    for result in evaluate(jobs, args.workers):
+        results.append(result)
+        job = result.job
+        print(
+            f"{job.map_file} {job.strategy} seed {job.seed}: "
+            f"${result.money} in {result.seconds:.2f}s"
+        )
+    elapsed = time.perf_counter() - start
+
+    print()
+    for (map_file, strategy, days), summary in summarise(results).items():
+        yields = ", ".join(
+            f"{item} {amount:.1f}" for item, amount in summary.mean_yields.items()
+        )
+        if strategy not in RANDOMISED:
+            print(
+                f"{map_file} {strategy} (deterministic, {days} days): "
+                f"${summary.max_money}; {yields}"
+            )
+            continue
+        print(
+            f"{map_file} {strategy} ({summary.runs} runs of {days} days): "
+            f"${summary.mean_money:.0f} +/- {summary.stdev_money:.0f} "
+            f"(min {summary.min_money}, max {summary.max_money}); {yields}"
+        )
+    print(f"{len(results)} runs in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,656 @@
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from typing import Iterator, NamedTuple, Optional
+from constants import *
+from model import *
+
+# A HAMT node has one child per 5 bits of a key's hash
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASH_BITS = 64
+
+_MISSING = object()
+
+
+def _hash(key: object) -> int:
+    """Get the hash of a key as an unsigned 64 bit integer."""
+    return hash(key) & ((1 << _HASH_BITS) - 1)
+
+
+def _count(bits: int) -> int:
+    """Count the bits set in an integer."""
+    return bin(bits).count("1")
+
+
+class _Node:
+    """A node of a PersistentMap, which holds a child for each bit set in its
+    bitmap. Each child is a (key, value) pair, a _Node, or a _Collision."""
+
+    __slots__ = ("bitmap", "items")
+
+    def __init__(self, bitmap: int, items: tuple) -> None:
+        self.bitmap = bitmap
+        self.items = items
+
+
+class _Collision:
+    """The (key, value) pairs of a PersistentMap whose keys share a hash."""
+
+    __slots__ = ("pairs",)
+
+    def __init__(self, pairs: tuple[tuple[object, object], ...]) -> None:
+        self.pairs = pairs
+
+
+def _pair_node(
+    pair: tuple, pair_hash: int, other: tuple, other_hash: int, shift: int
+) -> object:
+    """Make the smallest node holding two pairs whose keys differ."""
+    if shift >= _HASH_BITS:
+        return _Collision((pair, other))
+    index = (pair_hash >> shift) & _MASK
+    other_index = (other_hash >> shift) & _MASK
+    if index == other_index:
+        child = _pair_node(pair, pair_hash, other, other_hash, shift + _BITS)
+        return _Node(1 << index, (child,))
+    items = (pair, other) if index < other_index else (other, pair)
+    return _Node((1 << index) | (1 << other_index), items)
+
+
+def _get(node: object, key: object, key_hash: int) -> object:
+    """Get the value of a key under a node, or _MISSING."""
+    shift = 0
+    while True:
+        if type(node) is _Collision:
+            for other, value in node.pairs:
+                if other == key:
+                    return value
+            return _MISSING
+        bit = 1 << ((key_hash >> shift) & _MASK)
+        if not node.bitmap & bit:
+            return _MISSING
+        item = node.items[_count(node.bitmap & (bit - 1))]
+        if type(item) is tuple:
+            return item[1] if item[0] == key else _MISSING
+        node = item
+        shift += _BITS
+
+
+def _set(node: object, key: object, value: object, key_hash: int, shift: int):
+    """
+    Set the value of a key under a node, copying only the nodes on its path.
+
+    Returns:
+        tuple[object, bool]: The new node, and whether the key was added.
+    """
+    if type(node) is _Collision:
+        pairs = tuple(pair for pair in node.pairs if pair[0] != key)
+        return _Collision(pairs + ((key, value),)), len(pairs) == len(node.pairs)
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    position = _count(node.bitmap & (bit - 1))
+    items = node.items
+    if not node.bitmap & bit:
+        items = items[:position] + ((key, value),) + items[position:]
+        return _Node(node.bitmap | bit, items), True
+    item = items[position]
+    added = False
+    if type(item) is tuple:
+        if item[0] == key:
+            if item[1] is value:
+                return node, False
+            child = (key, value)
+        else:
+            child = _pair_node(
+                item, _hash(item[0]), (key, value), key_hash, shift + _BITS
+            )
+            added = True
+    else:
+        child, added = _set(item, key, value, key_hash, shift + _BITS)
+        if child is item:
+            return node, False
+    items = items[:position] + (child,) + items[position + 1 :]
+    return _Node(node.bitmap, items), added
+
+
+def _delete(node: object, key: object, key_hash: int, shift: int) -> object:
+    """
+    Delete a key under a node, copying only the nodes on its path.
+
+    Returns:
+        object: The new node, a pair if only one is left below the root, or
+            None if the node is left empty.
+    """
+    if type(node) is _Collision:
+        pairs = tuple(pair for pair in node.pairs if pair[0] != key)
+        if len(pairs) == len(node.pairs):
+            return node
+        return pairs[0] if len(pairs) == 1 else _Collision(pairs)
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    if not node.bitmap & bit:
+        return node
+    position = _count(node.bitmap & (bit - 1))
+    items = node.items
+    item = items[position]
+    if type(item) is tuple:
+        if item[0] != key:
+            return node
+        child = None
+    else:
+        child = _delete(item, key, key_hash, shift + _BITS)
+        if child is item:
+            return node
+    if child is None:
+        items = items[:position] + items[position + 1 :]
+        bitmap = node.bitmap & ~bit
+        if not items:
+            return None
+    else:
+        items = items[:position] + (child,) + items[position + 1 :]
+        bitmap = node.bitmap
+    if shift > 0 and len(items) == 1 and type(items[0]) is tuple:
+        return items[0]
+    return _Node(bitmap, items)
+
+
+def _pairs(node: object) -> Iterator[tuple[object, object]]:
+    """Yield every (key, value) pair under a node."""
+    if node is None:
+        return
+    if type(node) is tuple:
+        yield node
+    elif type(node) is _Collision:
+        yield from node.pairs
+    else:
+        for item in node.items:
+            yield from _pairs(item)
+
+
+def _diff(node: object, other: object) -> Iterator[object]:
+    """Yield the keys whose values differ between two nodes at the same
+    depth, skipping any children they share."""
+    if node is other:
+        return
+    if type(node) is _Node and type(other) is _Node:
+        if node.bitmap == other.bitmap:
+            for child, other_child in zip(node.items, other.items):
+                if child is not other_child:
+                    yield from _diff(child, other_child)
+            return
+        bits = node.bitmap | other.bitmap
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            child = other_child = None
+            if node.bitmap & bit:
+                child = node.items[_count(node.bitmap & (bit - 1))]
+            if other.bitmap & bit:
+                other_child = other.items[_count(other.bitmap & (bit - 1))]
+            if child is not other_child:
+                yield from _diff(child, other_child)
+        return
+    # Pairs and collisions are small, unless paired with a whole node, all of
+    # which may then differ anyway
+    values = dict(_pairs(node))
+    other_values = dict(_pairs(other))
+    for key in values.keys() | other_values.keys():
+        if values.get(key, _MISSING) != other_values.get(key, _MISSING):
+            yield key
+
+
+class PersistentMap(Mapping):
+    """An immutable mapping, stored as a hash array mapped trie (HAMT).
+
+    Setting or deleting a key makes a new map which shares every node of the
+    trie with the old one, except the few on the path to the key. Maps made
+    from one another can be compared in time proportional to their
+    differences, as shared nodes are skipped."""
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self) -> None:
+        """Initialise an empty PersistentMap."""
+        self._root = None
+        self._size = 0
+
+    @classmethod
+    def _make(cls, root: object, size: int) -> "PersistentMap":
+        """Make a map with a given root node and size."""
+        new = cls.__new__(cls)
+        new._root = root
+        new._size = size
+        return new
+
+    def __getitem__(self, key: object) -> object:
+        if self._root is None:
+            raise KeyError(key)
+        value = _get(self._root, key, _hash(key))
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[object]:
+        for key, _ in _pairs(self._root):
+            yield key
+
+    def __len__(self) -> int:
+        return self._size
+
+    def items(self) -> Iterator[tuple[object, object]]:
+        """Yield every (key, value) pair in the map, in no particular order."""
+        return _pairs(self._root)
+
+    def set(self, key: object, value: object) -> "PersistentMap":
+        """
+        Make a map with a key set to a value.
+
+        Args:
+            key (object): The key to set.
+            value (object): Its new value.
+
+        Returns:
+            PersistentMap: The new map.
+        """
+        if self._root is None:
+            return self._make(_Node(0, ()), 0).set(key, value)
+        root, added = _set(self._root, key, value, _hash(key), 0)
+        if root is self._root:
+            return self
+        return self._make(root, self._size + added)
+
+    def delete(self, key: object) -> "PersistentMap":
+        """
+        Make a map without a key, if it is in this one.
+
+        Args:
+            key (object): The key to delete.
+
+        Returns:
+            PersistentMap: The new map.
+        """
+        if key not in self:
+            return self
+        root = _delete(self._root, key, _hash(key), 0)
+        return self._make(root, self._size - 1)
+
+    def update(self, changes: dict[object, Optional[object]]) -> "PersistentMap":
+        """
+        Make a map with several keys set, or deleted where their value is
+        None.
+
+        Args:
+            changes (dict[object, Optional[object]]): The new value of each key.
+
+        Returns:
+            PersistentMap: The new map.
+        """
+        new = self
+        for key, value in changes.items():
+            new = new.delete(key) if value is None else new.set(key, value)
+        return new
+
+    def diff(self, other: "PersistentMap") -> Iterator[object]:
+        """
+        Yield the keys whose values differ between this map and another,
+        including keys in only one of them. Values are compared with ==.
+
+        Args:
+            other (PersistentMap): The map to compare with.
+        """
+        return _diff(self._root, other._root)
+
+
+class PageGrid:
+    """An immutable grid of tiles, split into square pages.
+
+    Setting tiles makes a new grid which shares every page with the old one,
+    except those with a tile set. Grids made from one another can be
+    compared a page at a time, skipping the pages they share."""
+
+    __slots__ = ("_size", "_page_size", "_pages")
+
+    def __init__(
+        self, rows: Sequence[str], page_size: int = HISTORY_PAGE_SIZE
+    ) -> None:
+        """
+        Initialise the PageGrid.
+
+        Args:
+            rows (Sequence[str]): The rows of tiles, such as a FarmMap.
+            page_size (int, optional): The width and height of each page, in
+                tiles. Defaults to HISTORY_PAGE_SIZE.
+        """
+        self._size = (len(rows), len(rows[0]) if rows else 0)
+        self._page_size = page_size
+        # The pages in each row of pages, as bytes of tiles row by row
+        # (padded past the edges of the grid)
+        self._pages = tuple(
+            tuple(
+                b"".join(
+                    rows[row][col : col + page_size]
+                    .ljust(page_size)
+                    .encode("ascii")
+                    if row < len(rows)
+                    else b" " * page_size
+                    for row in range(top, top + page_size)
+                )
+                for col in range(0, self._size[1], page_size)
+            )
+            for top in range(0, self._size[0], page_size)
+        )
+
+    def get_tile(self, position: tuple[int, int]) -> str:
+        """
+        Get the tile at a position.
+
+        Args:
+            position (tuple[int, int]): The (row, col) of the tile.
+
+        Returns:
+            str: The tile.
+        """
+        row, col = position
+        size = self._page_size
+        page = self._pages[row // size][col // size]
+        return chr(page[(row % size) * size + col % size])
+
+    def set_tiles(self, tiles: dict[tuple[int, int], str]) -> "PageGrid":
+        """
+        Make a grid with some tiles set, copying only the pages they are in.
+
+        Args:
+            tiles (dict[tuple[int, int], str]): The tile to set at each
+                position.
+
+        Returns:
+            PageGrid: The new grid.
+        """
+        if not tiles:
+            return self
+        size = self._page_size
+        changed: dict[int, dict[int, bytearray]] = {}
+        for (row, col), tile in tiles.items():
+            page_row = changed.setdefault(row // size, {})
+            page = page_row.get(col // size)
+            if page is None:
+                page = bytearray(self._pages[row // size][col // size])
+                page_row[col // size] = page
+            page[(row % size) * size + col % size] = ord(tile)
+
+        pages = list(self._pages)
+        for index, page_row in changed.items():
+            row_pages = list(pages[index])
+            for col_index, page in page_row.items():
+                row_pages[col_index] = bytes(page)
+            pages[index] = tuple(row_pages)
+        new = PageGrid.__new__(PageGrid)
+        new._size = self._size
+        new._page_size = size
+        new._pages = tuple(pages)
+        return new
+
+    def diff(self, other: "PageGrid") -> Iterator[tuple[tuple[int, int], str]]:
+        """
+        Yield the tiles of another grid of the same size which differ from
+        this one, skipping the pages they share.
+
+        Args:
+            other (PageGrid): The grid to compare with.
+
+        Yields:
+            tuple[tuple[int, int], str]: The position and tile in other of
+                each tile which differs.
+        """
+        size = self._page_size
+        for page_row, (row_pages, other_row_pages) in enumerate(
+            zip(self._pages, other._pages)
+        ):
+            if row_pages is other_row_pages:
+                continue
+            for page_col, (page, other_page) in enumerate(
+                zip(row_pages, other_row_pages)
+            ):
+                if page is other_page or page == other_page:
+                    continue
+                for index, (tile, other_tile) in enumerate(zip(page, other_page)):
+                    if tile != other_tile:
+                        position = (
+                            page_row * size + index // size,
+                            page_col * size + index % size,
+                        )
+                        yield position, chr(other_tile)
+
+
+# A plant in a snapshot: its type, stage, days and days since harvest (or
+# None for plants without them), and the day on which these were recorded
+_Entry = tuple[type, int, Optional[int], Optional[int], int]
+
+_PLANT_CLASSES = (PotatoPlant, KalePlant, BerryPlant)
+
+
+def _entry(plant: Plant, day: int) -> _Entry:
+    """Record the state of a plant on a day."""
+    plant_class = next(
+        (cls for cls in _PLANT_CLASSES if isinstance(plant, cls)), type(plant)
+    )
+    return (
+        plant_class,
+        plant.get_stage(),
+        plant._days if hasattr(plant_class, "_days") else None,
+        (
+            plant._days_since_harvest
+            if hasattr(plant_class, "_days_since_harvest")
+            else None
+        ),
+        day,
+    )
+
+
+def _make_plant(entry: _Entry, day: int) -> Plant:
+    """Make a plant with the state recorded in an entry, grown to a day."""
+    plant_class, stage, days, days_since_harvest, recorded = entry
+    plant = plant_class()
+    plant._stage = stage
+    if days is not None:
+        plant._days = days
+    if days_since_harvest is not None:
+        plant._days_since_harvest = days_since_harvest
+    if day > recorded:
+        plant.age_days(day - recorded)
+    return plant
+
+
+class Snapshot(NamedTuple):
+    """The state of a game at one point in its history."""
+
+    day: int
+    player: PlayerState
+    tiles: PageGrid
+    # Each plant's entry, by position. Plants are recorded when they change,
+    # and grown from then to the day of each later snapshot when restored, so
+    # a new day changes only the entries of plants whose stage changed
+    plants: PersistentMap
+
+
+class History:
+    """Multi-level undo and redo of the actions on a model, and jumping to
+    the start of any day played.
+
+    After each step of the game, commit records a Snapshot of the model.
+    Snapshots share all but the changed parts of the previous snapshot: the
+    map is split into pages, and only the pages with a changed tile are
+    copied, while plants are kept in a PersistentMap, in which only the path
+    to each changed plant is copied. So each snapshot costs time and memory
+    in proportion to what changed in that step.
+
+    Restoring a snapshot from the same day compares it with the current one,
+    skipping everything they share, and only changes the positions which
+    differ (which are then all the views need to redraw). Restoring one from
+    another day rebuilds every plant, as every plant has grown.
+
+    Commits, undos, redos and jumps are recorded to the model's action log, if
+    it has one, so that they are replayed along with the other actions."""
+
+    def __init__(self, model: FarmModel, limit: int = HISTORY_LIMIT) -> None:
+        """
+        Initialise the History, starting from the current state of a model.
+
+        Args:
+            model (FarmModel): The model to keep the history of.
+            limit (int, optional): The most snapshots to keep, after which the
+                oldest are forgotten. Defaults to HISTORY_LIMIT.
+        """
+        self._model = model
+        self._limit = limit
+        self._changes = model.track_changes()
+        day = model.get_days_elapsed()
+        plants = PersistentMap().update(
+            {
+                position: _entry(plant, day)
+                for position, plant in model.get_plants().items()
+            }
+        )
+        self._snapshots = [
+            Snapshot(
+                day,
+                model.get_player().get_state(),
+                PageGrid(model.get_map()),
+                plants,
+            )
+        ]
+        # The day of each snapshot, for finding the start of a day
+        self._days = [day]
+        self._cursor = 0
+
+    @property
+    def _action_log(self) -> Optional[object]:
+        """The model's action log, which the history's actions are recorded
+        to."""
+        return self._model.get_action_log()
+
+    def get_snapshot(self) -> Snapshot:
+        """Get the snapshot of the game's current state, as last committed."""
+        return self._snapshots[self._cursor]
+
+    def can_undo(self) -> bool:
+        """Check whether there is an earlier snapshot to undo to."""
+        return self._cursor > 0
+
+    def can_redo(self) -> bool:
+        """Check whether there is a later snapshot to redo to."""
+        return self._cursor < len(self._snapshots) - 1
+
+    @logged
+    def commit(self) -> bool:
+        """
+        Record a snapshot of the model, if it has changed since the last one.
+        Any snapshots which could be redone are forgotten.
+
+        Returns:
+            bool: True if a snapshot was recorded.
+        """
+        model = self._model
+        current = self._snapshots[self._cursor]
+        day = model.get_days_elapsed()
+        player = model.get_player().get_state()
+        if not self._changes and day == current.day and player == current.player:
+            return False
+
+        farm_map = model.get_map()
+        store = model.get_plants()
+        tiles = {}
+        plants = {}
+        for position in self._changes:
+            tile = farm_map.get_tile(position)
+            if tile != current.tiles.get_tile(position):
+                tiles[position] = tile
+            plant = store.get(position)
+            plants[position] = None if plant is None else _entry(plant, day)
+        self._changes.clear()
+
+        snapshot = Snapshot(
+            day, player, current.tiles.set_tiles(tiles), current.plants.update(plants)
+        )
+        del self._snapshots[self._cursor + 1 :]
+        del self._days[self._cursor + 1 :]
+        self._snapshots.append(snapshot)
+        self._days.append(day)
+        self._cursor += 1
+        if len(self._snapshots) > self._limit:
+            del self._snapshots[0]
+            del self._days[0]
+            self._cursor -= 1
+        return True
+
+    @logged
+    def undo(self) -> bool:
+        """
+        Restore the snapshot before the current one, committing any changes
+        first.
+
+        Returns:
+            bool: True if there was a snapshot to undo to.
+        """
+        self.commit()
+        if not self.can_undo():
+            return False
+        self._restore(self._cursor - 1)
+        return True
+
+    @logged
+    def redo(self) -> bool:
+        """
+        Restore the snapshot after the current one, if nothing has changed
+        since it was undone.
+
+        Returns:
+            bool: True if there was a snapshot to redo to.
+        """
+        self.commit()
+        if not self.can_redo():
+            return False
+        self._restore(self._cursor + 1)
+        return True
+
+    @logged
+    def jump_to_day(self, day: int) -> bool:
+        """
+        Restore the first snapshot of a day (just after the day began), which
+        can then be undone or redone from, committing any changes first.
+
+        Args:
+            day (int): The day, as counted by the model's days elapsed.
+
+        Returns:
+            bool: True if the day is in the history.
+        """
+        self.commit()
+        index = bisect_left(self._days, day)
+        if index == len(self._days) or self._days[index] != day:
+            return False
+        if index != self._cursor:
+            self._restore(index)
+        return True
+
+    def _restore(self, index: int) -> None:
+        """Set the model to the snapshot at an index, changing only what
+        differs from the current snapshot."""
+        current = self._snapshots[self._cursor]
+        target = self._snapshots[index]
+        tiles = dict(current.tiles.diff(target.tiles))
+        if target.day == current.day:
+            plants = {}
+            for position in current.plants.diff(target.plants):
+                entry = target.plants.get(position)
+                plants[position] = (
+                    None if entry is None else _make_plant(entry, target.day)
+                )
+            replace = False
+        else:
+            plants = {
+                position: _make_plant(entry, target.day)
+                for position, entry in target.plants.items()
+            }
+            replace = True
+        self._model.restore(target.day, target.player, tiles, plants, replace)
+        self._changes.clear()
+        self._cursor = index
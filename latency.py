@@ -0,0 +1,173 @@
+import json
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from constants import *
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """
+    Get a percentile of some samples, using the nearest rank method.
+
+    Args:
+        samples (list[float]): The samples, which must be sorted.
+        fraction (float): The percentile, as a fraction between 0 and 1.
+
+    Returns:
+        float: The smallest sample at least as large as the given fraction of
+            all samples.
+    """
+    rank = max(1, math.ceil(fraction * len(samples)))
+    return samples[rank - 1]
+
+
+class LatencyMonitor:
+    """Records how long it takes from a key press to the updated frame.
+
+    Each event is timestamped when it arrives, when its model action is done,
+    when the frame that shows it starts and finishes redrawing each view, and
+    when tkinter next goes idle (after the canvases have repainted). The
+    durations are kept per action in ring buffers of recent samples, from
+    which p50, p95 and p99 latencies are computed."""
+
+    def __init__(self, capacity: int = LATENCY_SAMPLES) -> None:
+        """
+        Initialise the LatencyMonitor.
+
+        Args:
+            capacity (int, optional): The number of recent samples to keep for
+                each action. Defaults to LATENCY_SAMPLES.
+        """
+        self._capacity = capacity
+        self._samples: dict[str, deque[dict[str, float]]] = {}
+        # Events whose action is done, waiting for the next frame
+        self._pending: list[dict[str, float]] = []
+        # The events shown by the frame being drawn, waiting for idle
+        self._frame: list[dict[str, float]] = []
+        self._frame_start = 0.0
+        self._frame_end = 0.0
+        self._view_times: dict[str, float] = {}
+        self._event: Optional[dict] = None
+
+    def begin_event(self, action: str) -> None:
+        """
+        Mark the arrival of an event.
+
+        Args:
+            action (str): The name of the action the event triggers.
+        """
+        self._event = {"name": action, "start": time.perf_counter()}
+
+    def cancel_event(self) -> None:
+        """Forget the current event, if it turned out to do nothing."""
+        self._event = None
+
+    def end_action(self) -> None:
+        """Mark that the current event's model action has finished."""
+        if self._event is not None:
+            self._event["action_end"] = time.perf_counter()
+            self._pending.append(self._event)
+            self._event = None
+
+    def begin_frame(self) -> None:
+        """Mark the start of a redraw, which shows every pending event."""
+        self._frame.extend(self._pending)
+        self._pending = []
+        self._view_times = {}
+        self._frame_start = time.perf_counter()
+
+    @contextmanager
+    def time_view(self, name: str) -> Iterator[None]:
+        """
+        Time the redraw of one view within the current frame.
+
+        Args:
+            name (str): The name of the view.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._view_times[name] = (
+                self._view_times.get(name, 0.0) + time.perf_counter() - start
+            )
+
+    def end_frame(self) -> None:
+        """Mark the end of a redraw."""
+        self._frame_end = time.perf_counter()
+
+    def mark_idle(self) -> None:
+        """
+        Mark that tkinter has gone idle after the last frame, completing every
+        event shown by that frame.
+        """
+        idle = time.perf_counter()
+        for event in self._frame:
+            sample = {
+                "action": event["action_end"] - event["start"],
+                "queued": self._frame_start - event["action_end"],
+                "views": self._frame_end - self._frame_start,
+                "idle": idle - self._frame_end,
+                "total": idle - event["start"],
+            }
+            for view, duration in self._view_times.items():
+                sample[f"view:{view}"] = duration
+            samples = self._samples.setdefault(
+                event["name"], deque(maxlen=self._capacity)
+            )
+            samples.append(sample)
+        self._frame = []
+
+    def get_summary(self) -> dict[str, dict[str, dict[str, float]]]:
+        """
+        Get the latency percentiles of every action.
+
+        Returns:
+            dict[str, dict[str, dict[str, float]]]: Maps each action to each
+                stage, and each stage to its sample count and its p50, p95 and
+                p99 durations in milliseconds.
+        """
+        summary = {}
+        for action, samples in self._samples.items():
+            stages = {}
+            for stage in sorted(set().union(*samples)):
+                durations = sorted(
+                    sample[stage] * 1000 for sample in samples if stage in sample
+                )
+                stages[stage] = {
+                    "count": len(durations),
+                    "p50": percentile(durations, 0.50),
+                    "p95": percentile(durations, 0.95),
+                    "p99": percentile(durations, 0.99),
+                }
+            summary[action] = stages
+        return summary
+
+    def dump_json(self, path: str) -> None:
+        """
+        Write the latency summary to a JSON file.
+
+        Args:
+            path (str): The path of the file to write.
+        """
+        with open(path, "w") as file:
+            json.dump(self.get_summary(), file, indent=2, sort_keys=True)
+
+    def format_overlay(self) -> str:
+        """
+        Format the total latency of each action as lines of text, for display
+        over the game.
+
+        Returns:
+            str: One line per action, with its p50, p95 and p99 latencies.
+        """
+        lines = []
+        for action, stages in sorted(self.get_summary().items()):
+            total = stages["total"]
+            lines.append(
+                f"{action}: p50 {total['p50']:.1f} p95 {total['p95']:.1f} "
+                f"p99 {total['p99']:.1f} ms (n={total['count']})"
+            )
+        return "\n".join(lines)
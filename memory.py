@@ -0,0 +1,79 @@
+import argparse
+import gc
+import math
+import tracemalloc
+from collections.abc import MutableMapping
+from typing import Callable
+from constants import *
+from model import *
+
+
+def measure_plant_bytes(
+    make_store: Callable[[], MutableMapping],
+    plant_class: type,
+    count: int,
+) -> float:
+    """
+    Measure the memory used per plant by a store full of plants.
+
+    Args:
+        make_store (Callable[[], MutableMapping]): Makes an empty plant store.
+        plant_class (type): The type of plant to fill the store with.
+        count (int): The number of plants to add, on a square farm.
+
+    Returns:
+        float: The number of bytes allocated for the store and its plants,
+            divided by the number of plants.
+    """
+    width = math.ceil(math.sqrt(count))
+    gc.collect()
+    tracemalloc.start()
+    try:
+        store = make_store()
+        for index in range(count):
+            store[divmod(index, width)] = plant_class()
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del store
+    return allocated / count
+
+
+def main() -> None:
+    """
+    Print the memory used per plant by each plant store, and check the default
+    store against PLANT_BYTE_BUDGET.
+    """
+    parser = argparse.ArgumentParser(
+        description="Measure the memory used by each plant."
+    )
+    parser.add_argument(
+        "--count", type=int, default=100_000, help="number of plants to add"
+    )
+    args = parser.parse_args()
+
+    stores = [PlantStore, LazyPlantStore]
+    try:
+        ArrayPlantStore()
+    except ImportError:
+        pass
+    else:
+        stores.append(ArrayPlantStore)
+
+    over_budget = False
+    for store in stores:
+        for plant_class in (PotatoPlant, KalePlant, BerryPlant):
+            size = measure_plant_bytes(store, plant_class, args.count)
+            line = f"{store.__name__:16} {plant_class.__name__:12} {size:6.1f} B"
+            if store is PlantStore:
+                line += f" (budget {PLANT_BYTE_BUDGET} B)"
+                if size > PLANT_BYTE_BUDGET:
+                    line += " OVER BUDGET"
+                    over_budget = True
+            print(line)
+    if over_budget:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
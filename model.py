@@ -1,12 +1,25 @@
-from typing import Optional
+import functools
+import heapq
+import inspect
+from collections.abc import MutableMapping, Sequence
+from typing import Iterator, NamedTuple, Optional, Union
 from constants import *
 from a3_support import *
 
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is only needed for ArrayPlantStore
+    np = None
+
 class Plant:
     """ Abstract plant class, which implements default behaviour and specifies
         required functions for all plant subclasses.
     """
     _NAME = 'abstract plant'
+    # Plants keep their state in slots rather than a __dict__, to keep each
+    # plant small (see PLANT_BYTE_BUDGET); subclasses must declare __slots__
+    __slots__ = ('_stage',)
 
     def __init__(self):
         """ Constructor for this type of plant. """
@@ -34,6 +47,21 @@ class Plant:
             plants stage.
         """
         raise NotImplementedError('Plant subclasses must implement age()')
+
+    def age_days(self, days: int) -> None:
+        """ Ages the plant by the given number of days. Subclasses with a fixed
+            growth schedule work out the result directly.
+        """
+        for _ in range(days):
+            self.age()
+
+    def days_until_harvest(self) -> int:
+        """ Returns the number of days until the plant is next ready to be
+            harvested if it is left alone, or 0 if it is ready now. Plants
+            without a fixed growth schedule may return 1 to be checked again
+            the next day.
+        """
+        return 0 if self.can_harvest() else 1
     
     def harvest(self) -> Optional[tuple[str, int]]:
         """ Harvests the plant iff it is ready to be harvested. Otherwise, does
@@ -51,9 +79,16 @@ class PotatoPlant(Plant):
         stage 5 it is ready for harvest.
     """
     _NAME = 'potato'
+    __slots__ = ()
 
     def age(self) -> None:
         self._stage = min(self._stage + 1, 5)
+
+    def age_days(self, days: int) -> None:
+        self._stage = min(self._stage + days, 5)
+
+    def days_until_harvest(self) -> int:
+        return 5 - self._stage
     
     def can_harvest(self) -> bool:
         return self._stage == 5
@@ -66,6 +101,8 @@ class PotatoPlant(Plant):
 class KalePlant(Plant):
     """ Kale plant has 5 stages, with stage 5 being harvest. """
     _NAME = 'kale'
+    __slots__ = ('_days',)
+
     def __init__(self) -> None:
         super().__init__()
         self._days = 0
@@ -74,6 +111,14 @@ class KalePlant(Plant):
         self._days += 1
         self._stage = 5 if self._days >= 6 else (self._days + 1) // 2 + 1
 
+    def age_days(self, days: int) -> None:
+        if days > 0:
+            self._days += days - 1
+            self.age()
+
+    def days_until_harvest(self) -> int:
+        return max(0, 6 - self._days)
+
     def can_harvest(self) -> bool:
         return self._stage == 5
     
@@ -88,6 +133,7 @@ class BerryPlant(Plant):
         days.
     """
     _NAME = 'berry'
+    __slots__ = ('_days', '_days_since_harvest')
     _DAYS_TO_STAGE = [1, 2, 2, 2, 3, 3, 3, 4, 4, 4, 4, 5, 5, 6]
 
     def __init__(self) -> None:
@@ -110,6 +156,31 @@ class BerryPlant(Plant):
             self._stage = 6
         else:
             self._stage = 5
+
+    def age_days(self, days: int) -> None:
+        if days <= 0:
+            return
+        old_days = self._days
+        self._days += days
+        if self._days <= 13:
+            self._stage = self._DAYS_TO_STAGE[self._days]
+            return
+
+        # Days since harvest only count once the plant has matured, and the
+        # plant stays ready from its first maturity until it is harvested
+        self._days_since_harvest += self._days - max(old_days, 13)
+        if (old_days < 13 or self._stage == 6
+                or self._days_since_harvest >= 4):
+            self._stage = 6
+        else:
+            self._stage = 5
+
+    def days_until_harvest(self) -> int:
+        if self._stage == 6:
+            return 0
+        if self._days < 13:
+            return 13 - self._days
+        return 4 - self._days_since_harvest
         
     def remove_on_harvest(self) -> bool:
         return False
@@ -124,8 +195,789 @@ class BerryPlant(Plant):
             return ('Berry', 3)
 
 
+class PlantStore(dict):
+    """ The default storage for the plants on a farm: a dictionary mapping
+        positions to plant objects, which are aged one at a time.
+    """
+
+    def age_all(self) -> set[tuple[int, int]]:
+        """ Ages every plant by one day.
+
+        Returns:
+            The positions of the plants whose stage changed.
+        """
+        changed = set()
+        for position, plant in self.items():
+            stage = plant.get_stage()
+            plant.age()
+            if plant.get_stage() != stage:
+                changed.add(position)
+        return changed
+
+
+def _array_field(name: str) -> property:
+    """ Returns a property which redirects an attribute of an array backed
+        plant to its slot in the named array of its table.
+    """
+    def getter(self) -> int:
+        return int(getattr(self._table, name)[self._slot])
+
+    def setter(self, value: int) -> None:
+        getattr(self._table, name)[self._slot] = value
+
+    return property(getter, setter)
+
+
+class _ArrayBackedPlant:
+    """ Mixin for plants whose state lives in the arrays of an
+        ArrayPlantStore, rather than on the plant object itself. The plant's
+        usual methods work unchanged, as they read and write _stage, _days and
+        _days_since_harvest, which are redirected to the arrays.
+    """
+    __slots__ = ()
+
+    def __init__(self, table: '_PlantTable', slot: int) -> None:
+        """ Constructor for a plant backed by the given slot of a table. """
+        self._table = table
+        self._slot = slot
+
+    _stage = _array_field('stages')
+    _days = _array_field('days')
+    _days_since_harvest = _array_field('days_since_harvest')
+
+
+def age_plant_arrays(
+        plant_class: type,
+        stages: 'np.ndarray',
+        days: 'np.ndarray',
+        days_since_harvest: 'np.ndarray'
+    ) -> None:
+    """ Ages plants of one type by one day, with the same rules as the age
+        method of the plant class, where the plants' stages, days and days
+        since harvest are held in parallel NumPy arrays, which are updated in
+        place.
+
+    Parameters:
+        plant_class: PotatoPlant, KalePlant or BerryPlant.
+        stages: The stage of each plant.
+        days: The days since each plant was planted (unused for potatoes).
+        days_since_harvest: The days since each berry plant was last
+            harvested (unused for other plants).
+    """
+    days += 1
+    if plant_class is PotatoPlant:
+        np.minimum(stages + 1, 5, out=stages)
+    elif plant_class is KalePlant:
+        stages[:] = np.where(days >= 6, 5, (days + 1) // 2 + 1)
+    elif plant_class is BerryPlant:
+        young = days <= 13
+        stages[young] = np.asarray(BerryPlant._DAYS_TO_STAGE)[days[young]]
+        mature = ~young
+        days_since_harvest[mature] += 1
+        stages[mature] = np.where(
+            (days_since_harvest[mature] >= 4) | (stages[mature] == 6), 6, 5
+        )
+    else:
+        raise ValueError(f'Can\'t age {plant_class.__name__} as arrays')
+
+
+class _PlantTable:
+    """ The state of every plant of one type in an ArrayPlantStore, kept in
+        parallel arrays. Slots are packed densely: removing a plant moves the
+        last plant into its slot.
+    """
+
+    def __init__(self, plant_class: type) -> None:
+        """ Constructor for an empty table of the given type of plant. """
+        self.plant_class = plant_class
+        self.handle_class = type(
+            f'ArrayBacked{plant_class.__name__}',
+            (_ArrayBackedPlant, plant_class),
+            {'__slots__': ('_table', '_slot')},
+        )
+        self.stages = np.zeros(16, dtype=np.int8)
+        self.days = np.zeros(16, dtype=np.int32)
+        self.days_since_harvest = np.zeros(16, dtype=np.int32)
+        self.handles: list[_ArrayBackedPlant] = []
+        self.positions: list[tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.handles)
+
+    def add(self, position: tuple[int, int], plant: Plant) -> Plant:
+        """ Copies the state of plant into a new slot, and returns the plant
+            object which is backed by that slot.
+        """
+        slot = len(self.handles)
+        if slot == len(self.stages):
+            for name in ('stages', 'days', 'days_since_harvest'):
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate((array, np.zeros_like(array))))
+        self.stages[slot] = plant.get_stage()
+        self.days[slot] = getattr(plant, '_days', 0)
+        self.days_since_harvest[slot] = getattr(plant, '_days_since_harvest', 0)
+        handle = self.handle_class(self, slot)
+        self.handles.append(handle)
+        self.positions.append(position)
+        return handle
+
+    def remove(self, handle: _ArrayBackedPlant) -> None:
+        """ Frees the slot of the given plant, by moving the last plant into
+            it. The removed plant keeps a copy of its final state.
+        """
+        slot = handle._slot
+        last = len(self.handles) - 1
+        detached = _PlantTable.__new__(_PlantTable)
+        detached.stages = self.stages[slot:slot + 1].copy()
+        detached.days = self.days[slot:slot + 1].copy()
+        detached.days_since_harvest = self.days_since_harvest[slot:slot + 1].copy()
+        if slot != last:
+            for array in (self.stages, self.days, self.days_since_harvest):
+                array[slot] = array[last]
+            moved = self.handles[last]
+            moved._slot = slot
+            self.handles[slot] = moved
+            self.positions[slot] = self.positions[last]
+        self.handles.pop()
+        self.positions.pop()
+        handle._table, handle._slot = detached, 0
+
+    def age_all(self) -> 'np.ndarray':
+        """ Ages every plant by one day, with the same rules as the age
+            method of the plant class.
+
+        Returns:
+            The slots of the plants whose stage changed.
+        """
+        count = len(self.handles)
+        stages = self.stages[:count]
+        old_stages = stages.copy()
+        age_plant_arrays(
+            self.plant_class,
+            stages,
+            self.days[:count],
+            self.days_since_harvest[:count]
+        )
+        return np.flatnonzero(stages != old_stages)
+
+
+class ArrayPlantStore(MutableMapping):
+    """ Storage for the plants on a farm which keeps the stage, days and days
+        since harvest of every potato, kale and berry plant in NumPy arrays,
+        one set per type of plant, so that a day can be advanced for every
+        plant of a type with a few vectorised operations.
+
+        Adding a plant copies its state into the arrays; the store then holds
+        (and returns) a new plant object backed by the arrays, so the object
+        that was added should no longer be used. Plants of any other type are
+        stored and aged as plain objects.
+    """
+
+    _ARRAY_CLASSES = (PotatoPlant, KalePlant, BerryPlant)
+
+    def __init__(self) -> None:
+        """ Constructor for an empty ArrayPlantStore. """
+        if np is None:
+            raise ImportError('ArrayPlantStore requires NumPy')
+        self._tables = {
+            plant_class: _PlantTable(plant_class)
+            for plant_class in self._ARRAY_CLASSES
+        }
+        # The table for each type of plant, including the plants taken from
+        # this store, so that they can be added back to it
+        self._tables_by_class = dict(self._tables)
+        for table in self._tables.values():
+            self._tables_by_class[table.handle_class] = table
+        self._plants: dict[tuple[int, int], Plant] = {}
+        # The plants which are not backed by arrays
+        self._objects: dict[tuple[int, int], Plant] = {}
+
+    def __getitem__(self, position: tuple[int, int]) -> Plant:
+        return self._plants[position]
+
+    def __setitem__(self, position: tuple[int, int], plant: Plant) -> None:
+        if position in self._plants:
+            del self[position]
+        table = self._tables_by_class.get(type(plant))
+        if table is not None:
+            plant = table.add(position, plant)
+        else:
+            self._objects[position] = plant
+        self._plants[position] = plant
+
+    def __delitem__(self, position: tuple[int, int]) -> None:
+        plant = self._plants.pop(position)
+        if isinstance(plant, _ArrayBackedPlant):
+            plant._table.remove(plant)
+        else:
+            del self._objects[position]
+
+    def __contains__(self, position: object) -> bool:
+        return position in self._plants
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        return iter(self._plants)
+
+    def __len__(self) -> int:
+        return len(self._plants)
+
+    def age_all(self) -> set[tuple[int, int]]:
+        """ Ages every plant by one day.
+
+        Returns:
+            The positions of the plants whose stage changed.
+        """
+        changed = set()
+        for table in self._tables.values():
+            if len(table):
+                changed.update(
+                    map(table.positions.__getitem__, table.age_all().tolist())
+                )
+        for position, plant in self._objects.items():
+            stage = plant.get_stage()
+            plant.age()
+            if plant.get_stage() != stage:
+                changed.add(position)
+        return changed
+
+
+class _LazyPlant:
+    """ Mixin for plants which store only the day they were planted and the
+        day they were last harvested, on the clock of a LazyPlantStore. Their
+        days, days since harvest and stage are worked out from those whenever
+        they are read, using the plant's growth schedule, so the plant never
+        needs to be aged.
+    """
+    __slots__ = ()
+
+    def __init__(self, store: 'LazyPlantStore', plant: Plant) -> None:
+        """ Constructor for a lazy plant with the same state as plant. """
+        self._store = store
+        today = store.get_day()
+        if isinstance(plant, PotatoPlant):
+            days = plant.get_stage() - 1
+        else:
+            days = plant._days
+        self._planted = today - days
+        self._harvested = None
+        if isinstance(plant, BerryPlant) and days >= 13:
+            since_harvest = plant._days_since_harvest
+            if plant.get_stage() == 5 or since_harvest != days - 13:
+                self._harvested = today - since_harvest
+
+    @property
+    def _days(self) -> int:
+        return self._store.get_day() - self._planted
+
+    @_days.setter
+    def _days(self, days: int) -> None:
+        self._planted = self._store.get_day() - days
+
+    @property
+    def _days_since_harvest(self) -> int:
+        if self._harvested is None:
+            return max(0, self._days - 13)
+        return self._store.get_day() - self._harvested
+
+    @_days_since_harvest.setter
+    def _days_since_harvest(self, days: int) -> None:
+        self._harvested = self._store.get_day() - days
+
+    @property
+    def _stage(self) -> int:
+        days = self._days
+        if isinstance(self, PotatoPlant):
+            return min(days + 1, 5)
+        if isinstance(self, KalePlant):
+            return 5 if days >= 6 else (days + 1) // 2 + 1
+        if self._harvested is None:
+            return BerryPlant._DAYS_TO_STAGE[min(days, 13)]
+        return 6 if self._days_since_harvest >= 4 else 5
+
+    @_stage.setter
+    def _stage(self, stage: int) -> None:
+        # The stage is always derived. Harvesting a berry sets its days since
+        # harvest alongside its stage, which is what moves it back to stage 5
+        pass
+
+    def age(self) -> None:
+        """ Ages this plant alone by one day. """
+        self.age_days(1)
+
+    def age_days(self, days: int) -> None:
+        """ Ages this plant alone by the given number of days. """
+        self._planted -= days
+        if self._harvested is not None:
+            self._harvested -= days
+
+
+class LazyPlantStore(MutableMapping):
+    """ Storage for the plants on a farm in which potato, kale and berry
+        plants only record the day they were planted and the day they were
+        last harvested. Each plant's stage is computed from the store's day
+        when it is read, so advancing the day doesn't touch any plants: the
+        cost moves to the plants which are actually looked at.
+
+        Adding a plant copies its state; the store then holds (and returns) a
+        new lazy plant object, so the object that was added should no longer
+        be used. Plants of any other type are stored and aged as plain objects.
+    """
+
+    _LAZY_CLASSES = (PotatoPlant, KalePlant, BerryPlant)
+
+    def __init__(self) -> None:
+        """ Constructor for an empty LazyPlantStore. """
+        # The store's clock, which advances in step with the farm's days
+        self._day = 0
+        self._lazy_classes = {
+            plant_class: type(
+                f'Lazy{plant_class.__name__}',
+                (_LazyPlant, plant_class),
+                {'__slots__': ('_store', '_planted', '_harvested')},
+            )
+            for plant_class in self._LAZY_CLASSES
+        }
+        # Plants taken from this store can be added back to it
+        for lazy_class in list(self._lazy_classes.values()):
+            self._lazy_classes[lazy_class] = lazy_class
+        self._plants: dict[tuple[int, int], Plant] = {}
+        # The plants which are not lazy
+        self._objects: dict[tuple[int, int], Plant] = {}
+
+    def get_day(self) -> int:
+        """ Returns the number of days the store has been aged. """
+        return self._day
+
+    def __getitem__(self, position: tuple[int, int]) -> Plant:
+        return self._plants[position]
+
+    def __setitem__(self, position: tuple[int, int], plant: Plant) -> None:
+        if position in self._plants:
+            del self[position]
+        lazy_class = self._lazy_classes.get(type(plant))
+        if lazy_class is not None:
+            plant = lazy_class(self, plant)
+        else:
+            self._objects[position] = plant
+        self._plants[position] = plant
+
+    def __delitem__(self, position: tuple[int, int]) -> None:
+        del self._plants[position]
+        self._objects.pop(position, None)
+
+    def __contains__(self, position: object) -> bool:
+        return position in self._plants
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        return iter(self._plants)
+
+    def __len__(self) -> int:
+        return len(self._plants)
+
+    def age_all(self) -> Optional[set[tuple[int, int]]]:
+        """ Ages every plant by one day, by advancing the store's clock.
+
+        Returns:
+            None, as the stage of any lazy plant may have changed, unless
+            every plant is stored as a plain object, in which case the
+            positions of the plants whose stage changed.
+        """
+        self._day += 1
+        changed = set()
+        for position, plant in self._objects.items():
+            stage = plant.get_stage()
+            plant.age()
+            if plant.get_stage() != stage:
+                changed.add(position)
+        if len(self._objects) < len(self._plants):
+            return None
+        return changed
+
+
+# The seed used to replant each type of plant
+_PLANT_SEEDS = {
+    PotatoPlant: 'Potato Seed',
+    KalePlant: 'Kale Seed',
+    BerryPlant: 'Berry Seed',
+}
+
+
+# The type of plant grown from each seed
+_SEED_PLANTS = {seed: plant_class for plant_class, seed in _PLANT_SEEDS.items()}
+
+
+class RegionResult(NamedTuple):
+    """ The outcome of an action over a rectangular region of a farm. """
+    # The positions whose ground or plant was changed
+    changed: set[tuple[int, int]]
+    # The total amount of each item harvested, if any
+    yields: dict[str, int]
+
+
+class AdvanceResult(NamedTuple):
+    """ The outcome of fast-forwarding a farm through several days. """
+    # The total amount of each item harvested
+    yields: dict[str, int]
+    # The total energy spent over all of the days
+    energy_used: int
+    # The number of successful harvests, and of plants replanted after them
+    harvests: int
+    replanted: int
+
+
+class PlantIndex:
+    """ Indexes the plants on a farm by type, stage and readiness to harvest,
+        and by region, so that queries cost in proportion to the number of
+        plants they find rather than the number of plants on the farm.
+
+        The farm is split into square regions of PLANT_INDEX_REGION_SIZE
+        tiles. For each region, the index keeps the positions of the plants
+        of each type, and of those which are ready to harvest.
+    """
+
+    def __init__(self, region_size: int = PLANT_INDEX_REGION_SIZE) -> None:
+        """ Constructor for an empty index.
+
+        Parameters:
+            region_size: The width and height of each region, in tiles.
+        """
+        self._region_size = region_size
+        # The (name, stage, ready) of the plant at each indexed position
+        self._entries: dict[tuple[int, int], tuple[str, int, bool]] = {}
+        self._by_stage: dict[tuple[str, int], set[tuple[int, int]]] = {}
+        self._ready: set[tuple[int, int]] = set()
+        # Positions by region, then by plant name, then by whether the plant
+        # is ready (for the ready plants) or not (for every plant)
+        self._regions: dict[
+            tuple[int, int], dict[str, tuple[set, set]]
+        ] = {}
+
+    def get_region(self, position: tuple[int, int]) -> tuple[int, int]:
+        """ Returns the (row, col) of the region containing a position. """
+        row, col = position
+        return (row // self._region_size, col // self._region_size)
+
+    def rebuild(self, plants: MutableMapping[tuple[int, int], Plant]) -> None:
+        """ Indexes the given plants, replacing everything in the index. """
+        self.__init__(self._region_size)
+        for position, plant in plants.items():
+            self.update(position, plant)
+
+    def update(self, position: tuple[int, int], plant: Optional[Plant]) -> None:
+        """ Updates the index for the plant at the given position.
+
+        Parameters:
+            position: The position whose plant has changed.
+            plant: The plant now at the position, or None if there is none.
+        """
+        entry = None
+        if plant is not None:
+            entry = (plant.get_name(), plant.get_stage(), plant.can_harvest())
+        old_entry = self._entries.get(position)
+        if entry == old_entry:
+            return
+        region = self.get_region(position)
+
+        if old_entry is not None:
+            name, stage, ready = old_entry
+            del self._entries[position]
+            self._by_stage[(name, stage)].discard(position)
+            every, ready_set = self._regions[region][name]
+            every.discard(position)
+            if ready:
+                self._ready.discard(position)
+                ready_set.discard(position)
+
+        if entry is not None:
+            name, stage, ready = entry
+            self._entries[position] = entry
+            self._by_stage.setdefault((name, stage), set()).add(position)
+            every, ready_set = self._regions.setdefault(region, {}).setdefault(
+                name, (set(), set())
+            )
+            every.add(position)
+            if ready:
+                self._ready.add(position)
+                ready_set.add(position)
+
+    def get_ready(self) -> set[tuple[int, int]]:
+        """ Returns the positions of every plant ready to harvest. """
+        return set(self._ready)
+
+    def get_stage_positions(self, name: str, stage: int) -> set[tuple[int, int]]:
+        """ Returns the positions of the plants with the given name (such as
+            'berry') at the given stage.
+        """
+        return set(self._by_stage.get((name, stage), ()))
+
+    def get_region_count(
+            self,
+            region: tuple[int, int],
+            name: Optional[str] = None,
+            ready: bool = False
+        ) -> int:
+        """ Returns the number of plants in the given region.
+
+        Parameters:
+            region: The (row, col) of the region, as given by get_region.
+            name: Only count plants with this name, if given.
+            ready: Only count plants which are ready to harvest, if True.
+        """
+        by_name = self._regions.get(region, {})
+        names = by_name if name is None else (name,) if name in by_name else ()
+        return sum(len(by_name[name][ready]) for name in names)
+
+    def find(
+            self,
+            top_left: tuple[int, int],
+            bottom_right: tuple[int, int],
+            name: Optional[str] = None,
+            ready: bool = False
+        ) -> list[tuple[int, int]]:
+        """ Returns the positions of the plants within a rectangle.
+
+        Parameters:
+            top_left: The (row, col) of the top left corner of the rectangle.
+            bottom_right: The (row, col) of the bottom right corner of the
+                rectangle, which is included in it.
+            name: Only find plants with this name, if given.
+            ready: Only find plants which are ready to harvest, if True.
+        """
+        row_min, col_min = top_left
+        row_max, col_max = bottom_right
+        size = self._region_size
+        found = []
+        for region_row in range(row_min // size, row_max // size + 1):
+            for region_col in range(col_min // size, col_max // size + 1):
+                by_name = self._regions.get((region_row, region_col))
+                if not by_name:
+                    continue
+                # Regions entirely inside the rectangle need no filtering
+                inside = (
+                    region_row * size >= row_min
+                    and region_col * size >= col_min
+                    and (region_row + 1) * size - 1 <= row_max
+                    and (region_col + 1) * size - 1 <= col_max
+                )
+                if name is None:
+                    position_sets = [sets[ready] for sets in by_name.values()]
+                elif name in by_name:
+                    position_sets = [by_name[name][ready]]
+                else:
+                    continue
+                for positions in position_sets:
+                    if inside:
+                        found.extend(positions)
+                    else:
+                        found.extend(
+                            (row, col) for row, col in positions
+                            if row_min <= row <= row_max
+                            and col_min <= col <= col_max
+                        )
+        return found
+
+
+class FarmMap(Sequence):
+    """ The tiles of a farm, stored one byte per tile in a bytearray, so that
+        a tile can be changed in place.
+
+        For compatibility with code that expects a list of strings (one per
+        row, as returned by read_map), the map is also a sequence of row
+        strings. Each row string is built when it is first read after a change
+        to that row, and is reused until the row changes again.
+    """
+
+    def __init__(self, rows: list[str]) -> None:
+        """ Constructor for a map with the given rows of tiles.
+
+        Parameters:
+            rows: The rows of the map, as returned by read_map. Every row must
+                be the same length.
+        """
+        self._width = len(rows[0]) if rows else 0
+        if any(len(row) != self._width for row in rows):
+            raise ValueError('All rows of a map must be the same length')
+        self._height = len(rows)
+        self._tiles = bytearray(''.join(rows).encode('ascii'))
+        self._rows: list[Optional[str]] = list(rows)
+
+    def get_dimensions(self) -> tuple[int, int]:
+        """ Returns the dimensions of the map, as (rows, columns). """
+        return (self._height, self._width)
+
+    def _index(self, position: tuple[int, int]) -> int:
+        """ Returns the index of the given position in the tiles, raising
+            IndexError if it is off the map, as the flat tiles would otherwise
+            wrap it onto another row.
+        """
+        row, col = position
+        if not (0 <= row < self._height and 0 <= col < self._width):
+            raise IndexError(f'Position {position} is off the map')
+        return row * self._width + col
+
+    def get_tile(self, position: tuple[int, int]) -> str:
+        """ Returns the tile at the given position. """
+        return chr(self._tiles[self._index(position)])
+
+    def set_tile(self, position: tuple[int, int], tile: str) -> None:
+        """ Sets the tile at the given position.
+
+        Parameters:
+            position: The (row, col) position of the tile.
+            tile: The new tile, such as SOIL or UNTILLED.
+        """
+        self._tiles[self._index(position)] = ord(tile)
+        self._rows[position[0]] = None
+
+    def _get_row(self, row: int) -> str:
+        """ Returns the given row of the map as a string. """
+        text = self._rows[row]
+        if text is None:
+            start = row * self._width
+            text = self._tiles[start:start + self._width].decode('ascii')
+            self._rows[row] = text
+        return text
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get_row(row) for row in range(self._height)[index]]
+        if index < 0:
+            index += self._height
+        if not 0 <= index < self._height:
+            raise IndexError('map row index out of range')
+        return self._get_row(index)
+
+    def __len__(self) -> int:
+        return self._height
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, FarmMap):
+            return self._width == other._width and self._tiles == other._tiles
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+
+class Inventory(MutableMapping):
+    """ The amount of each item held, as a list of amounts indexed by the
+        position of each item in ITEMS. Items not in ITEMS are kept in a
+        separate dictionary.
+
+        The inventory can be used as a dictionary mapping the name of each
+        item held to its amount. Items with no amount left are not included,
+        and the items are listed in the order of ITEMS.
+    """
+    __slots__ = ('_amounts', '_others')
+
+    _INDICES = {item_name: index for index, item_name in enumerate(ITEMS)}
+
+    def __init__(self, amounts: Optional[dict[str, int]] = None) -> None:
+        """ Constructor for an inventory holding the given amounts. """
+        self._amounts = [0] * len(ITEMS)
+        self._others: dict[str, int] = {}
+        if amounts is not None:
+            self.update(amounts)
+
+    def add(self, item_name: str, amount: int) -> None:
+        """ Adds the given amount of the given item. The item is removed from
+            the inventory if its amount is no longer positive.
+        """
+        index = self._INDICES.get(item_name)
+        if index is None:
+            amount += self._others.get(item_name, 0)
+            if amount > 0:
+                self._others[item_name] = amount
+            else:
+                self._others.pop(item_name, None)
+        else:
+            self._amounts[index] = max(0, self._amounts[index] + amount)
+
+    def __getitem__(self, item_name: str) -> int:
+        index = self._INDICES.get(item_name)
+        if index is None:
+            return self._others[item_name]
+        amount = self._amounts[index]
+        if amount <= 0:
+            raise KeyError(item_name)
+        return amount
+
+    def __setitem__(self, item_name: str, amount: int) -> None:
+        self.add(item_name, amount - self.get(item_name, 0))
+
+    def __delitem__(self, item_name: str) -> None:
+        if item_name not in self:
+            raise KeyError(item_name)
+        self[item_name] = 0
+
+    def __contains__(self, item_name: object) -> bool:
+        index = self._INDICES.get(item_name)
+        if index is None:
+            return item_name in self._others
+        return self._amounts[index] > 0
+
+    def __iter__(self) -> Iterator[str]:
+        for item_name, amount in zip(ITEMS, self._amounts):
+            if amount > 0:
+                yield item_name
+        yield from self._others
+
+    def __len__(self) -> int:
+        return len(self._others) + sum(amount > 0 for amount in self._amounts)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({dict(self)!r})'
+
+
+def logged(method):
+    """ Decorates a method of Player or FarmModel which changes the state of
+        the game, so that each call is recorded to the action log set on the
+        instance, if there is one. A call is recorded once it has returned,
+        with any defaulted or keyword arguments filled in as positional ones.
+        Calls made from within another recorded call (such as the call to
+        remove_plant made by harvest_plant) aren't recorded, as replaying the
+        outer call makes them again.
+    """
+    signature = inspect.signature(method)
+    # The number of arguments after self
+    arity = len(signature.parameters) - 1
+
+    @functools.wraps(method)
+    def record(self, *args, **kwargs):
+        log = self._action_log
+        if log is None or log.recording:
+            return method(self, *args, **kwargs)
+        log.recording = True
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            log.recording = False
+        if kwargs or len(args) < arity:
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            args = bound.args[1:]
+        log.record(method.__name__, args)
+        return result
+
+    return record
+
+
+class PlayerState(NamedTuple):
+    """ Everything about a player at one point in time. """
+    energy: int
+    money: int
+    # The amount of each item in the inventory, in inventory order
+    inventory: tuple[tuple[str, int], ...]
+    position: tuple[int, int]
+    direction: str
+    selected_item: Optional[str]
+
+
 class Player:
     """ Represents the player in the game. """
+    __slots__ = (
+        '_energy', '_money', '_inventory', '_position', '_direction',
+        '_selected_item', '_action_log',
+    )
 
     START_ENERGY = 100
 
@@ -133,13 +985,14 @@ class Player:
         """ Constructor for the player. """
         self._energy = self.START_ENERGY
         self._money = 0
-        self._inventory = {
+        self._inventory = Inventory({
             'Potato Seed': 5,
             'Kale Seed': 5,
-        }
+        })
         self._position = (0, 0)
         self._direction = DOWN
         self._selected_item = None
+        self._action_log = None
     
     def get_energy(self) -> int:
         """ Returns the player's current energy. """
@@ -149,15 +1002,16 @@ class Player:
         """ Returns the player's current money. """
         return self._money
     
-    def get_inventory(self) -> dict[str, int]:
-        """ Returns the player's current inventory, mapping item names to
-            amounts.
+    def get_inventory(self) -> Inventory:
+        """ Returns the player's current inventory, which can be used as a
+            dictionary mapping item names to amounts.
         """
         return self._inventory
     
+    @logged
     def select_item(self, item_name: str) -> None:
         """ Selects the item with the given name, if it's in the inventory. """
-        if item_name in self._inventory.keys():
+        if item_name in self._inventory:
             self._selected_item = item_name
     
     def get_selected_item(self) -> Optional[str]:
@@ -183,6 +1037,7 @@ class Player:
         """
         self._energy -= amount
 
+    @logged
     def sell(self, item_name: str, price: int) -> None:
         """ Sells one instance of the given item for the given price, if the
             player has some of the item available.
@@ -196,6 +1051,7 @@ class Player:
             self._money += price
             self.remove_item((item_name, 1))
 
+    @logged
     def buy(self, item_name: str, price: int) -> None:
         """ Buys one instance of the given item for the given price, if the
             player has enough money.
@@ -208,6 +1064,7 @@ class Player:
             self._money -= price
             self.add_item((item_name, 1))
 
+    @logged
     def add_item(self, to_add: tuple[str, int]) -> None:
         """ Adds the given amount of the given item to the player's inventory.
         
@@ -215,8 +1072,9 @@ class Player:
             to_add: A tuple of the item name and amount to add.
         """
         item_name, amount = to_add
-        self._inventory[item_name] = self._inventory.get(item_name, 0) + amount
+        self._inventory.add(item_name, amount)
 
+    @logged
     def remove_item(self, to_remove: tuple[str, int]) -> None:
         """ Removes the given amount of the given item from the player's
             inventory.
@@ -254,31 +1112,152 @@ class Player:
         """ Returns the player's current direction. """
         return self._direction
 
+    def get_state(self) -> PlayerState:
+        """ Returns the player's current state, which can be restored with
+            set_state.
+        """
+        return PlayerState(
+            self._energy,
+            self._money,
+            tuple(self._inventory.items()),
+            self._position,
+            self._direction,
+            self._selected_item,
+        )
+
+    def set_state(self, state: PlayerState) -> None:
+        """ Sets the player's state to one returned by get_state.
+
+        Parameters:
+            state: The state to set.
+        """
+        self._energy = state.energy
+        self._money = state.money
+        self._inventory.clear()
+        self._inventory.update(state.inventory)
+        self._position = state.position
+        self._direction = state.direction
+        self._selected_item = state.selected_item
+
 
 class FarmModel:
     """ Represents the model for the farm game. """
 
-    def __init__(self, map_file: str) -> None:
+    def __init__(
+            self,
+            map_file: Union[str, list[str]],
+            plant_store: Optional[MutableMapping] = None
+        ) -> None:
         """ Constructor for the farm model.
         
         Parameters:
-            map_file: The path to the file containing the map to use.
+            map_file: The path to the file containing the map to use, or the
+                rows of a map already read with read_map.
+            plant_store: An empty store to keep the plants in, such as an
+                ArrayPlantStore. Defaults to a PlantStore.
         """
-        self._map = read_map(map_file)
-        self._plants = {}
+        if isinstance(map_file, str):
+            map_file = read_map(map_file)
+        self._map = FarmMap(map_file)
+        self._plants = plant_store if plant_store is not None else PlantStore()
         self._player = Player()
         self._days_elapsed = 1
+        self._changed_positions = set()
+        # Set when any position may have changed, without knowing which
+        self._all_changed = False
+        self._index = PlantIndex()
+        self._index.rebuild(self._plants)
+        # Set when the plant index needs rebuilding before it is next used
+        self._index_stale = False
+        # Sets of changed positions kept for others, such as a History
+        self._trackers = []
+        self._action_log = None
     
-    def get_plants(self) -> dict[tuple[int, int], Plant]:
-        """ Returns the plants currently on the farm, as a dictionary mapping
-            positions to plants.
+    def get_plants(self) -> MutableMapping[tuple[int, int], Plant]:
+        """ Returns the plants currently on the farm, as a dictionary (or other
+            plant store) mapping positions to plants.
         """
         return self._plants
     
     def get_player(self) -> Player:
         """ Returns the player in this game. """
         return self._player
+
+    def set_action_log(self, action_log: Optional[object]) -> None:
+        """ Sets the log to record every action which changes the game to,
+            including those of the player, or stops recording if None.
+
+        Parameters:
+            action_log: The log to record to, such as an ActionLog.
+        """
+        self._action_log = action_log
+        self._player._action_log = action_log
+
+    def get_action_log(self) -> Optional[object]:
+        """ Returns the log which actions are recorded to, if any. """
+        return self._action_log
+
+    def pop_changed_positions(self) -> Optional[set[tuple[int, int]]]:
+        """ Returns the positions whose ground or plant has changed since the
+            last call to this method, and resets the set of changed positions.
+            Returns None if any position may have changed, such as after a
+            new day when plants are stored in a LazyPlantStore.
+        """
+        changed = None if self._all_changed else self._changed_positions
+        self._changed_positions = set()
+        self._all_changed = False
+        return changed
+
+    def track_changes(self) -> set[tuple[int, int]]:
+        """ Returns a set to which every position whose ground or plant is
+            changed by this model from now on is added, independently of
+            pop_changed_positions, except for plants which have only grown
+            with the days. The caller may clear the set whenever it wishes.
+        """
+        tracker = set()
+        self._trackers.append(tracker)
+        return tracker
+
+    def untrack_changes(self, tracker: set[tuple[int, int]]) -> None:
+        """ Stops adding changed positions to a set from track_changes. """
+        self._trackers = [
+            other for other in self._trackers if other is not tracker
+        ]
+
+    def get_plant_index(self) -> PlantIndex:
+        """ Returns an index of the plants on the farm, which is kept up to
+            date by the methods of this model that change plants. Changes made
+            to the plants in other ways (such as directly through get_plants)
+            are not indexed.
+        """
+        if self._index_stale:
+            self._index.rebuild(self._plants)
+            self._index_stale = False
+        return self._index
+
+    def _tile_changed(self, position: tuple[int, int]) -> None:
+        """ Records that the ground at the given position has changed. """
+        self._changed_positions.add(position)
+        for tracker in self._trackers:
+            tracker.add(position)
+
+    def _plant_changed(
+            self,
+            position: tuple[int, int],
+            grown: bool = False
+        ) -> None:
+        """ Records that the plant at the given position has changed, where
+            grown is True if it has only grown with the days (which trackers
+            don't need to know, as they can grow their copies themselves).
+        """
+        if grown:
+            self._changed_positions.add(position)
+        else:
+            self._tile_changed(position)
+        if not self._index_stale:
+            self._index.update(position, self._plants.get(position))
     
+    @logged
     def add_plant(self, position: tuple[int, int], plant: Plant) -> bool:
         """ Adds the given plant to the given position, if the player has enough
             energy and there is no plant already at that position. Also handles
@@ -298,10 +1277,12 @@ class FarmModel:
         if self._plants.get(position) is None:
             self._player.reduce_energy(PLANT_COST)
             self._plants[position] = plant
+            self._plant_changed(position)
             return True
     
         return False
     
+    @logged
     def harvest_plant(
             self,
             position: tuple[int, int]
@@ -326,28 +1307,194 @@ class FarmModel:
             plant = self._plants[position]
             harvest_result = plant.harvest()
             if harvest_result is not None:
+                self._plant_changed(position)
                 if plant.remove_on_harvest():
                     self.remove_plant(position)
                 self._player.reduce_energy(HARVEST_COST)
                 return harvest_result
     
-    def get_map(self) -> list[str]:
-        """ Returns the map for this game. """
+    def get_map(self) -> FarmMap:
+        """ Returns the map for this game. This can be used as a list of
+            strings, with one string per row and one character per tile.
+        """
         return self._map
     
     def get_dimensions(self) -> tuple[int, int]:
         """ Returns the dimensions of the map for this game, as
             (number of rows, number of columns).
         """
-        return (len(self._map), len(self._map[0]))
+        return self._map.get_dimensions()
     
+    @logged
     def new_day(self) -> None:
         """ Advances the game by one day. """
-        for plant in self._plants.values():
-            plant.age()
+        changed = self._plants.age_all()
+        if changed is None:
+            # Every plant may have changed, so rather than reindexing them all
+            # now, the index is rebuilt when it is next used
+            self._all_changed = True
+            self._index_stale = True
+        else:
+            for position in changed:
+                self._plant_changed(position, grown=True)
         self._days_elapsed += 1
         self._player.reset_energy()
     
+    @logged
+    def advance_days(
+            self,
+            days: int,
+            policy: str = NEVER_HARVEST
+        ) -> AdvanceResult:
+        """ Advances the game by the given number of days, harvesting plants
+            according to the given policy. The result is the same as calling
+            new_day the given number of times, and after each call:
+            - for HARVEST_READY and HARVEST_AND_REPLANT, calling harvest_plant
+              on every plant that is ready, in order of position, and adding
+              the harvested items to the player's inventory;
+            - for HARVEST_AND_REPLANT, replanting each plant removed by a
+              harvest straight away, using a seed from the player's inventory
+              (if the player has one, and the energy to plant it).
+
+            Rather than aging every plant every day, plants are only looked at
+            on the days they become ready, and are aged in one step from the
+            last day they were looked at.
+
+        Parameters:
+            days: The number of days to advance by.
+            policy: One of NEVER_HARVEST, HARVEST_READY and
+                HARVEST_AND_REPLANT.
+
+        Returns:
+            The yields and energy use over the days. The model itself holds
+            the final state.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown harvest policy: {policy!r}')
+        yields = {}
+        energy_used = 0
+        harvests = 0
+        replanted = 0
+
+        # The day up to which each plant has been aged, if not from the start
+        aged_to = {}
+        # The positions of the plants which become ready on each day
+        calendar = {}
+        if policy != NEVER_HARVEST:
+            for position, plant in self._plants.items():
+                ready_day = max(1, plant.days_until_harvest())
+                if ready_day <= days:
+                    calendar.setdefault(ready_day, []).append(position)
+        # The positions of the plants which are ready, waiting for energy
+        ready = []
+
+        for day in range(1, days + 1):
+            self._days_elapsed += 1
+            self._player.reset_energy()
+            for position in calendar.pop(day, ()):
+                heapq.heappush(ready, position)
+
+            while ready and self._player.get_energy() >= HARVEST_COST:
+                position = heapq.heappop(ready)
+                plant = self._plants[position]
+                plant.age_days(day - aged_to.get(position, 0))
+                aged_to[position] = day
+                result = self.harvest_plant(position)
+                if result is not None:
+                    self._player.add_item(result)
+                    item_name, amount = result
+                    yields[item_name] = yields.get(item_name, 0) + amount
+                    harvests += 1
+
+                if position in self._plants:
+                    # Either regrowing, or not actually ready yet
+                    plant = self._plants[position]
+                elif policy == HARVEST_AND_REPLANT:
+                    plant = self._replant(position, plant)
+                    if plant is None:
+                        continue
+                    replanted += 1
+                else:
+                    continue
+                ready_day = day + max(1, plant.days_until_harvest())
+                if ready_day <= days:
+                    calendar.setdefault(ready_day, []).append(position)
+
+            energy_used += Player.START_ENERGY - self._player.get_energy()
+
+        for position, plant in self._plants.items():
+            plant.age_days(days - aged_to.get(position, 0))
+        if days > 0:
+            self._all_changed = True
+            self._index_stale = True
+        return AdvanceResult(yields, energy_used, harvests, replanted)
+
+    def _replant(
+            self,
+            position: tuple[int, int],
+            harvested: Plant
+        ) -> Optional[Plant]:
+        """ Plants a new plant of the same type as the harvested plant at the
+            given position, using a seed from the player's inventory.
+
+        Returns:
+            The new plant, or None if it couldn't be planted.
+        """
+        plant_class = next(
+            (cls for cls in type(harvested).__mro__ if cls in _PLANT_SEEDS),
+            None,
+        )
+        if plant_class is None:
+            return
+        seed = _PLANT_SEEDS[plant_class]
+        if self._player.get_inventory().get(seed, 0) <= 0:
+            return
+        if not self.add_plant(position, plant_class()):
+            return
+        self._player.remove_item((seed, 1))
+        return self._plants[position]
+
+    def restore(
+            self,
+            days_elapsed: int,
+            player_state: PlayerState,
+            tiles: dict[tuple[int, int], str],
+            plants: dict[tuple[int, int], Optional[Plant]],
+            replace_plants: bool = False
+        ) -> None:
+        """ Sets the state of the game, as a History does to undo and redo
+            actions. The positions given are marked as changed.
+
+        Parameters:
+            days_elapsed: The number of days elapsed.
+            player_state: The state to set the player to.
+            tiles: The tile to set at each position whose tile changes.
+            plants: The plant to set at each position whose plant changes, or
+                None to remove the plant there.
+            replace_plants: If True, plants holds every plant on the farm,
+                and replaces all the plants there now. Every position is then
+                marked as changed, as by new_day.
+        """
+        self._days_elapsed = days_elapsed
+        self._player.set_state(player_state)
+        for position, tile in tiles.items():
+            self._map.set_tile(position, tile)
+            self._tile_changed(position)
+        if replace_plants:
+            self._plants.clear()
+            for position, plant in plants.items():
+                if plant is not None:
+                    self._plants[position] = plant
+            self._all_changed = True
+            self._index_stale = True
+            return
+        for position, plant in plants.items():
+            if plant is None:
+                self._plants.pop(position, None)
+            else:
+                self._plants[position] = plant
+            self._plant_changed(position)
+
     def get_days_elapsed(self) -> int:
         """ Returns the number of days elapsed in this game. """
         return self._days_elapsed
@@ -362,6 +1509,7 @@ class FarmModel:
         """
         return self.get_player().get_direction()
 
+    @logged
     def move_player(self, direction: str) -> None:
         """ Moves the player in the given direction, if possible. Also handles
             reducing the player's energy appropriately for moving.
@@ -379,12 +1527,13 @@ class FarmModel:
         # Calculate new position
         move_delta = MOVE_DELTAS[direction]
         d_row, d_col = move_delta
-        old_row, old_col = self.get_player_position()
+        old_row, old_col = self._player.get_position()
         new_row, new_col = old_row + d_row, old_col + d_col
 
         # Cap positions at boundaries of map
-        new_row = max(0, min(new_row, self.get_dimensions()[0] - 1))
-        new_col = max(0, min(new_col, self.get_dimensions()[1] - 1))
+        rows, cols = self._map.get_dimensions()
+        new_row = max(0, min(new_row, rows - 1))
+        new_col = max(0, min(new_col, cols - 1))
 
         # Move player
         self._player.set_position((new_row, new_col))
@@ -394,6 +1543,151 @@ class FarmModel:
         if (new_row, new_col) != (old_row, old_col):
             self._player.reduce_energy(MOVE_COST)
 
+    def _region_positions(
+            self,
+            top_left: tuple[int, int],
+            bottom_right: tuple[int, int]
+        ) -> Iterator[tuple[int, int]]:
+        """ Yields the positions within a rectangle, row by row, clipped to
+            the edges of the map. Both corners are within the rectangle.
+        """
+        rows, cols = self.get_dimensions()
+        row_min, col_min = max(0, top_left[0]), max(0, top_left[1])
+        row_max = min(rows - 1, bottom_right[0])
+        col_max = min(cols - 1, bottom_right[1])
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                yield (row, col)
+
+    @logged
+    def till_region(
+            self,
+            top_left: tuple[int, int],
+            bottom_right: tuple[int, int]
+        ) -> RegionResult:
+        """ Tills every untilled tile within a rectangle, row by row, as
+            till_soil would. Stops when the player runs out of energy.
+
+        Parameters:
+            top_left: The (row, col) of the top left corner of the rectangle.
+            bottom_right: The (row, col) of the bottom right corner of the
+                rectangle, which is included in it.
+
+        Returns:
+            The positions which were tilled.
+        """
+        changed = set()
+        for position in self._region_positions(top_left, bottom_right):
+            if self._map.get_tile(position) != UNTILLED:
+                continue
+            if self._player.get_energy() < TILL_COST:
+                break
+            self._player.reduce_energy(TILL_COST)
+            self._map.set_tile(position, SOIL)
+            changed.add(position)
+        self._changed_positions.update(changed)
+        for tracker in self._trackers:
+            tracker.update(changed)
+        return RegionResult(changed, {})
+
+    @logged
+    def plant_region(
+            self,
+            top_left: tuple[int, int],
+            bottom_right: tuple[int, int],
+            seed: str
+        ) -> RegionResult:
+        """ Plants a seed from the player's inventory on every tilled tile
+            without a plant within a rectangle, row by row, reducing the
+            player's energy as add_plant would. Stops when the player runs out
+            of energy or seeds.
+
+        Parameters:
+            top_left: The (row, col) of the top left corner of the rectangle.
+            bottom_right: The (row, col) of the bottom right corner of the
+                rectangle, which is included in it.
+            seed: The name of the seed to plant, such as 'Potato Seed'.
+
+        Returns:
+            The positions which were planted.
+        """
+        plant_class = _SEED_PLANTS[seed]
+        inventory = self._player.get_inventory()
+        changed = set()
+        for position in self._region_positions(top_left, bottom_right):
+            if self._map.get_tile(position) != SOIL or position in self._plants:
+                continue
+            if (self._player.get_energy() < PLANT_COST
+                    or inventory.get(seed, 0) <= 0):
+                break
+            self._player.reduce_energy(PLANT_COST)
+            self._player.remove_item((seed, 1))
+            self._plants[position] = plant_class()
+            self._plant_changed(position)
+            changed.add(position)
+        return RegionResult(changed, {})
+
+    @logged
+    def harvest_region(
+            self,
+            top_left: tuple[int, int],
+            bottom_right: tuple[int, int]
+        ) -> RegionResult:
+        """ Harvests every plant which is ready within a rectangle, row by row,
+            as harvest_plant would, and adds the harvested items to the
+            player's inventory. Stops when the player runs out of energy.
+
+        Parameters:
+            top_left: The (row, col) of the top left corner of the rectangle.
+            bottom_right: The (row, col) of the bottom right corner of the
+                rectangle, which is included in it.
+
+        Returns:
+            The positions which were harvested, and the items harvested.
+        """
+        changed = set()
+        yields = {}
+        ready = self.get_plant_index().find(top_left, bottom_right, ready=True)
+        for position in sorted(ready):
+            if self._player.get_energy() < HARVEST_COST:
+                break
+            result = self.harvest_plant(position)
+            if result is not None:
+                self._player.add_item(result)
+                item_name, amount = result
+                yields[item_name] = yields.get(item_name, 0) + amount
+                changed.add(position)
+        return RegionResult(changed, yields)
+
+    @logged
+    def remove_region(
+            self,
+            top_left: tuple[int, int],
+            bottom_right: tuple[int, int]
+        ) -> RegionResult:
+        """ Removes every plant within a rectangle, row by row, as
+            remove_plant would. Stops when the player runs out of energy.
+
+        Parameters:
+            top_left: The (row, col) of the top left corner of the rectangle.
+            bottom_right: The (row, col) of the bottom right corner of the
+                rectangle, which is included in it.
+
+        Returns:
+            The positions whose plants were removed.
+        """
+        changed = set()
+        planted = self.get_plant_index().find(top_left, bottom_right)
+        for position in sorted(planted):
+            if self._player.get_energy() < REMOVE_COST:
+                break
+            self._player.reduce_energy(REMOVE_COST)
+            self._plants.pop(position)
+            self._plant_changed(position)
+            changed.add(position)
+        return RegionResult(changed, {})
+
+    @logged
     def till_soil(self, position: tuple[int, int]) -> None:
         """ Tills the soil at the given position, if it is untilled soil.
             Reduces the player's energy appropriately.
@@ -405,11 +1699,12 @@ class FarmModel:
         if self._player.get_energy() < TILL_COST:
             return
 
-        row, col = position
-        if self._map[row][col] == UNTILLED:
+        if self._map.get_tile(position) == UNTILLED:
             self._player.reduce_energy(TILL_COST)
-            self._map[row] = self._map[row][:col] + SOIL + self._map[row][col + 1:]
+            self._map.set_tile(position, SOIL)
+            self._tile_changed(position)
     
+    @logged
     def untill_soil(self, position: tuple[int, int]) -> None:
         """ Untills the soil at the given position, if it is tilled soil.
             Reduces the player's energy appropriately.
@@ -421,11 +1716,12 @@ class FarmModel:
         if self._player.get_energy() < UNTILL_COST:
             return
 
-        row, col = position
-        if position not in self._plants and self._map[row][col] == SOIL:
+        if position not in self._plants and self._map.get_tile(position) == SOIL:
             self._player.reduce_energy(UNTILL_COST)
-            self._map[row] = self._map[row][:col] + UNTILLED + self._map[row][col + 1:]
+            self._map.set_tile(position, UNTILLED)
+            self._tile_changed(position)
 
+    @logged
     def remove_plant(self, position: tuple[int, int]) -> None:
         """ Removes the plant at the given position, if there is one.
             Reduces the player's energy appropriately.
@@ -440,3 +1736,4 @@ class FarmModel:
         if position in self._plants:
             self._player.reduce_energy(REMOVE_COST)
             self._plants.pop(position)
+            self._plant_changed(position)
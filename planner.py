@@ -0,0 +1,411 @@
+from collections.abc import Iterable, Mapping
+from typing import NamedTuple, Optional
+from constants import *
+from model import *
+
+# The item and amount harvested from each type of plant
+_YIELDS = {
+    "potato": ("Potato", 1),
+    "kale": ("Kale", 1),
+    "berry": ("Berry", 3),
+}
+
+
+def distance(start: tuple[int, int], end: tuple[int, int]) -> int:
+    """
+    Get the number of moves between two positions. The player can walk over
+    any tile, so this is the Manhattan distance.
+
+    Args:
+        start (tuple[int, int]): The (row, col) to move from.
+        end (tuple[int, int]): The (row, col) to move to.
+
+    Returns:
+        int: The number of moves.
+    """
+    return abs(start[0] - end[0]) + abs(start[1] - end[1])
+
+
+def get_moves(start: tuple[int, int], end: tuple[int, int]) -> list[str]:
+    """
+    Get the moves which take the player between two positions.
+
+    Args:
+        start (tuple[int, int]): The (row, col) to move from.
+        end (tuple[int, int]): The (row, col) to move to.
+
+    Returns:
+        list[str]: The directions to move in, as UP, DOWN, LEFT and RIGHT.
+    """
+    d_row, d_col = end[0] - start[0], end[1] - start[1]
+    return (
+        [DOWN if d_row > 0 else UP] * abs(d_row)
+        + [RIGHT if d_col > 0 else LEFT] * abs(d_col)
+    )
+
+
+# The action which harvests the plant the player is standing on
+HARVEST = "h"
+
+
+class Route(NamedTuple):
+    """A plan for one day of harvesting."""
+
+    # The plants to harvest, in order
+    targets: list[tuple[int, int]]
+    # The moves (UP, DOWN, LEFT, RIGHT) and harvests (HARVEST) to make
+    actions: list[str]
+    # The total selling price of everything harvested
+    value: int
+    # The energy the route uses
+    energy: int
+
+
+class HarvestPlanner:
+    """Plans the route which harvests the most valuable plants within the
+    player's energy for a day.
+
+    Routes to a few plants are planned exactly. Otherwise, a route is built by
+    repeatedly going to the plant with the best value for the energy it costs
+    to reach and harvest, then shortened with 2-opt, with the energy saved
+    spent on extending it.
+
+    To find nearby plants without looking at all of them, the plants which are
+    ready to harvest are kept in square buckets. The buckets are kept between
+    calls to plan, and only the plants which have changed since the last call
+    are moved in or out of them, so one planner should be reused from day to
+    day."""
+
+    def __init__(
+        self,
+        exact_limit: int = PLANNER_EXACT_LIMIT,
+        bucket_size: int = PLANNER_BUCKET_SIZE,
+    ) -> None:
+        """
+        Initialise the HarvestPlanner.
+
+        Args:
+            exact_limit (int, optional): The most plants to plan a route to
+                exactly. Defaults to PLANNER_EXACT_LIMIT.
+            bucket_size (int, optional): The width and height of each bucket,
+                in tiles. Defaults to PLANNER_BUCKET_SIZE.
+        """
+        self._exact_limit = exact_limit
+        self._bucket_size = bucket_size
+        # The value and harvest cost of each plant which is ready
+        self._targets: dict[tuple[int, int], tuple[int, int]] = {}
+        self._buckets: dict[tuple[int, int], set[tuple[int, int]]] = {}
+        # The greatest value and least cost of any plant, and the range of
+        # buckets holding plants, which bound the search for plants
+        self._max_value = 0
+        self._min_cost = 0
+        self._bucket_bounds = (0, 0, 0, 0)
+
+    def _get_bucket(self, position: tuple[int, int]) -> tuple[int, int]:
+        """Get the (row, col) of the bucket containing a position."""
+        size = self._bucket_size
+        return (position[0] // size, position[1] // size)
+
+    def _update_targets(
+        self, targets: dict[tuple[int, int], tuple[int, int]]
+    ) -> None:
+        """
+        Update the buckets to hold the given plants, moving only the plants
+        which have changed.
+
+        Args:
+            targets (dict[tuple[int, int], tuple[int, int]]): The value and
+                harvest cost of the plant at each position.
+        """
+        for position in self._targets.keys() - targets.keys():
+            bucket = self._get_bucket(position)
+            self._buckets[bucket].discard(position)
+            if not self._buckets[bucket]:
+                del self._buckets[bucket]
+        for position in targets.keys() - self._targets.keys():
+            self._buckets.setdefault(self._get_bucket(position), set()).add(
+                position
+            )
+        self._targets = targets
+        if targets:
+            self._max_value = max(value for value, _ in targets.values())
+            self._min_cost = min(cost for _, cost in targets.values())
+            rows = [row for row, _ in self._buckets]
+            cols = [col for _, col in self._buckets]
+            self._bucket_bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def plan(
+        self,
+        plants: Mapping[tuple[int, int], Plant],
+        start: tuple[int, int],
+        energy: int,
+        ready: Optional[Iterable[tuple[int, int]]] = None,
+    ) -> Route:
+        """
+        Plan the route which harvests the most valuable plants.
+
+        Energy is spent as by FarmModel: MOVE_COST per move, and HARVEST_COST
+        per harvest plus REMOVE_COST for plants removed on harvest. A move
+        needs MOVE_COST energy and a harvest needs HARVEST_COST energy to be
+        made, so a route may end with negative energy.
+
+        Args:
+            plants (Mapping[tuple[int, int], Plant]): The plants on the farm.
+            start (tuple[int, int]): The player's (row, col) position.
+            energy (int): The player's energy.
+            ready (Optional[Iterable[tuple[int, int]]], optional): The
+                positions of the plants which are ready to harvest, such as
+                from a PlantIndex. Defaults to finding them in plants.
+
+        Returns:
+            Route: The plants to harvest and the actions to take.
+        """
+        if ready is None:
+            ready = (
+                position for position, plant in plants.items()
+                if plant.can_harvest()
+            )
+        targets = {}
+        for position in ready:
+            plant = plants[position]
+            item_name, amount = _YIELDS[plant.get_name()]
+            cost = HARVEST_COST
+            if plant.remove_on_harvest():
+                cost += REMOVE_COST
+            targets[position] = (SELL_PRICES[item_name] * amount, cost)
+        self._update_targets(targets)
+
+        if len(targets) <= self._exact_limit:
+            order = self._plan_exact(start, energy)
+        else:
+            order = self._plan_heuristic(start, energy)
+        return self._make_route(start, energy, order)
+
+    def _simulate(
+        self, start: tuple[int, int], energy: int, order: list[tuple[int, int]]
+    ) -> Optional[tuple[int, int]]:
+        """
+        Follow a route, checking that it can be completed.
+
+        Returns:
+            Optional[tuple[int, int]]: The value of the route and the energy it
+                uses, or None if the player runs out of energy.
+        """
+        value = 0
+        remaining = energy
+        position = start
+        for target in order:
+            remaining -= distance(position, target) * MOVE_COST
+            if remaining < HARVEST_COST:
+                return None
+            target_value, cost = self._targets[target]
+            remaining -= cost
+            value += target_value
+            position = target
+        return value, energy - remaining
+
+    def _make_route(
+        self, start: tuple[int, int], energy: int, order: list[tuple[int, int]]
+    ) -> Route:
+        """Turn the order to harvest plants in into a Route."""
+        value, used = self._simulate(start, energy, order)
+        actions = []
+        position = start
+        for target in order:
+            actions.extend(get_moves(position, target))
+            actions.append(HARVEST)
+            position = target
+        return Route(order, actions, value, used)
+
+    def _plan_exact(
+        self, start: tuple[int, int], energy: int
+    ) -> list[tuple[int, int]]:
+        """
+        Find the most valuable route to the current plants, by finding the
+        least energy needed to harvest each set of plants ending at each one.
+        As the player needs energy to act, using less energy to reach a state
+        never prevents a later harvest.
+
+        Returns:
+            list[tuple[int, int]]: The plants to harvest, in order.
+        """
+        positions = list(self._targets)
+        values = [self._targets[position][0] for position in positions]
+        costs = [self._targets[position][1] for position in positions]
+        # The least energy used, and the previous plant, for each set of
+        # plants (as a bit mask) and last plant harvested
+        best: dict[tuple[int, int], tuple[int, Optional[int]]] = {}
+        for index, position in enumerate(positions):
+            moves = distance(start, position) * MOVE_COST
+            if energy - moves >= HARVEST_COST:
+                best[(1 << index, index)] = (moves + costs[index], None)
+
+        # Visit sets of plants in increasing order, so every set is complete
+        # before it is extended
+        for mask in range(1, 1 << len(positions)):
+            for last in range(len(positions)):
+                state = best.get((mask, last))
+                if state is None:
+                    continue
+                used = state[0]
+                for index, position in enumerate(positions):
+                    if mask & (1 << index):
+                        continue
+                    moves = distance(positions[last], position) * MOVE_COST
+                    if energy - used - moves < HARVEST_COST:
+                        continue
+                    key = (mask | (1 << index), index)
+                    new_used = used + moves + costs[index]
+                    if key not in best or new_used < best[key][0]:
+                        best[key] = (new_used, last)
+
+        best_key = None
+        best_value = 0
+        for mask, last in best:
+            value = sum(
+                values[index] for index in range(len(positions))
+                if mask & (1 << index)
+            )
+            if value > best_value:
+                best_key, best_value = (mask, last), value
+
+        order = []
+        while best_key is not None:
+            mask, last = best_key
+            order.append(positions[last])
+            previous = best[best_key][1]
+            if previous is None:
+                best_key = None
+            else:
+                best_key = (mask & ~(1 << last), previous)
+        order.reverse()
+        return order
+
+    def _find_best(
+        self,
+        position: tuple[int, int],
+        remaining: int,
+        taken: set[tuple[int, int]],
+    ) -> Optional[tuple[int, int]]:
+        """
+        Find the plant with the best value for the energy needed to reach and
+        harvest it, searching the buckets outward from the given position.
+
+        Args:
+            position (tuple[int, int]): The position to search from.
+            remaining (int): The energy left.
+            taken (set[tuple[int, int]]): Plants already in the route.
+
+        Returns:
+            Optional[tuple[int, int]]: The best plant, or None if no plant can
+                be reached and harvested with the energy left.
+        """
+        if not self._targets:
+            return None
+        size = self._bucket_size
+        max_moves = (remaining - HARVEST_COST) // MOVE_COST
+        centre_row, centre_col = self._get_bucket(position)
+        row_min, row_max, col_min, col_max = self._bucket_bounds
+        max_ring = max(
+            abs(centre_row - row_min), abs(centre_row - row_max),
+            abs(centre_col - col_min), abs(centre_col - col_max),
+        )
+
+        best = None
+        best_ratio = 0.0
+        for ring in range(max_ring + 1):
+            # Every tile in this ring of buckets is at least this far away
+            nearest = max(0, (ring - 1) * size + 1)
+            if nearest > max_moves:
+                break
+            least_energy = nearest * MOVE_COST + self._min_cost
+            if self._max_value / least_energy <= best_ratio:
+                break
+            for row in range(centre_row - ring, centre_row + ring + 1):
+                # Only the edge columns of the ring, except on its edge rows
+                step = 1 if abs(row - centre_row) == ring else 2 * ring
+                cols = range(centre_col - ring, centre_col + ring + 1, step)
+                for col in cols:
+                    for target in self._buckets.get((row, col), ()):
+                        if target in taken:
+                            continue
+                        moves = distance(position, target)
+                        if moves > max_moves:
+                            continue
+                        value, cost = self._targets[target]
+                        ratio = value / (moves * MOVE_COST + cost)
+                        if ratio > best_ratio or (
+                            ratio == best_ratio and target < best
+                        ):
+                            best, best_ratio = target, ratio
+        return best
+
+    def _extend(
+        self,
+        start: tuple[int, int],
+        energy: int,
+        order: list[tuple[int, int]],
+    ) -> list[tuple[int, int]]:
+        """Add plants to the end of a route while there is energy for them."""
+        order = list(order)
+        _, used = self._simulate(start, energy, order)
+        position = order[-1] if order else start
+        taken = set(order)
+        while True:
+            target = self._find_best(position, energy - used, taken)
+            if target is None:
+                return order
+            used += distance(position, target) * MOVE_COST
+            used += self._targets[target][1]
+            order.append(target)
+            taken.add(target)
+            position = target
+
+    def _two_opt(
+        self, start: tuple[int, int], energy: int, order: list[tuple[int, int]]
+    ) -> list[tuple[int, int]]:
+        """
+        Shorten a route by reversing parts of it while that makes it shorter
+        and it can still be completed.
+        """
+        points = [start] + order
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, len(points) - 1):
+                for j in range(i + 1, len(points)):
+                    # Reverse points[i..j]; the route is open at its end
+                    before = distance(points[i - 1], points[i])
+                    after = distance(points[i - 1], points[j])
+                    if j + 1 < len(points):
+                        before += distance(points[j], points[j + 1])
+                        after += distance(points[i], points[j + 1])
+                    if after < before:
+                        candidate = (
+                            points[:i] + points[i:j + 1][::-1] + points[j + 1:]
+                        )
+                        if self._simulate(start, energy, candidate[1:]):
+                            points = candidate
+                            improved = True
+        return points[1:]
+
+    def _plan_heuristic(
+        self, start: tuple[int, int], energy: int
+    ) -> list[tuple[int, int]]:
+        """
+        Build a route greedily, then alternately shorten it with 2-opt and
+        extend it with the energy saved, until it stops improving.
+
+        Returns:
+            list[tuple[int, int]]: The plants to harvest, in order.
+        """
+        order = self._extend(start, energy, [])
+        value, used = self._simulate(start, energy, order)
+        while True:
+            candidate = self._extend(
+                start, energy, self._two_opt(start, energy, order)
+            )
+            new_value, new_used = self._simulate(start, energy, candidate)
+            if (new_value, -new_used) <= (value, -used):
+                return order
+            order, value, used = candidate, new_value, new_used
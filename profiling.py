@@ -0,0 +1,297 @@
+import functools
+import json
+import marshal
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable
+from constants import *
+from model import *
+
+# The methods of FarmModel which are profiled by default: new days and every
+# action
+MODEL_TARGETS = (
+    "new_day",
+    "advance_days",
+    "move_player",
+    "till_soil",
+    "untill_soil",
+    "add_plant",
+    "harvest_plant",
+    "remove_plant",
+    "till_region",
+    "plant_region",
+    "harvest_region",
+    "remove_region",
+)
+
+# Marks a profiled method which its class inherits, rather than defines
+_INHERITED = object()
+
+
+def _function_key(owner: Any, name: str, function: Callable) -> tuple:
+    """
+    Get the key which identifies a function in a cProfile dump.
+
+    Returns:
+        tuple: The file, first line, and qualified name of the function.
+    """
+    inner = function
+    while hasattr(inner, "__wrapped__"):
+        inner = inner.__wrapped__
+    code = getattr(inner, "__code__", None)
+    if code is None:
+        return ("~", 0, f"{getattr(owner, '__name__', owner)}.{name}")
+    return (code.co_filename, code.co_firstlineno, inner.__qualname__)
+
+
+class _Stats:
+    """The statistics of one profiled function."""
+
+    __slots__ = (
+        "calls",
+        "primitive_calls",
+        "total",
+        "own",
+        "max",
+        "allocated",
+        "callers",
+    )
+
+    def __init__(self) -> None:
+        self.calls = 0
+        # Calls which weren't made from within another call of the function
+        self.primitive_calls = 0
+        self.total = 0.0
+        # The time spent in the function itself, rather than in other
+        # profiled functions it called
+        self.own = 0.0
+        self.max = 0.0
+        self.allocated = 0
+        # [calls, primitive calls, own time, total time] by calling function
+        self.callers: dict[tuple, list] = {}
+
+
+class _CallStack(threading.local):
+    """The profiled calls running on each thread, innermost last, with the
+    time spent in profiled calls they made."""
+
+    def __init__(self) -> None:
+        self.frames: list[list] = []
+
+
+class Profiler:
+    """Counts the calls of chosen functions, and measures their time and the
+    memory they allocate.
+
+    Functions are chosen as attributes of classes or modules, and are only
+    wrapped while the profiler is enabled. When it is disabled, the original
+    functions are put back, so they run with no overhead at all.
+
+    For each function, the profiler keeps the number of calls, the total and
+    maximum time of a call, the time spent in the function itself rather than
+    in other profiled functions, and (if memory is tracked) the net amount of
+    memory allocated. These can be written as JSON, or as a cProfile dump to
+    be read with pstats or any tool which reads cProfile output."""
+
+    def __init__(self, track_memory: bool = False) -> None:
+        """
+        Initialise the Profiler.
+
+        Args:
+            track_memory (bool, optional): Whether to measure the memory each
+                call allocates, with tracemalloc, which slows every call down
+                a lot. Defaults to False.
+        """
+        self._track_memory = track_memory
+        self._targets: list[tuple[Any, str]] = []
+        # The original attribute of each target, while enabled
+        self._originals: dict[tuple[int, str], tuple[Any, Any]] = {}
+        self._stats: dict[tuple, _Stats] = {}
+        self._names: dict[tuple, str] = {}
+        # Each thread has its own stack, so that calls on other threads
+        # (such as sprite loading) aren't counted as made by its calls
+        self._calls = _CallStack()
+        self._enabled = False
+        self._started_tracemalloc = False
+
+    def add_targets(self, owner: Any, *names: str) -> None:
+        """
+        Choose functions to profile. If the profiler is enabled, they are
+        wrapped straight away.
+
+        Args:
+            owner (Any): The class or module which has the functions.
+            *names (str): The names of the functions.
+        """
+        for name in names:
+            self._targets.append((owner, name))
+            if self.is_enabled():
+                self._install(owner, name)
+
+    def is_enabled(self) -> bool:
+        """Check whether the chosen functions are being profiled."""
+        return self._enabled
+
+    def enable(self) -> None:
+        """Start profiling, by wrapping every chosen function."""
+        if self._enabled:
+            return
+        self._enabled = True
+        if self._track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        for owner, name in self._targets:
+            self._install(owner, name)
+
+    def disable(self) -> None:
+        """Stop profiling, putting back every original function."""
+        for (_, name), (owner, original) in self._originals.items():
+            if original is _INHERITED:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self._originals = {}
+        self._enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def reset(self) -> None:
+        """Forget every statistic collected so far."""
+        self._stats = {}
+
+    def _install(self, owner: Any, name: str) -> None:
+        """Wrap one chosen function, if it isn't already."""
+        if (id(owner), name) in self._originals:
+            return
+        # A class's own method is put back as it was, and an inherited one
+        # is deleted so that it is inherited again
+        if isinstance(owner, type):
+            original = owner.__dict__.get(name, _INHERITED)
+        else:
+            original = getattr(owner, name)
+        function = getattr(owner, name)
+        key = _function_key(owner, name, function)
+        self._names[key] = f"{getattr(owner, '__name__', owner)}.{name}"
+        self._originals[(id(owner), name)] = (owner, original)
+        setattr(owner, name, self._wrap(function, key))
+
+    def _wrap(self, function: Callable, key: tuple) -> Callable:
+        """Make a wrapper which profiles each call of a function."""
+        calls = self._calls
+        clock = time.perf_counter
+        track_memory = self._track_memory
+
+        @functools.wraps(function)
+        def profiled(*args, **kwargs):
+            stack = calls.frames
+            # Calls which aren't made from within another call of the function
+            # on the same thread
+            primitive = all(outer[0] != key for outer in stack)
+            frame = [key, 0.0]
+            stack.append(frame)
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _Stats()
+            memory = tracemalloc.get_traced_memory()[0] if track_memory else 0
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                stack.pop()
+                own = elapsed - frame[1]
+                stats.calls += 1
+                stats.own += own
+                if elapsed > stats.max:
+                    stats.max = elapsed
+                if primitive:
+                    # Recursive calls are already part of the outer call
+                    stats.primitive_calls += 1
+                    stats.total += elapsed
+                if track_memory:
+                    stats.allocated += tracemalloc.get_traced_memory()[0] - memory
+                caller = stack[-1][0] if stack else None
+                if stack:
+                    stack[-1][1] += elapsed
+                by_caller = stats.callers.get(caller)
+                if by_caller is None:
+                    by_caller = stats.callers[caller] = [0, 0, 0.0, 0.0]
+                by_caller[0] += 1
+                by_caller[1] += primitive
+                by_caller[2] += own
+                by_caller[3] += elapsed if primitive else 0.0
+
+        return profiled
+
+    def get_summary(self) -> dict[str, dict[str, float]]:
+        """
+        Get the statistics of every function called so far.
+
+        Returns:
+            dict[str, dict[str, float]]: Maps the name of each function to its
+                number of calls, its total, own, mean and maximum time in
+                milliseconds, and the bytes it allocated (if memory is
+                tracked).
+        """
+        summary = {}
+        for key, stats in self._stats.items():
+            entry = {
+                "calls": stats.calls,
+                "total_ms": stats.total * 1000,
+                "own_ms": stats.own * 1000,
+                "mean_ms": stats.total * 1000 / max(1, stats.primitive_calls),
+                "max_ms": stats.max * 1000,
+            }
+            if self._track_memory:
+                entry["allocated_bytes"] = stats.allocated
+            summary[self._names.get(key, key[2])] = entry
+        return summary
+
+    def dump_json(self, path: str) -> None:
+        """
+        Write the statistics to a JSON file.
+
+        Args:
+            path (str): The path of the file to write.
+        """
+        with open(path, "w") as file:
+            json.dump(self.get_summary(), file, indent=2, sort_keys=True)
+
+    def dump_stats(self, path: str) -> None:
+        """
+        Write the statistics in the format of cProfile's dump_stats, which
+        pstats.Stats can read. Calls from outside any profiled function are
+        shown without a caller.
+
+        Args:
+            path (str): The path of the file to write.
+        """
+        stats = {}
+        for key, entry in self._stats.items():
+            callers = {
+                caller: tuple(values)
+                for caller, values in entry.callers.items()
+                if caller is not None
+            }
+            stats[key] = (
+                entry.primitive_calls,
+                entry.calls,
+                entry.own,
+                entry.total,
+                callers,
+            )
+        with open(path, "wb") as file:
+            marshal.dump(stats, file)
+
+
+def profile_model(profiler: Profiler) -> None:
+    """
+    Choose the hot methods of the model to profile: new days and every
+    action.
+
+    Args:
+        profiler (Profiler): The profiler to add them to.
+    """
+    profiler.add_targets(FarmModel, *MODEL_TARGETS)
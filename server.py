@@ -0,0 +1,601 @@
+import argparse
+import asyncio
+import random
+import time
+from typing import Callable, Iterable, Optional
+from a3_support import read_map
+from constants import *
+from model import *
+
+
+class _Farm:
+    """A farm hosted by a FarmServer, and the connections watching it."""
+
+    __slots__ = ("model", "watchers")
+
+    def __init__(self, model: FarmModel) -> None:
+        self.model = model
+        self.watchers: set["_Connection"] = set()
+
+
+def _format_state(model: FarmModel, positions: Iterable[tuple[int, int]]) -> str:
+    """
+    Format the state of a farm, with the tiles and plants at some positions.
+
+    Args:
+        model (FarmModel): The farm.
+        positions (Iterable[tuple[int, int]]): The positions to include.
+
+    Returns:
+        str: The day, the player's energy and money, the amount of each item
+            in ITEMS order, the player's row, column and direction, and then
+            the row, column, tile and (if there is one) plant initial and
+            stage at each position.
+    """
+    player = model.get_player()
+    held = dict(player.get_inventory())
+    row, col = player.get_position()
+    parts = [
+        str(model.get_days_elapsed()),
+        str(player.get_energy()),
+        str(player.get_money()),
+        ",".join([str(held.get(item_name, 0)) for item_name in ITEMS]),
+        f"{row},{col},{player.get_direction()}",
+    ]
+    farm_map = model.get_map()
+    plants = model.get_plants()
+    for position in positions:
+        row, col = position
+        tile = farm_map.get_tile(position)
+        plant = plants.get(position)
+        if plant is None:
+            parts.append(f"{row},{col},{tile}")
+        else:
+            parts.append(
+                f"{row},{col},{tile},{plant.get_name()[0]},{plant.get_stage()}"
+            )
+    return " ".join(parts)
+
+
+class FarmServer:
+    """Hosts many farms in one process, for bots and remote clients to play
+    over a local socket.
+
+    Clients send one command per line, and get one reply line per command:
+
+    - "new [map]" creates a farm from one of the server's maps (the first by
+      default), which the client then watches. The reply is
+      "<farm> new <rows>", with the rows of the map separated by "/".
+    - "<farm> open" and "<farm> close" start and stop watching a farm.
+    - "<farm> state" replies with the whole state of a farm.
+    - "<farm> move <w|a|s|d>", "<farm> till|untill|harvest|remove <row>
+      <col>", "<farm> plant <row> <col> <seed>", "<farm> buy|sell <item>"
+      and "<farm> day" make the action of the same name, where items are
+      given by their index in ITEMS. Harvested items are added to the
+      player's inventory, and buying and selling use the game's prices.
+
+    Each reply to an action is "<farm> ok <state>", with the positions it
+    changed (see _format_state), and every other client watching the farm is
+    sent the same state as "<farm> delta <state>". Errors are replied to as
+    "<farm> err <message>".
+
+    Commands are handled as soon as they arrive, and replies are written
+    once per read from the socket, so clients which send many commands at
+    once get many replies at once. New days asked for within one pass of
+    the event loop are made together, across every farm, after the commands
+    which arrived before them."""
+
+    def __init__(self, map_files: list[str]) -> None:
+        """
+        Initialise the FarmServer.
+
+        Args:
+            map_files (list[str]): The map files which farms can be made from.
+        """
+        self._maps = {map_file: read_map(map_file) for map_file in map_files}
+        self._default_map = map_files[0]
+        self._farms: dict[int, _Farm] = {}
+        self._next_id = 0
+        # The farms waiting for a new day, and the connections which asked
+        self._pending_days: dict[int, list[_Connection]] = {}
+        # Connections with replies waiting to be written
+        self._dirty: set[_Connection] = set()
+        self._scheduled = False
+        self._actions: dict[str, Callable[[FarmModel, list[str]], None]] = {
+            "move": self._move,
+            "till": self._at(FarmModel.till_soil),
+            "untill": self._at(FarmModel.untill_soil),
+            "harvest": self._harvest,
+            "remove": self._at(FarmModel.remove_plant),
+            "plant": self._plant,
+            "buy": self._buy,
+            "sell": self._sell,
+        }
+
+    def get_farm_count(self) -> int:
+        """Get the number of farms being hosted."""
+        return len(self._farms)
+
+    async def start(
+        self, host: str = SERVER_HOST, port: int = SERVER_PORT
+    ) -> asyncio.AbstractServer:
+        """
+        Start listening for clients.
+
+        Args:
+            host (str, optional): The address to listen on. Defaults to
+                SERVER_HOST.
+            port (int, optional): The port to listen on, or 0 for any free
+                port. Defaults to SERVER_PORT.
+
+        Returns:
+            asyncio.AbstractServer: The listening server.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(lambda: _Connection(self), host, port)
+
+    def new_farm(self, map_file: Optional[str] = None) -> int:
+        """
+        Create a farm.
+
+        Args:
+            map_file (Optional[str], optional): One of the server's map files.
+                Defaults to the first.
+
+        Returns:
+            int: The ID of the new farm.
+        """
+        rows = self._maps[map_file or self._default_map]
+        farm_id = self._next_id
+        self._next_id += 1
+        self._farms[farm_id] = _Farm(FarmModel(rows))
+        return farm_id
+
+    def advance_all(self) -> None:
+        """Start a new day on every farm, sending each to its watchers."""
+        for farm_id in self._farms:
+            self._pending_days.setdefault(farm_id, [])
+        self._tick()
+
+    def handle(self, line: str, connection: "_Connection") -> None:
+        """
+        Handle one command from a connection, queueing its reply.
+
+        Args:
+            line (str): The command, without its newline.
+            connection (_Connection): The connection which sent it.
+        """
+        parts = line.split()
+        if not parts:
+            return
+        if parts[0] == "new":
+            try:
+                farm_id = self.new_farm(parts[1] if len(parts) > 1 else None)
+            except KeyError:
+                connection.send(f"- err unknown map {parts[1]}")
+                return
+            farm = self._farms[farm_id]
+            farm.watchers.add(connection)
+            connection.farms.add(farm_id)
+            rows = "/".join(farm.model.get_map())
+            connection.send(f"{farm_id} new {rows}")
+            return
+
+        try:
+            farm_id = int(parts[0])
+            farm = self._farms[farm_id]
+            command = parts[1]
+        except (ValueError, KeyError, IndexError):
+            connection.send(f"{parts[0]} err unknown farm or command")
+            return
+
+        if farm_id in self._pending_days:
+            # Commands after a new day must see the day, so it is made now
+            self._new_day(farm_id)
+
+        if command == "day":
+            self._pending_days.setdefault(farm_id, []).append(connection)
+            self._schedule()
+            return
+        if command == "open":
+            farm.watchers.add(connection)
+            connection.farms.add(farm_id)
+            connection.send(f"{farm_id} ok {self._state(farm)}")
+            return
+        if command == "close":
+            farm.watchers.discard(connection)
+            connection.farms.discard(farm_id)
+            connection.send(f"{farm_id} ok {self._delta(farm)}")
+            return
+        if command == "state":
+            connection.send(f"{farm_id} ok {self._state(farm)}")
+            return
+
+        action = self._actions.get(command)
+        if action is None:
+            connection.send(f"{farm_id} err unknown command {command}")
+            return
+        try:
+            action(farm.model, parts[2:])
+        except (ValueError, KeyError, IndexError):
+            connection.send(f"{farm_id} err bad arguments for {command}")
+            return
+        self._reply(farm_id, farm, [connection])
+
+    def _state(self, farm: _Farm) -> str:
+        """Format the whole state of a farm, forgetting its changes."""
+        model = farm.model
+        model.pop_changed_positions()
+        rows, cols = model.get_dimensions()
+        positions = [
+            (row, col)
+            for row in range(rows)
+            for col in range(cols)
+            if model.get_map().get_tile((row, col)) != GRASS
+        ]
+        return _format_state(model, positions)
+
+    def _delta(self, farm: _Farm) -> str:
+        """Format the state of a farm, with the positions which changed since
+        the last time."""
+        model = farm.model
+        changed = model.pop_changed_positions()
+        if changed is None:
+            changed = list(model.get_plants())
+        return _format_state(model, changed)
+
+    def _reply(
+        self, farm_id: int, farm: _Farm, connections: list["_Connection"]
+    ) -> None:
+        """Send the changes to a farm to the connections which changed it, and
+        to everyone else watching it."""
+        state = self._delta(farm)
+        reply = f"{farm_id} ok {state}"
+        for connection in connections:
+            connection.send(reply)
+        if farm.watchers:
+            delta = f"{farm_id} delta {state}"
+            for watcher in farm.watchers:
+                if watcher not in connections:
+                    watcher.send(delta)
+
+    def _schedule(self) -> None:
+        """Make the pending new days once the current pass of the event loop
+        has handled everything which has arrived."""
+        if not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self._tick)
+
+    def _tick(self) -> None:
+        """Make every pending new day, and write every reply."""
+        self._scheduled = False
+        for farm_id in list(self._pending_days):
+            self._new_day(farm_id)
+        self.flush()
+
+    def _new_day(self, farm_id: int) -> None:
+        """Make a pending new day on a farm."""
+        connections = self._pending_days.pop(farm_id)
+        farm = self._farms[farm_id]
+        farm.model.new_day()
+        self._reply(farm_id, farm, connections)
+
+    def mark_dirty(self, connection: "_Connection") -> None:
+        """Note that a connection has replies waiting to be written."""
+        self._dirty.add(connection)
+
+    def flush(self) -> None:
+        """Write the waiting replies of every connection."""
+        for connection in self._dirty:
+            connection.flush()
+        self._dirty.clear()
+
+    def disconnect(self, connection: "_Connection") -> None:
+        """Stop sending anything to a closed connection."""
+        for farm_id in connection.farms:
+            self._farms[farm_id].watchers.discard(connection)
+        self._dirty.discard(connection)
+        for connections in self._pending_days.values():
+            while connection in connections:
+                connections.remove(connection)
+
+    @staticmethod
+    def _position(model: FarmModel, args: list[str]) -> tuple[int, int]:
+        """Parse a position on a farm from a command's arguments."""
+        row, col = int(args[0]), int(args[1])
+        rows, columns = model.get_dimensions()
+        if not (0 <= row < rows and 0 <= col < columns):
+            raise ValueError(f"{row},{col} is off the map")
+        return row, col
+
+    @classmethod
+    def _at(
+        cls, method: Callable[[FarmModel, tuple[int, int]], None]
+    ) -> Callable[[FarmModel, list[str]], None]:
+        """Make an action which calls a model method at a position."""
+        return lambda model, args: method(model, cls._position(model, args))
+
+    @staticmethod
+    def _move(model: FarmModel, args: list[str]) -> None:
+        if args[0] not in MOVE_DELTAS:
+            raise ValueError(args[0])
+        model.move_player(args[0])
+
+    @classmethod
+    def _harvest(cls, model: FarmModel, args: list[str]) -> None:
+        result = model.harvest_plant(cls._position(model, args))
+        if result is not None:
+            model.get_player().add_item(result)
+
+    @classmethod
+    def _plant(cls, model: FarmModel, args: list[str]) -> None:
+        position = cls._position(model, args)
+        seed = ITEMS[int(args[2])]
+        if seed not in SEEDS:
+            raise ValueError(seed)
+        model.plant_region(position, position, seed)
+
+    @staticmethod
+    def _buy(model: FarmModel, args: list[str]) -> None:
+        item_name = ITEMS[int(args[0])]
+        model.get_player().buy(item_name, BUY_PRICES[item_name])
+
+    @staticmethod
+    def _sell(model: FarmModel, args: list[str]) -> None:
+        item_name = ITEMS[int(args[0])]
+        model.get_player().sell(item_name, SELL_PRICES[item_name])
+
+
+class _Connection(asyncio.Protocol):
+    """One client of a FarmServer."""
+
+    def __init__(self, server: FarmServer) -> None:
+        self._server = server
+        self._transport: Optional[asyncio.Transport] = None
+        self._partial = b""
+        self._replies: list[str] = []
+        # The farms this connection is watching
+        self.farms: set[int] = set()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        for line in lines:
+            try:
+                command = line.decode()
+            except UnicodeDecodeError:
+                self.send("- err bad command")
+                continue
+            self._server.handle(command, self)
+        self._server.flush()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._server.disconnect(self)
+        self._transport = None
+
+    def send(self, reply: str) -> None:
+        """Queue a reply, to be written with the others at the next flush."""
+        if not self._replies:
+            self._server.mark_dirty(self)
+        self._replies.append(reply)
+
+    def flush(self) -> None:
+        """Write every queued reply."""
+        if self._transport is not None and self._replies:
+            self._transport.write(("\n".join(self._replies) + "\n").encode())
+        self._replies = []
+
+
+class FarmClient:
+    """A client of a FarmServer, which can send many commands before reading
+    their replies. Deltas sent for farms the client is watching are kept in
+    a list as they arrive."""
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Initialise the FarmClient. Use connect to make one.
+
+        Args:
+            reader (asyncio.StreamReader): The stream to read replies from.
+            writer (asyncio.StreamWriter): The stream to write commands to.
+        """
+        self._reader = reader
+        self._writer = writer
+        self.deltas: list[str] = []
+        # Replies which have arrived but haven't been returned by call yet
+        self._replies: list[str] = []
+
+    @classmethod
+    async def connect(
+        cls, host: str = SERVER_HOST, port: int = SERVER_PORT
+    ) -> "FarmClient":
+        """
+        Connect to a FarmServer.
+
+        Args:
+            host (str, optional): The server's address. Defaults to
+                SERVER_HOST.
+            port (int, optional): The server's port. Defaults to SERVER_PORT.
+
+        Returns:
+            FarmClient: The connected client.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def call(self, *commands: str) -> list[str]:
+        """
+        Send commands, and wait for the reply to each.
+
+        Args:
+            *commands (str): The commands to send, without newlines.
+
+        Returns:
+            list[str]: The reply to each command, in the order they arrive.
+                Replies to "day" commands may arrive after those to later
+                commands for other farms.
+        """
+        self._writer.write(("\n".join(commands) + "\n").encode())
+        await self._writer.drain()
+        while len(self._replies) < len(commands):
+            await self._receive()
+        replies = self._replies[: len(commands)]
+        del self._replies[: len(commands)]
+        return replies
+
+    async def next_delta(self) -> str:
+        """
+        Wait for the next delta sent for a farm being watched, if none has
+        arrived yet.
+
+        Returns:
+            str: The delta, which is removed from deltas.
+        """
+        while not self.deltas:
+            await self._receive()
+        return self.deltas.pop(0)
+
+    async def _receive(self) -> None:
+        """Read one line from the server, into deltas or the replies."""
+        line = (await self._reader.readline()).decode().rstrip("\n")
+        if not line:
+            raise ConnectionError("the server closed the connection")
+        if line.split(" ", 2)[1] == "delta":
+            self.deltas.append(line)
+        else:
+            self._replies.append(line)
+
+    async def close(self) -> None:
+        """Close the connection."""
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+def _random_command(farm_id: int, rng: random.Random, size: tuple[int, int]) -> str:
+    """Make a random command for a benchmark bot."""
+    row, col = rng.randrange(size[0]), rng.randrange(size[1])
+    choice = rng.random()
+    if choice < 0.4:
+        return f"{farm_id} move {rng.choice('wasd')}"
+    if choice < 0.55:
+        return f"{farm_id} till {row} {col}"
+    if choice < 0.7:
+        return f"{farm_id} plant {row} {col} {rng.randrange(len(SEEDS))}"
+    if choice < 0.85:
+        return f"{farm_id} harvest {row} {col}"
+    if choice < 0.9:
+        return f"{farm_id} remove {row} {col}"
+    if choice < 0.95:
+        return f"{farm_id} buy {rng.randrange(len(SEEDS))}"
+    return f"{farm_id} day"
+
+
+async def benchmark(
+    map_file: str, farms: int, actions: int, batch: int = 1000, seed: int = 0
+) -> float:
+    """
+    Measure how many actions a server handles per second, from one client
+    on localhost sending random actions to many farms.
+
+    Args:
+        map_file (str): The map to make the farms from.
+        farms (int): The number of farms.
+        actions (int): The number of actions to send.
+        batch (int, optional): The number of actions to send before waiting
+            for their replies. Defaults to 1000.
+        seed (int, optional): The seed for the random actions. Defaults to 0.
+
+    Returns:
+        float: The number of actions handled per second.
+    """
+    server = FarmServer([map_file])
+    listener = await server.start(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    client = await FarmClient.connect(port=port)
+    replies = await client.call(*["new"] * farms)
+    farm_ids = [int(reply.split()[0]) for reply in replies]
+    size = (len(read_map(map_file)), len(read_map(map_file)[0]))
+    rng = random.Random(seed)
+
+    start = time.perf_counter()
+    for sent in range(0, actions, batch):
+        commands = [
+            _random_command(rng.choice(farm_ids), rng, size)
+            for _ in range(min(batch, actions - sent))
+        ]
+        for reply in await client.call(*commands):
+            if " err " in reply:
+                raise RuntimeError(reply)
+    elapsed = time.perf_counter() - start
+
+    await client.close()
+    listener.close()
+    await listener.wait_closed()
+    return actions / elapsed
+
+
+async def serve(
+    map_files: list[str], host: str, port: int, day_interval: Optional[float]
+) -> None:
+    """
+    Run a server until it is interrupted.
+
+    Args:
+        map_files (list[str]): The map files which farms can be made from.
+        host (str): The address to listen on.
+        port (int): The port to listen on.
+        day_interval (Optional[float]): If given, every farm starts a new day
+            this many seconds apart.
+    """
+    server = FarmServer(map_files)
+    listener = await server.start(host, port)
+    print(f"Serving farms on {host}:{port}")
+    async with listener:
+        if day_interval is None:
+            await listener.serve_forever()
+        else:
+            while True:
+                await asyncio.sleep(day_interval)
+                server.advance_all()
+
+
+def main() -> None:
+    """Run a farm server, or benchmark one, from the command line."""
+    parser = argparse.ArgumentParser(description="Host many farms over a socket.")
+    parser.add_argument(
+        "--maps", nargs="+", default=["maps/map1.txt"],
+        help="map files which farms can be made from (the first is the default)",
+    )
+    parser.add_argument("--host", default=SERVER_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="port")
+    parser.add_argument(
+        "--day-interval", type=float, default=None,
+        help="seconds between new days on every farm",
+    )
+    parser.add_argument(
+        "--bench", action="store_true",
+        help="measure the actions per second of a local client instead",
+    )
+    parser.add_argument("--farms", type=int, default=1000, help="farms to bench")
+    parser.add_argument(
+        "--actions", type=int, default=100000, help="actions to bench"
+    )
+    args = parser.parse_args()
+
+    if args.bench:
+        rate = asyncio.run(benchmark(args.maps[0], args.farms, args.actions))
+        print(f"{args.actions} actions on {args.farms} farms: {rate:,.0f} per second")
+    else:
+        try:
+            asyncio.run(serve(args.maps, args.host, args.port, args.day_interval))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
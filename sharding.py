@@ -0,0 +1,572 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, Union
+from a3_support import read_map
+from constants import *
+from model import *
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is only needed for ShardedFarm
+    np = None
+
+# The types of plant a sharded farm can hold. A tile's plant is stored as its
+# type's index in this tuple plus one, so that 0 means no plant
+_PLANT_CLASSES = (PotatoPlant, KalePlant, BerryPlant)
+
+# By type of plant (as stored), the item and amount its harvest method
+# returns, and whether it is removed when harvested
+_HARVESTS = (
+    (None, 0, False),
+    ("Potato", 1, True),
+    ("Kale", 1, True),
+    ("Berry", 3, False),
+)
+
+if np is not None:
+    # By type of plant (as stored), the stage at which it can be harvested
+    _READY_STAGES = np.array([-1, 5, 5, 6], dtype=np.int8)
+    _REMOVED = np.array([removed for _, _, removed in _HARVESTS])
+    # The energy harvest_plant spends on each type of plant, including
+    # removing it if it is removed on harvest
+    _COSTS = np.where(_REMOVED, HARVEST_COST + REMOVE_COST, HARVEST_COST)
+
+
+class _Grid:
+    """The state of every tile of a sharded farm, as arrays with one element
+    per tile laid out in one block of shared memory."""
+
+    def __init__(self, memory: SharedMemory, rows: int, columns: int) -> None:
+        """
+        Initialise the _Grid over a block of shared memory.
+
+        Args:
+            memory (SharedMemory): The block, of at least nbytes(rows,
+                columns) bytes.
+            rows (int): The number of rows of the farm.
+            columns (int): The number of columns of the farm.
+        """
+        self.memory = memory
+        shape = (rows, columns)
+        size = rows * columns
+        buffer = memory.buf
+        self.days = np.ndarray(shape, np.int32, buffer, 0)
+        self.days_since_harvest = np.ndarray(shape, np.int32, buffer, 4 * size)
+        self.kinds = np.ndarray(shape, np.uint8, buffer, 8 * size)
+        self.stages = np.ndarray(shape, np.int8, buffer, 9 * size)
+        self.tiles = np.ndarray(shape, np.uint8, buffer, 10 * size)
+
+    @staticmethod
+    def nbytes(rows: int, columns: int) -> int:
+        """Get the size of the block of shared memory a farm needs."""
+        return 11 * rows * columns
+
+    def release(self) -> None:
+        """Close the block of shared memory, once the arrays are dropped."""
+        del self.days, self.days_since_harvest, self.kinds, self.stages
+        del self.tiles
+        self.memory.close()
+
+
+# The grid of the farm whose shards a worker process advances and harvests
+_grid: Optional[_Grid] = None
+
+
+def _attach(name: str, rows: int, columns: int) -> None:
+    """Attach the current process to a farm's shared memory."""
+    global _grid
+    _grid = _Grid(SharedMemory(name), rows, columns)
+
+
+def _age_shard(shard: tuple[int, int], days: int) -> None:
+    """
+    Age every plant in a shard of the farm, in a worker process.
+
+    Args:
+        shard (tuple[int, int]): The first row of the shard, and the row after
+            its last.
+        days (int): The number of days to age the plants by.
+    """
+    top, bottom = shard
+    kinds = _grid.kinds[top:bottom]
+    fields = (
+        _grid.stages[top:bottom],
+        _grid.days[top:bottom],
+        _grid.days_since_harvest[top:bottom],
+    )
+    for kind, plant_class in enumerate(_PLANT_CLASSES, 1):
+        planted = kinds == kind
+        if not planted.any():
+            continue
+        # The plants of this type are aged as packed copies, which are then
+        # written back
+        stages, plant_days, days_since_harvest = (
+            field[planted] for field in fields
+        )
+        for _ in range(days):
+            age_plant_arrays(plant_class, stages, plant_days, days_since_harvest)
+        aged = (stages, plant_days, days_since_harvest)
+        for field, values in zip(fields, aged):
+            field[planted] = values
+
+
+def _ready(top: int, bottom: int) -> tuple['np.ndarray', 'np.ndarray']:
+    """
+    Find the plants which are ready to harvest in a shard of the farm.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The index of each ready plant within
+            the shard, row by row, and the energy harvesting it takes.
+    """
+    kinds = _grid.kinds[top:bottom].ravel()
+    stages = _grid.stages[top:bottom].ravel()
+    ready = np.flatnonzero(stages == _READY_STAGES[kinds])
+    return ready, _COSTS[kinds[ready]]
+
+
+def _scan_shard(shard: tuple[int, int]) -> tuple[int, int]:
+    """
+    Work out the energy harvesting every ready plant in a shard of the farm
+    would take, in a worker process.
+
+    Args:
+        shard (tuple[int, int]): The first row of the shard, and the row after
+            its last.
+
+    Returns:
+        tuple[int, int]: The energy taken by every ready plant, and by every
+            ready plant but the last.
+    """
+    _, costs = _ready(*shard)
+    if not len(costs):
+        return 0, 0
+    total = int(costs.sum())
+    return total, total - int(costs[-1])
+
+
+def _harvest_shard(
+    shard: tuple[int, int], energy: int
+) -> tuple[tuple[int, ...], int]:
+    """
+    Harvest the ready plants in a shard of the farm, row by row, as
+    harvest_plant would, stopping when the energy runs out. Runs in a worker
+    process.
+
+    Args:
+        shard (tuple[int, int]): The first row of the shard, and the row after
+            its last.
+        energy (int): The player's energy when the harvest reaches the shard.
+
+    Returns:
+        tuple[tuple[int, ...], int]: The number of plants of each type in
+            _PLANT_CLASSES harvested, and the energy spent.
+    """
+    top, bottom = shard
+    ready, costs = _ready(top, bottom)
+    # A plant is harvested if the energy left before it is enough to harvest,
+    # and the energy left only falls, so those harvested are a prefix
+    spent = np.cumsum(costs)
+    harvested = int(np.count_nonzero(energy - (spent - costs) >= HARVEST_COST))
+    ready = ready[:harvested]
+
+    kinds = _grid.kinds[top:bottom].ravel()
+    stages = _grid.stages[top:bottom].ravel()
+    days = _grid.days[top:bottom].ravel()
+    days_since_harvest = _grid.days_since_harvest[top:bottom].ravel()
+    harvested_kinds = kinds[ready]
+    removed = ready[_REMOVED[harvested_kinds]]
+    kept = ready[~_REMOVED[harvested_kinds]]
+    kinds[removed] = 0
+    stages[removed] = 0
+    days[removed] = 0
+    days_since_harvest[removed] = 0
+    stages[kept] = 5
+    days_since_harvest[kept] = 0
+
+    counts = np.bincount(harvested_kinds, minlength=len(_HARVESTS))[1:]
+    return tuple(counts.tolist()), int(spent[harvested - 1]) if harvested else 0
+
+
+class ShardedFarm:
+    """A very large farm, whose plants are advanced and harvested in parallel
+    by a pool of worker processes.
+
+    The state of every tile (its ground, and the type, stage, days and days
+    since harvest of its plant) is kept in arrays in one block of shared
+    memory, which is split into shards of whole rows. Each worker attaches to
+    the block once, when it starts, and is then sent only the rows of the
+    shard to work on, and returns only a few counts; the shards themselves
+    are never copied between processes. The counts are merged into the
+    farm's Player.
+
+    The farm follows the rules of a FarmModel. Shards hold whole rows so
+    that harvesting them in order visits the plants in order of position,
+    as harvest_region does, and the player's energy can be handed from one
+    shard to the next.
+
+    Only potato, kale and berry plants can be held. A farm must be closed
+    when it is finished with, to stop its workers and free its memory."""
+
+    def __init__(
+        self,
+        farm_map: Union[str, list[str]],
+        workers: Optional[int] = None,
+        shards: Optional[int] = None,
+    ) -> None:
+        """
+        Initialise the ShardedFarm, with no plants.
+
+        Args:
+            farm_map (Union[str, list[str]]): The path to the map file, or the
+                rows of a map already read with read_map.
+            workers (Optional[int], optional): The number of worker processes.
+                Defaults to the number of processors.
+            shards (Optional[int], optional): The number of shards to split
+                the farm into. Defaults to SHARDS_PER_WORKER per worker.
+        """
+        if np is None:
+            raise ImportError("ShardedFarm requires NumPy")
+        if isinstance(farm_map, str):
+            farm_map = read_map(farm_map)
+        rows = len(farm_map)
+        columns = len(farm_map[0]) if rows else 0
+        if any(len(row) != columns for row in farm_map):
+            raise ValueError("All rows of a map must be the same length")
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if shards is None:
+            shards = workers * SHARDS_PER_WORKER
+
+        self._dimensions = (rows, columns)
+        self._memory = SharedMemory(
+            create=True, size=max(1, _Grid.nbytes(rows, columns))
+        )
+        np.frombuffer(self._memory.buf, np.uint8).fill(0)
+        self._grid = _Grid(self._memory, rows, columns)
+        tiles = "".join(farm_map).encode("ascii")
+        self._grid.tiles[:] = np.frombuffer(tiles, np.uint8).reshape(rows, columns)
+
+        shards = max(1, min(shards, rows))
+        bounds = [rows * index // shards for index in range(shards + 1)]
+        self._shards = list(zip(bounds, bounds[1:]))
+        self._player = Player()
+        self._days_elapsed = 1
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_attach,
+            initargs=(self._memory.name, rows, columns),
+        )
+
+    @classmethod
+    def from_model(
+        cls,
+        model: FarmModel,
+        workers: Optional[int] = None,
+        shards: Optional[int] = None,
+    ) -> "ShardedFarm":
+        """
+        Make a sharded farm with the same state as a model.
+
+        Args:
+            model (FarmModel): The model to copy.
+            workers (Optional[int], optional): The number of worker processes.
+                Defaults to the number of processors.
+            shards (Optional[int], optional): The number of shards to split
+                the farm into. Defaults to SHARDS_PER_WORKER per worker.
+
+        Returns:
+            ShardedFarm: The new farm.
+        """
+        farm = cls(list(model.get_map()), workers, shards)
+        farm._days_elapsed = model.get_days_elapsed()
+        farm._player.set_state(model.get_player().get_state())
+        for position, plant in model.get_plants().items():
+            farm.set_plant(position, plant)
+        return farm
+
+    def to_model(self, plant_store: Optional[MutableMapping] = None) -> FarmModel:
+        """
+        Make a model with the same state as the farm.
+
+        Args:
+            plant_store (Optional[MutableMapping], optional): An empty store to
+                keep the model's plants in. Defaults to a PlantStore.
+
+        Returns:
+            FarmModel: The new model.
+        """
+        model = FarmModel(self.get_map(), plant_store)
+        rows, columns = self._grid.kinds.nonzero()
+        plants = {
+            position: self.get_plant(position)
+            for position in zip(rows.tolist(), columns.tolist())
+        }
+        model.restore(
+            self._days_elapsed,
+            self._player.get_state(),
+            {},
+            plants,
+            replace_plants=True,
+        )
+        return model
+
+    def get_map(self) -> list[str]:
+        """Get the rows of the farm's map, one character per tile."""
+        return [row.tobytes().decode("ascii") for row in self._grid.tiles]
+
+    def get_dimensions(self) -> tuple[int, int]:
+        """Get the dimensions of the farm, as (rows, columns)."""
+        return self._dimensions
+
+    def get_shards(self) -> list[tuple[int, int]]:
+        """Get the first row of each shard, and the row after its last."""
+        return list(self._shards)
+
+    def get_player(self) -> Player:
+        """Get the player of the farm."""
+        return self._player
+
+    def get_days_elapsed(self) -> int:
+        """Get the number of days elapsed."""
+        return self._days_elapsed
+
+    def get_plant_count(self) -> int:
+        """Get the number of plants on the farm."""
+        return int(np.count_nonzero(self._grid.kinds))
+
+    def get_plant(self, position: tuple[int, int]) -> Optional[Plant]:
+        """
+        Get a copy of the plant at a position. Changing the copy doesn't
+        change the farm.
+
+        Args:
+            position (tuple[int, int]): The (row, col) of the plant.
+
+        Returns:
+            Optional[Plant]: The plant, or None if there is no plant there.
+        """
+        kind = int(self._grid.kinds[position])
+        if not kind:
+            return None
+        plant_class = _PLANT_CLASSES[kind - 1]
+        plant = plant_class()
+        plant._stage = int(self._grid.stages[position])
+        if hasattr(plant_class, "_days"):
+            plant._days = int(self._grid.days[position])
+        if hasattr(plant_class, "_days_since_harvest"):
+            plant._days_since_harvest = int(
+                self._grid.days_since_harvest[position]
+            )
+        return plant
+
+    def set_plant(self, position: tuple[int, int], plant: Optional[Plant]) -> None:
+        """
+        Put a copy of a plant at a position, replacing any plant there,
+        without spending any energy.
+
+        Args:
+            position (tuple[int, int]): The (row, col) to put the plant at.
+            plant (Optional[Plant]): The plant, or None to remove the plant
+                there.
+        """
+        grid = self._grid
+        if plant is None:
+            kind = stage = days = days_since_harvest = 0
+        else:
+            kind = next(
+                (
+                    index
+                    for index, plant_class in enumerate(_PLANT_CLASSES, 1)
+                    if isinstance(plant, plant_class)
+                ),
+                None,
+            )
+            if kind is None:
+                raise ValueError(
+                    f"A sharded farm can't hold a {type(plant).__name__}"
+                )
+            stage = plant.get_stage()
+            days = getattr(plant, "_days", 0)
+            days_since_harvest = getattr(plant, "_days_since_harvest", 0)
+        grid.kinds[position] = kind
+        grid.stages[position] = stage
+        grid.days[position] = days
+        grid.days_since_harvest[position] = days_since_harvest
+
+    def fill(
+        self,
+        top_left: tuple[int, int],
+        bottom_right: tuple[int, int],
+        plant_class: type,
+    ) -> int:
+        """
+        Put a new plant on every tile of tilled soil within a rectangle which
+        has no plant, without spending any energy. This sets up large farms
+        far faster than planting them.
+
+        Args:
+            top_left (tuple[int, int]): The (row, col) of the top left corner
+                of the rectangle.
+            bottom_right (tuple[int, int]): The (row, col) of the bottom right
+                corner of the rectangle, which is included in it.
+            plant_class (type): PotatoPlant, KalePlant or BerryPlant.
+
+        Returns:
+            int: The number of plants added.
+        """
+        kind = _PLANT_CLASSES.index(plant_class) + 1
+        region = (
+            slice(top_left[0], bottom_right[0] + 1),
+            slice(top_left[1], bottom_right[1] + 1),
+        )
+        empty = (self._grid.tiles[region] == ord(SOIL)) & (
+            self._grid.kinds[region] == 0
+        )
+        self._grid.kinds[region][empty] = kind
+        self._grid.stages[region][empty] = 1
+        self._grid.days[region][empty] = 0
+        self._grid.days_since_harvest[region][empty] = 0
+        return int(np.count_nonzero(empty))
+
+    def advance_days(self, days: int) -> None:
+        """
+        Advance the farm by a number of days, without harvesting, as calling
+        new_day that many times would. Each shard is aged by every day at
+        once, in parallel.
+
+        Args:
+            days (int): The number of days to advance by.
+        """
+        if days <= 0:
+            return
+        list(
+            self._executor.map(
+                _age_shard, self._shards, [days] * len(self._shards)
+            )
+        )
+        self._days_elapsed += days
+        self._player.reset_energy()
+
+    def new_day(self) -> None:
+        """Advance the farm by one day."""
+        self.advance_days(1)
+
+    def harvest_all(self, sell: bool = False) -> dict[str, int]:
+        """
+        Harvest every plant which is ready, row by row, as harvest_region
+        over the whole farm would, and add the harvested items to the
+        player's inventory. Stops when the player runs out of energy.
+
+        The shards are first scanned in parallel for the energy their ready
+        plants take, which gives the player's energy as the harvest reaches
+        each shard, and are then harvested in parallel.
+
+        Args:
+            sell (bool, optional): Whether to sell the harvested items
+                straight away, for their SELL_PRICES. Defaults to False.
+
+        Returns:
+            dict[str, int]: The total amount of each item harvested.
+        """
+        energy = self._player.get_energy()
+        jobs = []
+        for shard, (total, all_but_last) in zip(
+            self._shards, self._executor.map(_scan_shard, self._shards)
+        ):
+            if energy < HARVEST_COST:
+                break
+            if not total:
+                continue
+            jobs.append((shard, energy))
+            # The last plant is harvested (and so every plant) if the energy
+            # left before it is enough, and otherwise the harvest stops here
+            if energy - all_but_last < HARVEST_COST:
+                break
+            energy -= total
+
+        yields = {}
+        spent = 0
+        results = self._executor.map(_harvest_shard, *zip(*jobs)) if jobs else ()
+        for counts, energy_used in results:
+            spent += energy_used
+            for (item_name, amount, _), count in zip(_HARVESTS[1:], counts):
+                if count:
+                    yields[item_name] = yields.get(item_name, 0) + amount * count
+        self._player.reduce_energy(spent)
+        for item_name, amount in yields.items():
+            self._player.add_item((item_name, amount))
+            if sell:
+                for _ in range(amount):
+                    self._player.sell(item_name, SELL_PRICES[item_name])
+        return yields
+
+    def close(self) -> None:
+        """Stop the worker processes, and free the farm's shared memory."""
+        self._executor.shutdown()
+        self._grid.release()
+        self._memory.unlink()
+
+    def __enter__(self) -> "ShardedFarm":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main() -> None:
+    """Time a large sharded farm from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Time advancing and harvesting a very large sharded farm."
+    )
+    parser.add_argument(
+        "--size", type=int, default=2000, help="rows and columns of the farm"
+    )
+    parser.add_argument("--days", type=int, default=20, help="days to play")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="worker processes (default: one per processor)",
+    )
+    parser.add_argument(
+        "--shards", type=int, default=None,
+        help=f"shards (default: {SHARDS_PER_WORKER} per worker)",
+    )
+    args = parser.parse_args()
+
+    size = args.size
+    with ShardedFarm([SOIL * size] * size, args.workers, args.shards) as farm:
+        # A band of each type of plant, planted a day apart
+        for index, plant_class in enumerate(_PLANT_CLASSES):
+            top = size * index // len(_PLANT_CLASSES)
+            bottom = size * (index + 1) // len(_PLANT_CLASSES) - 1
+            farm.fill((top, 0), (bottom, size - 1), plant_class)
+            farm.new_day()
+        print(
+            f"{farm.get_plant_count():,} plants in {len(farm.get_shards())} "
+            f"shards"
+        )
+
+        aging = harvesting = 0.0
+        yields = {}
+        for _ in range(args.days):
+            start = time.perf_counter()
+            farm.new_day()
+            aging += time.perf_counter() - start
+            start = time.perf_counter()
+            for item_name, amount in farm.harvest_all(sell=True).items():
+                yields[item_name] = yields.get(item_name, 0) + amount
+            harvesting += time.perf_counter() - start
+
+        player = farm.get_player()
+        print(f"day {farm.get_days_elapsed()}: ${player.get_money()}, {yields}")
+        print(
+            f"{args.days} days: {aging / args.days * 1000:.1f}ms per new day, "
+            f"{harvesting / args.days * 1000:.1f}ms per harvest"
+        )
+
+
+if __name__ == "__main__":
+    main()
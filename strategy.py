@@ -0,0 +1,357 @@
+import functools
+import math
+from typing import NamedTuple, Optional
+from a3_support import read_map
+from constants import *
+from model import Player
+
+# The solver plans in epochs of this many days. A berry plant regrows and a
+# potato grows in 4 days, so both fit the epochs exactly
+EPOCH_DAYS = 4
+
+# Energy for one plant over its whole growth, including a move to each tile
+_PLANT_ENERGY = PLANT_COST + MOVE_COST
+_ANNUAL_ENERGY = _PLANT_ENERGY + HARVEST_COST + REMOVE_COST + MOVE_COST
+_BERRY_HARVEST_ENERGY = HARVEST_COST + MOVE_COST
+
+_POTATO_PROFIT = SELL_PRICES["Potato"]
+_KALE_PROFIT = SELL_PRICES["Kale"]
+_BERRY_HARVEST = SELL_PRICES["Berry"] * 3
+
+# The epochs a kale plant takes to grow (6 days), and a berry plant takes to
+# be first ready (13 days)
+_KALE_EPOCHS = 2
+_BERRY_EPOCHS = 4
+
+
+class EpochPlan(NamedTuple):
+    """What to do in one epoch of a strategy. Plants are planted at the start
+    of the epoch, and everything harvested is sold straight away."""
+
+    # The first day of the epoch, counting from 0
+    day: int
+    # The money held at the start of the epoch
+    money: int
+    # The number of seeds of each type to buy, and to plant
+    buy: dict[str, int]
+    plant: dict[str, int]
+    # The number of untilled tiles to till
+    till: int
+    # The number of each item harvested, and sold, during the epoch
+    sell: dict[str, int]
+
+
+class Strategy(NamedTuple):
+    """A plan for planting and selling over a number of days."""
+
+    epochs: list[EpochPlan]
+    # The money held at the end
+    money: int
+
+
+class _State(NamedTuple):
+    """The aggregated state of a farm at the start of an epoch."""
+
+    epoch: int
+    money: int
+    # The number of berry plants which are ready each epoch
+    berries: int
+    # The number of tiles tilled so far, beyond those which start as soil
+    tilled: int
+    # The seeds which the player starts with
+    potato_seeds: int
+    kale_seeds: int
+
+
+# Tilled tiles are rounded down to a multiple of this to share states, and
+# berries are planted in multiples of this (once there are enough of them)
+_TILL_ROUNDING = 10
+_BERRY_STEP = 5
+
+
+def _round_money(money: int) -> int:
+    """
+    Round an amount of money down to two significant figures, so that farms
+    with similar amounts of money share a state.
+    """
+    if money < 100:
+        return money
+    step = 10 ** (int(math.log10(money)) - 1)
+    return money - money % step
+
+
+class StrategySolver:
+    """Plans which crops to plant over a number of days to end with the most
+    money, from the seed prices, selling prices, growth schedules and daily
+    energy.
+
+    Rather than simulating every plant, the farm is aggregated into a few
+    counts per epoch: the money held, the number of berry plants, and the
+    number of tiles tilled. Each epoch, the solver chooses between growing
+    potatoes, growing kale (over 2 epochs) or planting berries (over the 4
+    epochs they take to be ready), with potatoes filling whatever energy,
+    tiles and money are left over. The best choice from each state is found
+    by memoized dynamic programming.
+
+    The plan is near-optimal rather than exact:
+    - Each epoch's energy is pooled across its days, so plantings may need to
+      be spread over the days of an epoch.
+    - Kale is ready after 6 days but harvested after 8, and berries are first
+      ready after 13 days but first harvested after 16.
+    - Any seeds the player starts with which aren't planted straight away are
+      sold, and berries are planted in batches.
+    - Money is rounded to two significant figures to share states. The plan
+      is then replayed with exact money, so the reported money is what the
+      plan actually earns under the model above.
+
+    As the player's energy limits the farm to a few hundred plants, the number
+    of states depends on the horizon rather than on the size of the map."""
+
+    def __init__(self, soil: int, untilled: int, days: int) -> None:
+        """
+        Initialise the StrategySolver.
+
+        Args:
+            soil (int): The number of tiles which are soil to start with.
+            untilled (int): The number of tiles which can be tilled.
+            days (int): The number of days to plan for.
+        """
+        self._soil = soil
+        self._untilled = untilled
+        self._epochs = days // EPOCH_DAYS
+        self._epoch_energy = EPOCH_DAYS * Player.START_ENERGY
+        # The most of each plant that the energy could ever sustain
+        self._max_berries = self._epoch_energy // _BERRY_HARVEST_ENERGY
+        self._max_annuals = self._epoch_energy // _ANNUAL_ENERGY
+        # More money than this can never be spent in one epoch, so any extra
+        # money is simply kept until the end
+        self._money_cap = (
+            self._max_berries * BUY_PRICES["Berry Seed"]
+            + self._max_annuals
+            * (BUY_PRICES["Kale Seed"] + BUY_PRICES["Potato Seed"])
+        )
+        # Tiles beyond this many are never all in use at once, so there is no
+        # need to tell apart how many more have been tilled
+        self._most_tilled = max(
+            0, self._max_berries + self._max_annuals - self._soil
+        )
+        self._best = functools.lru_cache(maxsize=None)(self._solve)
+
+    @classmethod
+    def from_map(cls, map_file: str, days: int) -> "StrategySolver":
+        """
+        Create a solver for a map file.
+
+        Args:
+            map_file (str): The path to the map file.
+            days (int): The number of days to plan for.
+        """
+        tiles = "".join(read_map(map_file))
+        return cls(tiles.count(SOIL), tiles.count(UNTILLED), days)
+
+    def solve(self, money: int = 0, inventory: Optional[dict] = None) -> Strategy:
+        """
+        Find the plan which ends with the most money.
+
+        Args:
+            money (int, optional): The starting money. Defaults to 0.
+            inventory (Optional[dict], optional): The starting seeds. Defaults
+                to those a new Player starts with.
+
+        Returns:
+            Strategy: The plan for each epoch, and the money it ends with.
+        """
+        if inventory is None:
+            inventory = Player().get_inventory()
+        state = _State(
+            0,
+            money,
+            0,
+            0,
+            inventory.get("Potato Seed", 0),
+            inventory.get("Kale Seed", 0),
+        )
+        epochs = []
+        while state.epoch < self._epochs:
+            _, action = self._best(self._key(state))
+            state, plans = self._run(state, *action)
+            epochs.extend(plans)
+        return Strategy(epochs, state.money)
+
+    def _key(self, state: _State) -> _State:
+        """
+        Get the state which a state shares its solution with. Rounding down
+        means the solution is found with no more money or tilled tiles than
+        the state has, so it can always be followed.
+        """
+        return state._replace(
+            money=_round_money(min(state.money, self._money_cap)),
+            tilled=min(
+                state.tilled - state.tilled % _TILL_ROUNDING, self._most_tilled
+            ),
+        )
+
+    def _actions(self, state: _State) -> list[tuple[str, int]]:
+        """
+        Get the choices which can be made at the start of an epoch, as the
+        crop to plant (besides potatoes) and how many.
+        """
+        actions = [("potato", 0)]
+        energy = self._epoch_energy - state.berries * _BERRY_HARVEST_ENERGY
+        tiles = self._soil + self._untilled - state.berries
+
+        remaining = self._epochs - state.epoch
+        if remaining >= _KALE_EPOCHS:
+            affordable = state.kale_seeds + state.money // BUY_PRICES["Kale Seed"]
+            # Kale beyond the free tiles also needs its tile tilled first
+            free = max(0, self._soil + state.tilled - state.berries)
+            sustained = energy // _ANNUAL_ENERGY
+            if sustained > free:
+                sustained = free + (energy - free * _ANNUAL_ENERGY) // (
+                    _ANNUAL_ENERGY + TILL_COST
+                )
+            most = min(affordable, tiles, sustained)
+            for count in sorted({most, most // 2}):
+                if count > 0:
+                    actions.append(("kale", count))
+
+        if remaining > _BERRY_EPOCHS:
+            affordable = state.money // BUY_PRICES["Berry Seed"]
+            most = min(
+                affordable,
+                tiles,
+                self._max_berries - state.berries,
+                energy // (_PLANT_ENERGY + TILL_COST),
+            )
+            # Berries are planted in batches of whole steps, so that fewer
+            # different numbers of berries need to be solved for
+            for count in sorted({most, most // 2, most // 4}):
+                if count >= _BERRY_STEP:
+                    count -= count % _BERRY_STEP
+                if count > 0 and ("berry", count) not in actions:
+                    actions.append(("berry", count))
+        return actions
+
+    def _solve(self, state: _State) -> tuple[int, tuple[str, int]]:
+        """
+        Find the most money a state can end with, and the choice to make.
+        The state should already be rounded with _key.
+        """
+        if state.epoch >= self._epochs:
+            return state.money, ("potato", 0)
+        best = None
+        for action in self._actions(state):
+            next_state, _ = self._run(state, *action)
+            # Money beyond the cap is never spent, so it carries to the end
+            excess = next_state.money - min(next_state.money, self._money_cap)
+            key = self._key(next_state)
+            value = self._best(key)[0] + excess
+            if best is None or value > best[0]:
+                best = (value, action)
+        return best
+
+    def _run(
+        self, state: _State, crop: str, count: int
+    ) -> tuple[_State, list[EpochPlan]]:
+        """
+        Follow a choice through to the next state, growing potatoes with the
+        energy, tiles and money left in each epoch.
+
+        Args:
+            state (_State): The state to start from.
+            crop (str): "potato", "kale" or "berry".
+            count (int): The number of kale or berry plants to plant.
+
+        Returns:
+            tuple[_State, list[EpochPlan]]: The state after the choice, and
+                the plan for each epoch it takes.
+        """
+        epochs = {"potato": 1, "kale": _KALE_EPOCHS, "berry": _BERRY_EPOCHS}[crop]
+        money = state.money
+        tilled = state.tilled
+        potato_seeds, kale_seeds = state.potato_seeds, state.kale_seeds
+        plans = []
+        for offset in range(epochs):
+            buy, plant, sell = {}, {}, {}
+            start_money = money
+            energy = self._epoch_energy
+            in_use = state.berries
+
+            # Harvest and sell the berries
+            if state.berries:
+                energy -= state.berries * _BERRY_HARVEST_ENERGY
+                money += state.berries * _BERRY_HARVEST
+                sell["Berry"] = state.berries * 3
+
+            def till(needed: int) -> int:
+                """Till tiles until needed more are free, returning the number
+                tilled."""
+                free = self._soil + tilled - in_use
+                return max(0, min(needed - free, self._untilled - tilled))
+
+            new_tiles = 0
+            if offset == 0 and crop != "potato":
+                new_tiles = till(count)
+                tilled += new_tiles
+                energy -= new_tiles * TILL_COST
+                seed = "Kale Seed" if crop == "kale" else "Berry Seed"
+                from_inventory = min(count, kale_seeds if crop == "kale" else 0)
+                kale_seeds -= from_inventory
+                bought = count - from_inventory
+                money -= bought * BUY_PRICES[seed]
+                if bought:
+                    buy[seed] = bought
+                plant[seed] = count
+                energy -= count * (
+                    _ANNUAL_ENERGY if crop == "kale" else _PLANT_ENERGY
+                )
+            if crop != "potato":
+                in_use += count
+
+            # Fill what is left with potatoes, tilling more tiles if needed
+            free = self._soil + tilled - in_use
+            affordable = potato_seeds + money // BUY_PRICES["Potato Seed"]
+            potatoes = min(free, affordable, max(0, energy) // _ANNUAL_ENERGY)
+            extra = min(
+                self._untilled - tilled,
+                affordable - potatoes,
+                max(0, energy - potatoes * _ANNUAL_ENERGY)
+                // (_ANNUAL_ENERGY + TILL_COST),
+            )
+            potatoes += extra
+            tilled += extra
+            new_tiles += extra
+            if potatoes:
+                from_inventory = min(potatoes, potato_seeds)
+                potato_seeds -= from_inventory
+                bought = potatoes - from_inventory
+                money -= bought * BUY_PRICES["Potato Seed"]
+                if bought:
+                    buy["Potato Seed"] = bought
+                plant["Potato Seed"] = potatoes
+                money += potatoes * _POTATO_PROFIT
+                sell["Potato"] = potatoes
+            if crop == "kale" and offset == epochs - 1:
+                money += count * _KALE_PROFIT
+                sell["Kale"] = count
+
+            plans.append(
+                EpochPlan(
+                    (state.epoch + offset) * EPOCH_DAYS,
+                    start_money,
+                    buy,
+                    plant,
+                    new_tiles,
+                    sell,
+                )
+            )
+
+        # Seeds left over from the start are sold rather than kept
+        for seed, left in (("Potato Seed", potato_seeds), ("Kale Seed", kale_seeds)):
+            if left:
+                money += left * SELL_PRICES[seed]
+                plans[-1].sell[seed] = left
+
+        berries = state.berries + (count if crop == "berry" else 0)
+        next_state = _State(state.epoch + epochs, money, berries, tilled, 0, 0)
+        return next_state, plans